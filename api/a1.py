@@ -0,0 +1,86 @@
+"""
+Helpers for Google Sheets A1 notation.
+"""
+import re
+
+
+_CELL_RE = re.compile(r"^([A-Za-z]*)(\d*)$")
+
+
+def column_letter(index):
+    """Convert a zero-based column index to its A1 letters (0 -> A, 26 -> AA)."""
+    if index < 0:
+        raise ValueError("Column index must be non-negative")
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def column_index(letters):
+    """Convert A1 column letters to a zero-based column index (A -> 0, AA -> 26)."""
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + (ord(char) - 64)
+    return index - 1
+
+
+def quote_tab(tab_name):
+    """Quote a tab name for use in a range when it contains special characters."""
+    if re.match(r"^[A-Za-z0-9_]+$", tab_name):
+        return tab_name
+    return "'" + tab_name.replace("'", "''") + "'"
+
+
+def parse_range(range_name):
+    """
+    Split an A1 range into (tab, start_col, start_row, end_col, end_row).
+    Columns are zero-based, rows are one-based, and open bounds are None.
+    E.g. "Leads!B2:D" -> ("Leads", 1, 2, 3, None).
+    """
+    if "!" in range_name:
+        tab, _, cells = range_name.rpartition("!")
+    else:
+        tab, cells = range_name, ""
+
+    if len(tab) >= 2 and tab[0] == tab[-1] == "'":
+        tab = tab[1:-1].replace("''", "'")
+
+    if not cells:
+        return tab, None, None, None, None
+
+    start, _, end = cells.partition(":")
+    start_col, start_row = _parse_cell(start)
+    if end:
+        end_col, end_row = _parse_cell(end)
+    else:
+        end_col, end_row = start_col, start_row
+
+    return tab, start_col, start_row, end_col, end_row
+
+
+def _parse_cell(cell):
+    match = _CELL_RE.match(cell.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        raise ValueError(f"Invalid A1 reference: {cell}")
+    letters, digits = match.groups()
+    col = column_index(letters) if letters else None
+    row = int(digits) if digits else None
+    return col, row
+
+
+def format_range(tab_name, start_col, start_row, end_col=None, end_row=None):
+    """
+    Build an A1 range from zero-based columns and one-based rows.
+    E.g. format_range("Leads", 3, 2, 5, 2) -> "Leads!D2:F2".
+    """
+    start = f"{column_letter(start_col)}{start_row}"
+    if end_col is None:
+        end_col = start_col
+    if end_row is None:
+        end_row = start_row
+    if (end_col, end_row) == (start_col, start_row):
+        return f"{quote_tab(tab_name)}!{start}"
+    return f"{quote_tab(tab_name)}!{start}:{column_letter(end_col)}{end_row}"
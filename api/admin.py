@@ -1,5 +1,63 @@
 from django.contrib import admin
-from .models import User, SheetConfig
+from .models import (
+    User, SheetConfig, SheetMutation, DispositionEvent, SuppressedNumber, ImportJob, Availability, Appointment,
+    Job, JobSchedule,
+)
 
 admin.site.register(User)
-admin.site.register(SheetConfig)
\ No newline at end of file
+admin.site.register(SheetConfig)
+
+
+@admin.register(SheetMutation)
+class SheetMutationAdmin(admin.ModelAdmin):
+    list_display = ["id", "kind", "row_index", "agent", "status", "attempts", "created_at", "applied_at"]
+    list_filter = ["status", "kind"]
+    search_fields = ["idempotency_key", "last_error"]
+
+
+@admin.register(DispositionEvent)
+class DispositionEventAdmin(admin.ModelAdmin):
+    list_display = ["created_at", "disposition", "row_index", "agent", "tab_name"]
+    list_filter = ["disposition", "tab_name"]
+    date_hierarchy = "created_at"
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SuppressedNumber)
+class SuppressedNumberAdmin(admin.ModelAdmin):
+    list_display = ["phone", "added_by", "created_at"]
+    search_fields = ["phone"]
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ["id", "filename", "status", "processed_rows", "imported_rows", "duplicate_rows", "created_at"]
+    list_filter = ["status"]
+
+
+@admin.register(Availability)
+class AvailabilityAdmin(admin.ModelAdmin):
+    list_display = ["owner", "start", "end"]
+    list_filter = ["owner"]
+    date_hierarchy = "start"
+
+
+@admin.register(Appointment)
+class AppointmentAdmin(admin.ModelAdmin):
+    list_display = ["start", "owner", "row_index", "booked_by", "status"]
+    list_filter = ["status", "owner"]
+    date_hierarchy = "start"
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["id", "kind", "status", "attempts", "run_at", "locked_by", "finished_at"]
+    list_filter = ["status", "kind"]
+    date_hierarchy = "created_at"
+
+
+@admin.register(JobSchedule)
+class JobScheduleAdmin(admin.ModelAdmin):
+    list_display = ["name", "next_run_at", "last_enqueued_at"]
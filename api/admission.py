@@ -0,0 +1,160 @@
+"""
+Per-worker admission control for Sheets-bound views.
+
+Each controller caps how many requests may be inside a Sheets-bound view at
+once and keeps a short, bounded wait queue with a deadline. When the queue
+is full (or the deadline passes) the request is shed immediately with a 503
+and Retry-After, so slow upstream calls cannot tie up every worker thread
+and starve logins, admin screens and other non-Sheets endpoints.
+"""
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.response import Response
+
+
+class Overloaded(Exception):
+    """Raised when a request cannot be admitted in time."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded concurrency limit with a bounded, deadline-aware wait queue."""
+
+    def __init__(self, name, max_concurrency=4, max_queue=8, queue_timeout=2.0, retry_after=5):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Block until a slot is free; raise Overloaded if the queue is full or the wait times out."""
+        with self._cond:
+            if self.in_flight < self.max_concurrency and not self.waiting:
+                self._admit(0.0)
+                return
+
+            if self.waiting >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise Overloaded("queue_full", self.retry_after)
+
+            self.waiting += 1
+            started = time.monotonic()
+            deadline = started + self.queue_timeout
+            try:
+                while self.in_flight >= self.max_concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected_timeout += 1
+                        raise Overloaded("queue_timeout", self.retry_after)
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self._admit(time.monotonic() - started)
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def _admit(self, waited):
+        self.in_flight += 1
+        self.admitted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def metrics(self):
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "queue_timeout": self.queue_timeout,
+                "in_flight": self.in_flight,
+                "waiting": self.waiting,
+                "admitted": self.admitted,
+                "rejected_queue_full": self.rejected_queue_full,
+                "rejected_timeout": self.rejected_timeout,
+                "mean_wait_ms": round(self.total_wait / self.admitted * 1000, 3) if self.admitted else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+# ----------------------
+# Controller registry
+# ----------------------
+_controllers = {}
+_controllers_lock = threading.Lock()
+
+
+def get_controller(name):
+    """Return the process-wide controller configured under ADMISSION_CONTROL[name]."""
+    controller = _controllers.get(name)
+    if controller is None:
+        with _controllers_lock:
+            controller = _controllers.get(name)
+            if controller is None:
+                controller = AdmissionController(name, **settings.ADMISSION_CONTROL.get(name, {}))
+                _controllers[name] = controller
+    return controller
+
+
+def admission_metrics():
+    """Metrics for every controller created in this worker."""
+    return {name: controller.metrics() for name, controller in sorted(_controllers.items())}
+
+
+@receiver(setting_changed)
+def _reset_controllers_on_setting_change(setting, **kwargs):
+    if setting == "ADMISSION_CONTROL":
+        with _controllers_lock:
+            _controllers.clear()
+
+
+def admission_controlled(name="sheets"):
+    """
+    Decorator for APIView handler methods. Runs the handler inside the named
+    controller, or returns 503 with Retry-After when the request is shed.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            controller = get_controller(name)
+            try:
+                controller.acquire()
+            except Overloaded as e:
+                return Response(
+                    {"error": "Service is busy, please retry shortly", "reason": e.reason},
+                    status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={"Retry-After": str(e.retry_after)},
+                )
+            try:
+                return handler(view, request, *args, **kwargs)
+            finally:
+                controller.release()
+        return wrapper
+    return decorator
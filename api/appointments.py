@@ -0,0 +1,222 @@
+"""
+Appointment booking and free-slot lookup.
+
+Each owner's availability windows and scheduled appointments are kept as
+sorted, non-overlapping interval lists (start and end arrays), which is all
+an interval tree buys when intervals never overlap. Conflict checks and
+"first slot after t" are a bisect, so slot search stays O(log n) per owner.
+
+The per-process index is reloaded every CALENDAR_CACHE_TTL seconds and
+dropped locally whenever an appointment or availability window changes.
+Bookings are still checked against the database, so a stale index can only
+make slot search optimistic, never double-book.
+"""
+import bisect
+import heapq
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Appointment, Availability
+
+
+class SlotUnavailable(Exception):
+    """Raised when a requested appointment time cannot be booked."""
+
+
+# ----------------------
+# Interval index
+# ----------------------
+class IntervalList:
+    """Sorted, non-overlapping [start, end) intervals."""
+
+    def __init__(self, intervals=(), merge=False):
+        self.starts = []
+        self.ends = []
+        for start, end in sorted(intervals):
+            if merge and self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def overlapping(self, start, end):
+        """Index of an interval overlapping [start, end), or None."""
+        i = bisect.bisect_right(self.starts, start)
+        if i and self.ends[i - 1] > start:
+            return i - 1
+        if i < len(self.starts) and self.starts[i] < end:
+            return i
+        return None
+
+    def containing(self, start, end):
+        """Index of the interval covering all of [start, end), or None."""
+        i = bisect.bisect_right(self.starts, start) - 1
+        if i >= 0 and self.ends[i] >= end:
+            return i
+        return None
+
+    def from_time(self, moment):
+        """Intervals that end after ``moment``, in order."""
+        i = bisect.bisect_right(self.ends, moment)
+        return zip(self.starts[i:], self.ends[i:])
+
+
+class CalendarIndex:
+    """Availability windows and booked intervals per owner id (None is the shared calendar)."""
+
+    def __init__(self, windows, appointments):
+        by_owner = defaultdict(list)
+        for owner_id, start, end in windows:
+            by_owner[owner_id].append((start, end))
+        self.windows = {owner_id: IntervalList(spans, merge=True) for owner_id, spans in by_owner.items()}
+
+        by_owner = defaultdict(list)
+        for owner_id, start, end in appointments:
+            by_owner[owner_id].append((start, end))
+        self.booked = {owner_id: IntervalList(spans) for owner_id, spans in by_owner.items()}
+
+    def is_free(self, owner_id, start, end):
+        booked = self.booked.get(owner_id)
+        return booked is None or booked.overlapping(start, end) is None
+
+    def owner_slots(self, owner_id, since, until, duration):
+        """Free slots of one owner, on a grid of ``duration`` from each window start."""
+        windows = self.windows.get(owner_id)
+        if windows is None:
+            return
+        booked = self.booked.get(owner_id, IntervalList())
+        for window_start, window_end in windows.from_time(since):
+            if window_start >= until:
+                return
+            slot = window_start
+            if slot < since:
+                slot += duration * -(-(since - slot) // duration)
+            while slot + duration <= window_end and slot < until:
+                conflict = booked.overlapping(slot, slot + duration)
+                if conflict is None:
+                    yield slot, slot + duration, owner_id
+                    slot += duration
+                else:
+                    # Jump to the first grid slot after the conflicting appointment
+                    slot += duration * -(-(booked.ends[conflict] - slot) // duration)
+
+    def free_slots(self, since, until, duration, owner_id=None, limit=20):
+        """Earliest free slots across owners (or for one owner), as (start, end, owner_id)."""
+        owners = [owner_id] if owner_id is not None else list(self.windows)
+        slots = heapq.merge(*(self.owner_slots(owner, since, until, duration) for owner in owners),
+                            key=lambda slot: slot[0])
+        return list(islice(slots, limit))
+
+
+_index = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def load_calendar_index():
+    """Build the index from current availability and upcoming scheduled appointments."""
+    current = timezone.now()
+    windows = Availability.objects.filter(end__gt=current).values_list("owner_id", "start", "end")
+    appointments = (
+        Appointment.objects.filter(status="scheduled", end__gt=current - timedelta(days=1))
+        .values_list("owner_id", "start", "end")
+    )
+    return CalendarIndex(windows, appointments)
+
+
+def get_calendar_index():
+    global _index, _loaded_at
+    if _index is None or time.monotonic() - _loaded_at > settings.CALENDAR_CACHE_TTL:
+        with _lock:
+            if _index is None or time.monotonic() - _loaded_at > settings.CALENDAR_CACHE_TTL:
+                _index = load_calendar_index()
+                _loaded_at = time.monotonic()
+    return _index
+
+
+def invalidate_calendar_index():
+    global _index
+    with _lock:
+        _index = None
+
+
+# ----------------------
+# Booking
+# ----------------------
+def appointment_duration():
+    return timedelta(minutes=settings.APPOINTMENT_MINUTES)
+
+
+def _overlaps(owner_id, start, end):
+    return Appointment.objects.filter(
+        owner_id=owner_id, status="scheduled", start__lt=end, end__gt=start
+    ).exists()
+
+
+def _covering_owners(start, end, owner_ids=None):
+    """
+    Owners whose availability covers [start, end), merging adjacent windows
+    the same way CalendarIndex does, so every offered slot can be booked.
+    """
+    windows = Availability.objects.filter(start__lt=end, end__gt=start)
+    if owner_ids is not None:
+        windows = windows.filter(owner_id__in=owner_ids)
+    by_owner = defaultdict(list)
+    for owner_id, window_start, window_end in windows.values_list("owner_id", "start", "end"):
+        by_owner[owner_id].append((window_start, window_end))
+    return sorted(
+        (owner_id for owner_id, spans in by_owner.items()
+         if IntervalList(spans, merge=True).containing(start, end) is not None),
+        key=lambda owner_id: (owner_id is not None, str(owner_id)),
+    )
+
+
+def book_appointment(start, sheet_id, tab_name, row_index, booked_by=None, owner_id=None, mutation=None):
+    """
+    Book [start, start + APPOINTMENT_MINUTES) for ``owner_id``, or for the
+    first owner whose availability covers it and who is free. With no
+    availability set up at all, the shared calendar (owner None) is used.
+    Raises SlotUnavailable on a conflict.
+    """
+    end = start + appointment_duration()
+    if owner_id is not None:
+        candidates = [owner_id]
+        if Availability.objects.filter(owner_id=owner_id).exists() and not _covering_owners(start, end, [owner_id]):
+            raise SlotUnavailable("Outside the owner's availability")
+    else:
+        candidates = _covering_owners(start, end)
+        if not candidates:
+            if Availability.objects.exists():
+                raise SlotUnavailable("Nobody is available at that time")
+            candidates = [None]
+
+    for candidate in candidates:
+        if _overlaps(candidate, start, end):
+            continue
+        try:
+            with transaction.atomic():
+                return Appointment.objects.create(
+                    owner_id=candidate,
+                    booked_by=booked_by,
+                    mutation=mutation,
+                    sheet_id=sheet_id,
+                    tab_name=tab_name,
+                    row_index=row_index,
+                    start=start,
+                    end=end,
+                )
+        except IntegrityError:
+            # Postgres exclusion constraint: a concurrent booking took this
+            # owner's slot, so try the next one
+            continue
+    raise SlotUnavailable("That time is already booked")
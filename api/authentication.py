@@ -0,0 +1,45 @@
+"""
+JWT authentication with a per-process user cache.
+
+Every authenticated request otherwise loads its user row. Users are cached
+for USER_CACHE_TTL seconds and evicted through the invalidation bus whenever
+a user is saved, so role and status changes apply on every worker at once.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+
+# Bumped to drop every cached user at once
+_generation = 0
+
+
+def user_cache_key(user_id):
+    return f"auth_user:{_generation}:{user_id}"
+
+
+def evict_user(user_id=None):
+    """Drop one cached user, or all of them."""
+    global _generation
+    if user_id is None:
+        _generation += 1
+    else:
+        cache.delete(user_cache_key(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None or api_settings.CHECK_REVOKE_TOKEN:
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            cache.set(key, user, settings.USER_CACHE_TTL)
+        elif api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return user
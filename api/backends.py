@@ -0,0 +1,392 @@
+"""
+Sheet storage backends.
+
+All lead I/O goes through a backend chosen by ``settings.SHEETS_BACKEND``.
+``GoogleSheetsBackend`` talks to the real Sheets API; ``FakeSheetBackend``
+keeps sheets in memory (optionally persisted to a JSON file) and can inject
+latency, errors and quota limits for load testing without a network.
+"""
+import json
+import os
+import random
+import threading
+import time
+from collections import deque, namedtuple
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .a1 import format_range, parse_range
+
+
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+
+SheetCall = namedtuple("SheetCall", ["method", "sheet_id", "ranges", "duration", "error"])
+
+
+class SheetBackendError(Exception):
+    """Raised when a backend cannot complete a sheet request."""
+
+
+class QuotaExceeded(SheetBackendError):
+    """Raised when the per-minute request quota is exhausted."""
+
+
+# ----------------------
+# Call observers
+# ----------------------
+_observers = []
+
+
+def add_observer(callback):
+    """Register a callable that receives a SheetCall after every backend request."""
+    _observers.append(callback)
+
+
+def remove_observer(callback):
+    """Unregister a previously added observer."""
+    if callback in _observers:
+        _observers.remove(callback)
+
+
+# ----------------------
+# Backend interface
+# ----------------------
+class BaseSheetBackend:
+    """
+    Interface shared by all sheet backends.
+    Subclasses implement the underscored methods; the public wrappers time
+    each request and notify observers.
+    """
+
+    def get_values(self, sheet_id, range_name):
+        """Return the rows of a single A1 range as a list of lists."""
+        return self._call("get_values", sheet_id, [range_name], self._get_values, range_name)
+
+    def batch_get(self, sheet_id, ranges):
+        """Return one list of rows per requested range."""
+        return self._call("batch_get", sheet_id, list(ranges), self._batch_get, list(ranges))
+
+    def batch_update(self, sheet_id, data):
+        """Write a list of {"range": ..., "values": ...} entries in one request."""
+        ranges = [entry["range"] for entry in data]
+        return self._call("batch_update", sheet_id, ranges, self._batch_update, data)
+
+    def append(self, sheet_id, range_name, values):
+        """Append rows after the last non-empty row of the range's table."""
+        return self._call("append", sheet_id, [range_name], self._append, range_name, values)
+
+    def get_metadata(self, sheet_id):
+        """Return spreadsheet metadata in the Sheets API shape ({"sheets": [...]})."""
+        return self._call("get_metadata", sheet_id, [], self._get_metadata)
+
+    def warm_up(self):
+        """Prepare clients or connections ahead of the first request."""
+
+    def _call(self, method, sheet_id, ranges, func, *args):
+        started = time.perf_counter()
+        error = None
+        try:
+            return func(sheet_id, *args)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            record = SheetCall(method, sheet_id, ranges, time.perf_counter() - started, error)
+            for observer in list(_observers):
+                observer(record)
+
+    def _get_values(self, sheet_id, range_name):
+        raise NotImplementedError
+
+    def _batch_get(self, sheet_id, ranges):
+        raise NotImplementedError
+
+    def _batch_update(self, sheet_id, data):
+        raise NotImplementedError
+
+    def _append(self, sheet_id, range_name, values):
+        raise NotImplementedError
+
+    def _get_metadata(self, sheet_id):
+        raise NotImplementedError
+
+
+# ----------------------
+# Google Sheets
+# ----------------------
+def get_google_sheets_client(credentials=None):
+    """Create and return Google Sheets API client."""
+    from googleapiclient.discovery import build
+    from google.oauth2.service_account import Credentials
+
+    try:
+        # Check if GOOGLE_SHEETS_CREDENTIALS is a file path or JSON string
+        creds_path_or_json = credentials or settings.GOOGLE_SHEETS_CREDENTIALS
+
+        # If it's a file path (ends with .json or is a valid path)
+        if creds_path_or_json.endswith('.json') or os.path.isfile(creds_path_or_json):
+            creds = Credentials.from_service_account_file(creds_path_or_json, scopes=SCOPES)
+        else:
+            # It's a JSON string
+            creds_json = json.loads(creds_path_or_json)
+            creds = Credentials.from_service_account_info(creds_json, scopes=SCOPES)
+
+        return build("sheets", "v4", credentials=creds)
+    except Exception as e:
+        raise SheetBackendError(f"Failed to initialize Google Sheets client: {str(e)}")
+
+
+class GoogleSheetsBackend(BaseSheetBackend):
+    """Backend for the live Google Sheets API."""
+
+    def __init__(self, credentials=None):
+        self.credentials = credentials
+        # httplib2 connections are not thread-safe, so keep one client per thread
+        self._local = threading.local()
+
+    def warm_up(self):
+        """Import the API client libraries and build this thread's client."""
+        self.client
+
+    @property
+    def client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = get_google_sheets_client(self.credentials)
+            self._local.client = client
+        return client
+
+    def _get_values(self, sheet_id, range_name):
+        result = self.client.spreadsheets().values().get(
+            spreadsheetId=sheet_id,
+            range=range_name
+        ).execute()
+        return result.get("values", [])
+
+    def _batch_get(self, sheet_id, ranges):
+        result = self.client.spreadsheets().values().batchGet(
+            spreadsheetId=sheet_id,
+            ranges=ranges
+        ).execute()
+        return [value_range.get("values", []) for value_range in result.get("valueRanges", [])]
+
+    def _batch_update(self, sheet_id, data):
+        return self.client.spreadsheets().values().batchUpdate(
+            spreadsheetId=sheet_id,
+            body={"data": data, "valueInputOption": "RAW"}
+        ).execute()
+
+    def _append(self, sheet_id, range_name, values):
+        return self.client.spreadsheets().values().append(
+            spreadsheetId=sheet_id,
+            range=range_name,
+            valueInputOption="RAW",
+            insertDataOption="INSERT_ROWS",
+            body={"values": values}
+        ).execute()
+
+    def _get_metadata(self, sheet_id):
+        return self.client.spreadsheets().get(spreadsheetId=sheet_id).execute()
+
+
+# ----------------------
+# In-memory fake
+# ----------------------
+class FakeSheetBackend(BaseSheetBackend):
+    """
+    In-memory sheet store for tests and benchmarks.
+
+    Options:
+    - latency / jitter: seconds of simulated round-trip time per request
+    - error_rate: probability (0-1) that a request fails with SheetBackendError
+    - quota_per_minute: requests allowed per rolling minute before QuotaExceeded
+    - path: JSON file to load sheets from and persist writes to
+    - sheets: initial data as {sheet_id: {tab_name: [[row], ...]}}
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, quota_per_minute=None,
+                 path=None, sheets=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quota_per_minute = quota_per_minute
+        self.path = path
+        self.sheets = {}
+        self._random = random.Random(seed)
+        self._requests = deque()
+        self._lock = threading.RLock()
+
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.sheets = json.load(f)
+        if sheets:
+            for sheet_id, tabs in sheets.items():
+                for tab_name, rows in tabs.items():
+                    self.load_rows(sheet_id, tab_name, rows)
+
+    def load_rows(self, sheet_id, tab_name, rows):
+        """Replace the contents of a tab (header row first)."""
+        with self._lock:
+            self.sheets.setdefault(sheet_id, {})[tab_name] = [list(row) for row in rows]
+            self._persist()
+
+    def rows(self, sheet_id, tab_name):
+        """Return the raw rows of a tab without simulating a request."""
+        with self._lock:
+            return [list(row) for row in self._tab(sheet_id, tab_name)]
+
+    def _simulate(self):
+        delay = self.latency
+        if self.jitter:
+            delay += self._random.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+
+        with self._lock:
+            if self.quota_per_minute is not None:
+                now = time.monotonic()
+                while self._requests and now - self._requests[0] > 60:
+                    self._requests.popleft()
+                if len(self._requests) >= self.quota_per_minute:
+                    raise QuotaExceeded("Quota exceeded for read/write requests per minute")
+                self._requests.append(now)
+
+            if self.error_rate and self._random.random() < self.error_rate:
+                raise SheetBackendError("Simulated upstream error")
+
+    def _tab(self, sheet_id, tab_name):
+        try:
+            return self.sheets[sheet_id][tab_name]
+        except KeyError:
+            raise SheetBackendError(f"Unable to parse range: {tab_name}")
+
+    def _read(self, sheet_id, range_name):
+        tab_name, start_col, start_row, end_col, end_row = parse_range(range_name)
+        grid = self._tab(sheet_id, tab_name)
+
+        first_row = (start_row or 1) - 1
+        last_row = end_row if end_row is not None else len(grid)
+        first_col = start_col or 0
+
+        values = []
+        for row in grid[first_row:last_row]:
+            cells = row[first_col:end_col + 1] if end_col is not None else row[first_col:]
+            cells = [str(cell) for cell in cells]
+            # Sheets omits trailing empty cells and rows
+            while cells and cells[-1] == "":
+                cells.pop()
+            values.append(cells)
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def _get_values(self, sheet_id, range_name):
+        self._simulate()
+        with self._lock:
+            return self._read(sheet_id, range_name)
+
+    def _batch_get(self, sheet_id, ranges):
+        self._simulate()
+        with self._lock:
+            return [self._read(sheet_id, range_name) for range_name in ranges]
+
+    def _batch_update(self, sheet_id, data):
+        self._simulate()
+        with self._lock:
+            updated_cells = 0
+            for entry in data:
+                tab_name, start_col, start_row, _, _ = parse_range(entry["range"])
+                grid = self._tab(sheet_id, tab_name)
+                for row_offset, values in enumerate(entry["values"]):
+                    row_number = (start_row or 1) + row_offset
+                    while len(grid) < row_number:
+                        grid.append([])
+                    row = grid[row_number - 1]
+                    for col_offset, value in enumerate(values):
+                        col = (start_col or 0) + col_offset
+                        while len(row) <= col:
+                            row.append("")
+                        row[col] = value
+                        updated_cells += 1
+            self._persist()
+            return {"spreadsheetId": sheet_id, "totalUpdatedCells": updated_cells}
+
+    def _append(self, sheet_id, range_name, values):
+        self._simulate()
+        with self._lock:
+            tab_name = parse_range(range_name)[0]
+            grid = self._tab(sheet_id, tab_name)
+            while grid and not any(str(cell) for cell in grid[-1]):
+                grid.pop()
+            first_row = len(grid) + 1
+            grid.extend(list(row) for row in values)
+            self._persist()
+            width = max((len(row) for row in values), default=1)
+            return {
+                "spreadsheetId": sheet_id,
+                "updates": {
+                    "updatedRange": format_range(tab_name, 0, first_row, max(width - 1, 0), len(grid)),
+                    "updatedRows": len(values),
+                },
+            }
+
+    def _get_metadata(self, sheet_id):
+        self._simulate()
+        with self._lock:
+            if sheet_id not in self.sheets:
+                raise SheetBackendError(f"Requested entity was not found: {sheet_id}")
+            return {
+                "spreadsheetId": sheet_id,
+                "sheets": [
+                    {"properties": {
+                        "title": title,
+                        "gridProperties": {
+                            "rowCount": len(grid),
+                            "columnCount": max((len(row) for row in grid), default=0),
+                        },
+                    }}
+                    for title, grid in self.sheets[sheet_id].items()
+                ],
+            }
+
+    def _persist(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.sheets, f)
+        os.replace(tmp_path, self.path)
+
+
+# ----------------------
+# Backend selection
+# ----------------------
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_sheet_backend():
+    """Return the process-wide backend configured by SHEETS_BACKEND."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                backend_class = import_string(settings.SHEETS_BACKEND)
+                _backend = backend_class(**settings.SHEETS_BACKEND_OPTIONS)
+    return _backend
+
+
+def reset_sheet_backend():
+    """Drop the cached backend so the next call rebuilds it from settings."""
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+@receiver(setting_changed)
+def _reset_backend_on_setting_change(setting, **kwargs):
+    if setting in ("SHEETS_BACKEND", "SHEETS_BACKEND_OPTIONS"):
+        reset_sheet_backend()
@@ -0,0 +1,778 @@
+"""
+Benchmark scenarios for the lead pipeline.
+
+Scenarios run against a throwaway test database and a FakeSheetBackend, so
+they never touch production data or Google Sheets. Each scenario returns a
+plain dict that the ``benchmark`` management command prints as JSON.
+"""
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from .backends import add_observer, get_sheet_backend, remove_observer
+
+
+LEAD_HEADERS = [
+    "Business Name",
+    "Phone Number",
+    "Message",
+    "Disposition",
+    "Agent_ID",
+    "Timestamp",
+    "Lock_Status",
+    "CB_Date",
+    "CB_Time",
+    "Appointment_Date",
+    "Appointment_Time",
+]
+
+BUSINESS_WORDS = [
+    "Acme", "Bright", "Coastal", "Dental", "Eagle", "Family", "Green", "Harbor",
+    "Summit", "Plumbing", "Roofing", "Auto", "Bakery", "Clinic", "Realty", "Salon",
+]
+
+BENCH_SHEET_ID = "benchmark-sheet"
+BENCH_TAB_NAME = "Leads"
+BENCH_PASSWORD = "bench-password-123"
+MAX_CONSECUTIVE_FAILURES = 20
+
+
+# ----------------------
+# Helpers
+# ----------------------
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100.0 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def latency_summary(samples):
+    """Summarize latency samples (seconds) in milliseconds."""
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+def make_lead_rows(count, seed=None):
+    """Build a header row plus ``count`` fresh leads with unique phone numbers."""
+    rng = random.Random(seed)
+    rows = [list(LEAD_HEADERS)]
+    phones = rng.sample(range(2000000000, 9999999999), count)
+    for i, phone in enumerate(phones, start=1):
+        rows.append([
+            f"Business {i}",
+            f"({str(phone)[:3]}) {str(phone)[3:6]}-{str(phone)[6:]}",
+            "Hello from the benchmark",
+        ])
+    return rows
+
+
+class SheetCallCounter:
+    """Observer that counts sheet backend calls by method."""
+
+    def __init__(self):
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        with self._lock:
+            self.calls[record.method] += 1
+
+    @property
+    def total(self):
+        return sum(self.calls.values())
+
+    def __enter__(self):
+        add_observer(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        remove_observer(self)
+
+
+@contextmanager
+def benchmark_environment(backend_options=None, backend="api.backends.FakeSheetBackend"):
+    """
+    Create a throwaway test database and route sheet I/O to a FakeSheetBackend
+    (or another ``backend`` class, such as a trace replay).
+    SQLite uses a temporary file so concurrent agents get real connections,
+    and IMMEDIATE transactions so writers queue instead of deadlocking.
+    """
+    setup_test_environment()
+    tmp_dir = None
+    if connection.vendor == "sqlite":
+        tmp_dir = tempfile.mkdtemp(prefix="rau-bench-")
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = os.path.join(tmp_dir, "bench.sqlite3")
+        connection.settings_dict.setdefault("OPTIONS", {}).update(transaction_mode="IMMEDIATE", timeout=30)
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        with override_settings(
+            SHEETS_BACKEND=backend,
+            SHEETS_BACKEND_OPTIONS=backend_options or {},
+        ):
+            yield get_sheet_backend()
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        if tmp_dir:
+            for name in os.listdir(tmp_dir):
+                os.remove(os.path.join(tmp_dir, name))
+            os.rmdir(tmp_dir)
+
+
+def create_agents(count):
+    """Create ``count`` active agents sharing one pre-hashed password."""
+    from .models import User
+
+    encoded = make_password(BENCH_PASSWORD)
+    User.objects.bulk_create([
+        User(email=f"agent{i}@bench.local", name=f"Agent {i}", password=encoded, role="agent")
+        for i in range(count)
+    ])
+    return list(User.objects.filter(email__endswith="@bench.local").values_list("email", flat=True))
+
+
+def random_disposition(rng):
+    """Pick a disposition and the extra_data DispositionView requires for it."""
+    disposition = rng.choice(["NA", "NA", "NI", "DNC", "CB", "BOOK"])
+    extra_data = {}
+    if disposition == "CB":
+        extra_data = {"CB_Date": "2030-01-01", "CB_Time": "09:00"}
+    elif disposition == "BOOK":
+        day = rng.randint(1, 28)
+        extra_data = {"Appointment_Date": f"2030-02-{day:02d}", "Appointment_Time": f"{rng.randint(9, 16):02d}:00"}
+    return disposition, extra_data
+
+
+# ----------------------
+# Scenarios
+# ----------------------
+def run_agent_floor(agents=10, leads=500, iterations=None, duration=None,
+                    latency=0.0, jitter=0.0, error_rate=0.0, seed=None, trace=None, speed=1.0):
+    """
+    Simulate ``agents`` concurrent agents, each logging in once and then looping
+    leads/next/ -> leads/disposition/ until the queue is empty, ``iterations``
+    leads have been worked, or ``duration`` seconds have passed.
+    With ``trace`` the sheet data, latencies and failures come from a
+    recorded Sheets trace (see api/traces.py) replayed at ``speed``.
+    """
+    from rest_framework.test import APIClient
+    from .models import SheetConfig
+
+    if trace:
+        backend_class = "api.traces.ReplayBackend"
+        backend_options = {"path": trace, "speed": speed, "seed": seed}
+    else:
+        backend_class = "api.backends.FakeSheetBackend"
+        backend_options = {"latency": latency, "jitter": jitter, "error_rate": error_rate, "seed": seed}
+    with benchmark_environment(backend_options, backend_class) as backend:
+        if trace:
+            sheet_id, tab_name = backend.tabs()[0]
+            leads = len(backend.rows(sheet_id, tab_name)) - 1
+        else:
+            sheet_id, tab_name = BENCH_SHEET_ID, BENCH_TAB_NAME
+            backend.load_rows(sheet_id, tab_name, make_lead_rows(leads, seed))
+        SheetConfig.objects.create(sheet_id=sheet_id, tab_name=tab_name)
+        emails = create_agents(agents)
+
+        latencies = defaultdict(list)
+        errors = Counter()
+        assignments = Counter()
+        worked = Counter()
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(len(emails) + 1)
+
+        def agent_loop(number, email):
+            rng = random.Random(None if seed is None else seed + number)
+            client = APIClient()
+            try:
+                start_barrier.wait()
+
+                started = time.perf_counter()
+                response = client.post("/api/login/", {"email": email, "password": BENCH_PASSWORD}, format="json")
+                record("login", started, response)
+                if response.status_code != 200:
+                    return
+                client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+                done = 0
+                consecutive_failures = 0
+                while iterations is None or done < iterations:
+                    if duration is not None and time.perf_counter() - run_started > duration:
+                        break
+
+                    started = time.perf_counter()
+                    response = client.get("/api/leads/next/")
+                    record("next", started, response)
+                    if response.status_code == 404:
+                        break
+                    if response.status_code != 200:
+                        consecutive_failures += 1
+                        if consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                            break
+                        continue
+                    consecutive_failures = 0
+
+                    row_index = response.data["lead"]["row_index"]
+                    with lock:
+                        assignments[row_index] += 1
+
+                    disposition, extra_data = random_disposition(rng)
+                    started = time.perf_counter()
+                    response = client.post("/api/leads/disposition/", {
+                        "row_index": row_index,
+                        "disposition": disposition,
+                        "extra_data": extra_data,
+                    }, format="json")
+                    record("disposition", started, response)
+                    if response.status_code < 300:
+                        with lock:
+                            worked[email] += 1
+                    done += 1
+            finally:
+                connections.close_all()
+
+        def record(endpoint, started, response):
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies[endpoint].append(elapsed)
+                if response.status_code >= 500 or response.status_code in (400, 401, 403, 409, 429, 503):
+                    errors[f"{endpoint}:{response.status_code}"] += 1
+
+        threads = [
+            threading.Thread(target=agent_loop, args=(number, email), daemon=True)
+            for number, email in enumerate(emails)
+        ]
+        for thread in threads:
+            thread.start()
+
+        with SheetCallCounter() as counter:
+            run_started = time.perf_counter()
+            start_barrier.wait()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - run_started
+
+        leads_worked = sum(worked.values())
+        requests_made = sum(len(samples) for samples in latencies.values())
+        all_samples = [sample for samples in latencies.values() for sample in samples]
+
+        return {
+            "scenario": "agents",
+            "config": {
+                "agents": agents,
+                "leads": leads,
+                "iterations": iterations,
+                "duration": duration,
+                "latency": latency,
+                "jitter": jitter,
+                "error_rate": error_rate,
+                "seed": seed,
+                "trace": trace,
+                "speed": speed if trace else None,
+            },
+            "elapsed_s": round(elapsed, 3),
+            "requests": requests_made,
+            "throughput_rps": round(requests_made / elapsed, 3) if elapsed else 0.0,
+            "leads_worked": leads_worked,
+            "leads_per_s": round(leads_worked / elapsed, 3) if elapsed else 0.0,
+            "latency": {
+                "all": latency_summary(all_samples),
+                **{endpoint: latency_summary(samples) for endpoint, samples in sorted(latencies.items())},
+            },
+            "sheets_calls": dict(counter.calls),
+            "sheets_calls_total": counter.total,
+            "sheets_calls_per_lead": round(counter.total / leads_worked, 3) if leads_worked else None,
+            "duplicate_assignments": sum(count - 1 for count in assignments.values() if count > 1),
+            "errors": dict(errors),
+        }
+
+
+def run_connection_reuse(iterations=200):
+    """
+    Compare per-request connections (CONN_MAX_AGE=0) with persistent ones by
+    replaying the request_started/request_finished cycle around a user-list
+    query, and report latency plus how many connections were opened.
+    """
+    from django.db import close_old_connections
+    from .dbmetrics import connections_opened
+    from .models import User
+
+    results = {}
+    with benchmark_environment():
+        create_agents(5)
+        original_max_age = connection.settings_dict["CONN_MAX_AGE"]
+        try:
+            for mode, max_age in (("per_request", 0), ("persistent", 600)):
+                connection.close()
+                connection.settings_dict["CONN_MAX_AGE"] = max_age
+                opened_before = connections_opened()
+                samples = []
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    close_old_connections()  # request_started
+                    list(User.objects.filter(is_superuser=False).order_by("-created_at"))
+                    close_old_connections()  # request_finished
+                    samples.append(time.perf_counter() - started)
+                results[mode] = {
+                    "conn_max_age": max_age,
+                    "connections_opened": connections_opened() - opened_before,
+                    "latency": latency_summary(samples),
+                }
+        finally:
+            connection.settings_dict["CONN_MAX_AGE"] = original_max_age
+
+    per_request = results["per_request"]["latency"]["mean_ms"]
+    persistent = results["persistent"]["latency"]["mean_ms"]
+    return {
+        "scenario": "connections",
+        "vendor": connection.vendor,
+        "iterations": iterations,
+        "modes": results,
+        "setup_cost_ms_per_request": round(per_request - persistent, 3),
+    }
+
+
+def run_login_throughput(agents=8, iterations=20, threads=1):
+    """
+    Post ``iterations`` full-stack logins for each of ``agents`` users from
+    ``threads`` concurrent clients (one worker process) and report logins per
+    second, latency, the time spent hashing and the queries each login makes.
+    """
+    from django.conf import settings
+    from django.contrib.auth.hashers import check_password, get_hasher
+    from django.test.utils import CaptureQueriesContext
+    from rest_framework.test import APIClient
+
+    with benchmark_environment():
+        emails = create_agents(agents)
+        encoded = make_password(BENCH_PASSWORD)
+
+        started = time.perf_counter()
+        check_password(BENCH_PASSWORD, encoded)
+        hash_time = time.perf_counter() - started
+
+        with CaptureQueriesContext(connection) as queries:
+            APIClient().post("/api/login/", {"email": emails[0], "password": BENCH_PASSWORD}, format="json")
+
+        samples = []
+        failures = Counter()
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(threads + 1)
+
+        def client_loop(number):
+            client = APIClient()
+            try:
+                start_barrier.wait()
+                for i in range(number, agents * iterations, threads):
+                    email = emails[i % agents]
+                    started = time.perf_counter()
+                    response = client.post("/api/login/", {"email": email, "password": BENCH_PASSWORD}, format="json")
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        samples.append(elapsed)
+                        if response.status_code != 200:
+                            failures[response.status_code] += 1
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=client_loop, args=(number,), daemon=True) for number in range(threads)]
+        for worker in workers:
+            worker.start()
+        run_started = time.perf_counter()
+        start_barrier.wait()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - run_started
+
+    return {
+        "scenario": "logins",
+        "config": {"agents": agents, "iterations": iterations, "threads": threads},
+        "hasher": get_hasher().algorithm,
+        "pbkdf2_iterations": settings.PASSWORD_PBKDF2_ITERATIONS,
+        "hash_ms": round(hash_time * 1000, 3),
+        "queries_per_login": len(queries),
+        "elapsed_s": round(elapsed, 3),
+        "logins_per_s": round(len(samples) / elapsed, 3) if elapsed else 0.0,
+        "latency": latency_summary(samples),
+        "failures": {str(code): count for code, count in failures.items()},
+    }
+
+
+def make_worked_rows(count, seed=None):
+    """Lead rows with a realistic mix of dispositions, locks and callbacks."""
+    rng = random.Random(seed)
+    rows = make_lead_rows(count, seed)
+    headers = rows[0]
+    disposition_idx = headers.index("Disposition")
+    lock_idx = headers.index("Lock_Status")
+    cb_date_idx = headers.index("CB_Date")
+    cb_time_idx = headers.index("CB_Time")
+    for row in rows[1:]:
+        row.extend([""] * (len(headers) - len(row)))
+        disposition = rng.choice(["", "", "", "NA", "NI", "DNC", "CB", "BOOK"])
+        row[disposition_idx] = disposition
+        if disposition == "CB":
+            row[cb_date_idx] = f"20{rng.choice([24, 30])}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}"
+            row[cb_time_idx] = f"{rng.randint(9, 16):02d}:00"
+        elif not disposition and rng.random() < 0.02:
+            row[lock_idx] = f"In Progress by Agent agent-{rng.randint(1, 20)}"
+    return rows
+
+
+def run_queue_overview(leads=100000, iterations=50, seed=None):
+    """Time the columnar queue overview on a large synthetic snapshot."""
+    from .snapshot import SheetSnapshot
+
+    rows = make_worked_rows(leads, seed)
+    snapshot = SheetSnapshot(BENCH_SHEET_ID, BENCH_TAB_NAME, rows[0], rows[1:])
+
+    started = time.perf_counter()
+    overview = snapshot.overview()
+    first_call = time.perf_counter() - started
+
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        snapshot.overview()
+        samples.append(time.perf_counter() - started)
+
+    return {
+        "scenario": "overview",
+        "leads": leads,
+        "first_call_ms": round(first_call * 1000, 3),
+        "cached_call": latency_summary(samples),
+        "available": overview["available"],
+        "callbacks": overview["callbacks"],
+    }
+
+
+def run_lead_search(leads=100000, iterations=200, seed=None):
+    """Time building the lead search index and answering name and phone queries."""
+    from .search import LeadSearchIndex
+
+    rng = random.Random(seed)
+    rows = make_lead_rows(leads, seed)
+    headers, data = rows[0], rows[1:]
+    for i, row in enumerate(data):
+        row[0] = f"{rng.choice(BUSINESS_WORDS)} {rng.choice(BUSINESS_WORDS)} {i}"
+
+    started = time.perf_counter()
+    index = LeadSearchIndex(headers, data)
+    build = time.perf_counter() - started
+
+    queries = []
+    for _ in range(iterations):
+        row = rng.choice(data)
+        queries.append(rng.choice([
+            row[0].split()[0][:3],
+            " ".join(row[0].split()[:2]),
+            row[1][-4:],
+            row[1][:5],
+        ]))
+
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        index.search(query)
+        samples.append(time.perf_counter() - started)
+
+    return {
+        "scenario": "search",
+        "leads": leads,
+        "build_ms": round(build * 1000, 3),
+        "query": latency_summary(samples),
+    }
+
+
+def run_snapshot_refresh(leads=100000, iterations=20, seed=None):
+    """
+    Time refreshing a fully indexed snapshot after a handful of rows change,
+    against rebuilding it from scratch.
+    """
+    from .snapshot import SheetSnapshot
+
+    rng = random.Random(seed)
+    rows = make_worked_rows(leads, seed)
+    headers, data = rows[0], rows[1:]
+    disposition_idx = headers.index("Disposition")
+
+    def build(data):
+        snapshot = SheetSnapshot(BENCH_SHEET_ID, BENCH_TAB_NAME, headers, data)
+        snapshot.overview()
+        snapshot.search_index()
+        snapshot.dnc_numbers()
+        return snapshot
+
+    started = time.perf_counter()
+    snapshot = build([list(row) for row in data])
+    rebuild = time.perf_counter() - started
+
+    samples = []
+    changed = 0
+    for _ in range(iterations):
+        # A poll between reads: a few dispositions plus a couple of new leads
+        data = [list(row) for row in data]
+        for row in rng.sample(data, 10):
+            row[disposition_idx] = rng.choice(["NA", "NI", "DNC", "BOOK"])
+        data.extend(list(row) for row in rng.sample(data, 2))
+        started = time.perf_counter()
+        delta = snapshot.refresh(headers, data)
+        samples.append(time.perf_counter() - started)
+        changed += len(delta.changed) + len(delta.inserted) + len(delta.deleted)
+
+    return {
+        "scenario": "refresh",
+        "leads": leads,
+        "rebuild_ms": round(rebuild * 1000, 3),
+        "refresh": latency_summary(samples),
+        "rows_changed_per_refresh": changed / iterations if iterations else 0,
+    }
+
+
+def run_mapped_snapshot(leads=100000, seed=None):
+    """
+    Compare a worker's memory and time-to-first-overview for a snapshot held
+    as Python rows (parsed from a sheet read) against one mapped from the
+    shared columnar file.
+    """
+    import tracemalloc
+    from django.utils import timezone
+    from .snapshot import SheetSnapshot
+    from .snapshotfile import open_snapshot, write_snapshot
+
+    rows = make_worked_rows(leads, seed)
+    headers = rows[0]
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="rau-bench-") as directory:
+        path = os.path.join(directory, "bench.snap")
+        started = time.perf_counter()
+        write_snapshot(path, BENCH_SHEET_ID, BENCH_TAB_NAME, headers, rows[1:], timezone.now())
+        write_time = time.perf_counter() - started
+
+        payload = json.dumps(rows[1:])
+
+        def in_memory():
+            # What a worker holds after parsing the response to a full read of the tab
+            return SheetSnapshot(BENCH_SHEET_ID, BENCH_TAB_NAME, list(headers), json.loads(payload))
+
+        def mapped():
+            tab = open_snapshot(path)
+            return SheetSnapshot(BENCH_SHEET_ID, BENCH_TAB_NAME, tab.headers, tab.rows, source=tab)
+
+        for mode, load in (("in_memory", in_memory), ("mapped", mapped)):
+            tracemalloc.start()
+            started = time.perf_counter()
+            snapshot = load()
+            loaded = time.perf_counter() - started
+            snapshot.overview()
+            first_overview = time.perf_counter() - started
+            retained, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results[mode] = {
+                "load_ms": round(loaded * 1000, 3),
+                "first_overview_ms": round(first_overview * 1000, 3),
+                "python_heap_mb": round(retained / 2 ** 20, 2),
+            }
+            del snapshot
+
+        return {
+            "scenario": "mapped",
+            "leads": leads,
+            "file_mb": round(os.path.getsize(path) / 2 ** 20, 2),
+            "write_ms": round(write_time * 1000, 3),
+            "modes": results,
+        }
+
+
+def run_lead_routing(agents=8, leads=20000, iterations=None, seed=None):
+    """
+    Route ``iterations`` leads (a quarter of the queue by default) from a
+    snapshot to ``agents`` concurrent agents, a third of whom ask for leads
+    without pausing, with premium fairness on and off. Reports assignments per second,
+    next_lead latency, duplicate assignments and how evenly the premium
+    (due callback) leads were spread, as Jain's fairness index.
+    """
+    from types import SimpleNamespace
+    from django.conf import settings
+    from . import overlay, routing
+    from .snapshot import SheetSnapshot
+
+    rows = make_worked_rows(leads, seed)
+    limit = iterations or leads // 4
+    results = {}
+    with benchmark_environment():
+        for fairness in ("agent", ""):
+            routing.reset_routers()
+            overlay.clear()
+            snapshot = SheetSnapshot(BENCH_SHEET_ID, BENCH_TAB_NAME, rows[0], [list(row) for row in rows[1:]])
+            with override_settings(LEAD_ROUTING={**settings.LEAD_ROUTING, "fairness": fairness}):
+                started = time.perf_counter()
+                routing.LeadRouter(snapshot)
+                build = time.perf_counter() - started
+
+                samples = []
+                assignments = Counter()
+                premium = Counter()
+                lock = threading.Lock()
+                start_barrier = threading.Barrier(agents + 1)
+
+                def agent_loop(number):
+                    user = SimpleNamespace(pk=f"agent-{number}", team="")
+                    # Every third agent is fast; the others pause between leads
+                    pause = 0.0 if number % 3 == 0 else 0.0002
+                    start_barrier.wait()
+                    while True:
+                        started = time.perf_counter()
+                        lead, _ = routing.next_lead(snapshot, user)
+                        elapsed = time.perf_counter() - started
+                        if lead is None:
+                            return
+                        with lock:
+                            if len(samples) >= limit:
+                                return
+                            samples.append(elapsed)
+                            assignments[lead["row_index"]] += 1
+                            if lead["Disposition"] == "CB":
+                                premium[user.pk] += 1
+                        if pause:
+                            time.sleep(pause)
+
+                threads = [threading.Thread(target=agent_loop, args=(number,), daemon=True) for number in range(agents)]
+                for thread in threads:
+                    thread.start()
+                run_started = time.perf_counter()
+                start_barrier.wait()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.perf_counter() - run_started
+                connections.close_all()
+
+            shares = [premium[f"agent-{number}"] for number in range(agents)]
+            results[fairness or "off"] = {
+                "build_ms": round(build * 1000, 3),
+                "assigned": len(samples),
+                "assignments_per_s": round(len(samples) / elapsed, 3) if elapsed else 0.0,
+                "latency": latency_summary(samples),
+                "duplicate_assignments": sum(count - 1 for count in assignments.values() if count > 1),
+                "premium_by_agent": shares,
+                "premium_fairness_index": (
+                    round(sum(shares) ** 2 / (agents * sum(share ** 2 for share in shares)), 3) if any(shares) else None
+                ),
+            }
+            overlay.clear()
+
+    return {"scenario": "routing", "agents": agents, "leads": leads, "iterations": limit, "modes": results}
+
+
+def run_trace_summary(trace=None):
+    """Summarize a recorded Sheets trace: requests, payload bytes and latency per method."""
+    from .traces import trace_summary
+
+    if not trace:
+        raise ValueError("The trace scenario needs --trace")
+    return {"scenario": "trace", "trace": trace, **trace_summary(trace)}
+
+
+IMPORT_PHASES = {
+    # What a worker imports before it can serve its first request
+    "startup": "import django; django.setup(); import rau_lls.wsgi, rau_lls.urls",
+    # What the first Sheets-bound request pulls in on top of that
+    "sheets_client": "import googleapiclient.discovery, google.oauth2.service_account",
+}
+
+
+def parse_importtime(stderr, top=15):
+    """Parse ``python -X importtime`` output into totals and the slowest modules."""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # column header
+        self_us, cumulative_us, name = fields
+        modules.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip()) - 1) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+
+    top_level = [module for module in modules if module["depth"] == 0]
+    slowest = sorted(modules, key=lambda module: module["cumulative_ms"], reverse=True)[:top]
+    return {
+        "total_ms": round(sum(module["cumulative_ms"] for module in top_level), 3),
+        "modules": len(modules),
+        "slowest": [
+            {"module": module["module"], "cumulative_ms": module["cumulative_ms"], "self_ms": module["self_ms"]}
+            for module in slowest
+        ],
+    }
+
+
+def run_import_time(top=15):
+    """
+    Measure import cost per phase with ``python -X importtime`` in a fresh
+    interpreter, and flag heavy Sheets modules loaded at startup.
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "rau_lls.settings"))
+    phases = {}
+    startup_modules = set()
+    preamble = ""
+    for phase, code in IMPORT_PHASES.items():
+        # Import earlier phases silently so each phase only reports its own cost
+        script = f"{preamble}\nimport sys; sys.stderr.flush()\nprint('---', file=sys.stderr)\n{code}"
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", script],
+            capture_output=True, text=True, env=env, cwd=os.getcwd(),
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"Import phase '{phase}' failed:\n{completed.stderr[-2000:]}")
+        own_output = completed.stderr.split("---\n", 1)[-1]
+        phases[phase] = parse_importtime(own_output, top)
+        if phase == "startup":
+            startup_modules = {line.rsplit("|", 1)[-1].strip() for line in own_output.splitlines()}
+        preamble += f"\n{code}"
+
+    return {
+        "scenario": "importtime",
+        "python": sys.version.split()[0],
+        "phases": phases,
+        "sheets_client_loaded_at_startup": "googleapiclient.discovery" in startup_modules,
+    }
+
+
+SCENARIOS = {
+    "agents": run_agent_floor,
+    "importtime": run_import_time,
+    "connections": run_connection_reuse,
+    "overview": run_queue_overview,
+    "search": run_lead_search,
+    "refresh": run_snapshot_refresh,
+    "logins": run_login_throughput,
+    "mapped": run_mapped_snapshot,
+    "routing": run_lead_routing,
+    "trace": run_trace_summary,
+}
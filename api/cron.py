@@ -0,0 +1,102 @@
+"""
+Minimal cron expressions for recurring jobs.
+
+Supports the usual five fields (minute, hour, day of month, month, day of
+week) with ``*``, ``*/n``, ``a-b``, ``a-b/n`` and comma lists. Day of week
+runs 0-6 from Sunday (7 is also Sunday). As in cron, when both day fields
+are restricted a day matching either one is a match.
+"""
+from datetime import timedelta
+
+from django.utils import timezone
+
+
+FIELDS = [
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 7),
+]
+
+
+class CronError(ValueError):
+    """Raised for an expression that cannot be parsed."""
+
+
+def _parse_field(text, name, low, high):
+    values = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            if not step_text.isdigit() or int(step_text) < 1:
+                raise CronError(f"Invalid step in {name}: {text}")
+            step = int(step_text)
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            if not start_text.isdigit() or not end_text.isdigit():
+                raise CronError(f"Invalid range in {name}: {text}")
+            start, end = int(start_text), int(end_text)
+        elif part.isdigit():
+            start = end = int(part)
+            if step > 1:
+                end = high
+        else:
+            raise CronError(f"Invalid {name}: {text}")
+        if not low <= start <= end <= high:
+            raise CronError(f"{name} out of range: {text}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """A parsed cron expression, evaluated in the project's time zone."""
+
+    def __init__(self, expression):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise CronError(f"Expected 5 fields, got {len(fields)}: {expression}")
+        self.expression = expression
+        minutes, hours, days, months, weekdays = (
+            _parse_field(text, name, low, high) for text, (name, low, high) in zip(fields, FIELDS)
+        )
+        self.minutes = sorted(minutes)
+        self.hours = hours
+        self.days = days
+        self.months = months
+        # cron counts Sunday as 0 (or 7); Python's weekday() has Monday as 0
+        self.weekdays = {(weekday - 1) % 7 for weekday in weekdays}
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment):
+        in_days = moment.day in self.days
+        in_weekdays = moment.weekday() in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, moment):
+        """First matching minute strictly after ``moment`` (an aware datetime)."""
+        local = timezone.localtime(moment).replace(second=0, microsecond=0, tzinfo=None) + timedelta(minutes=1)
+        # Eight years covers any valid day/month combination (e.g. Feb 29 on a Monday)
+        limit = local.replace(year=local.year + 8)
+        while local < limit:
+            if local.month not in self.months:
+                local = (local.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+                continue
+            if not self._day_matches(local):
+                local = local.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if local.hour not in self.hours:
+                local = local.replace(minute=0) + timedelta(hours=1)
+                continue
+            minute = next((minute for minute in self.minutes if minute >= local.minute), None)
+            if minute is None:
+                local = local.replace(minute=0) + timedelta(hours=1)
+                continue
+            return timezone.make_aware(local.replace(minute=minute))
+        raise CronError(f"Expression never matches: {self.expression}")
@@ -0,0 +1,42 @@
+"""
+Per-worker database connection metrics.
+"""
+import threading
+from collections import Counter
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+_opened = Counter()
+_lock = threading.Lock()
+
+
+@receiver(connection_created)
+def _count_connection(sender, connection, **kwargs):
+    with _lock:
+        _opened[connection.alias] += 1
+
+
+def connections_opened(alias="default"):
+    """Number of new DB connections this worker has opened for ``alias``."""
+    return _opened[alias]
+
+
+def database_metrics():
+    """Connection reuse settings, connections opened and pool stats per alias."""
+    metrics = {}
+    for alias in connections:
+        connection = connections[alias]
+        info = {
+            "vendor": connection.vendor,
+            "conn_max_age": connection.settings_dict.get("CONN_MAX_AGE"),
+            "conn_health_checks": connection.settings_dict.get("CONN_HEALTH_CHECKS"),
+            "connections_opened": _opened[alias],
+        }
+        pool = getattr(connection, "pool", None)
+        if pool is not None:
+            info["pool"] = pool.get_stats()
+        metrics[alias] = info
+    return metrics
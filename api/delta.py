@@ -0,0 +1,73 @@
+"""
+Row-level change detection between two reads of a tab.
+
+Every row is reduced to a content hash, and the header row to a column
+fingerprint. Comparing the hash lists of the previous and the fresh read
+gives a RowDelta of inserted, changed and deleted rows, so a snapshot
+refresh only re-indexes what actually changed. Hashes use Python's built-in
+string hashing: they are cheap and only ever compared within one process.
+"""
+from collections import defaultdict, deque, namedtuple
+
+
+# Positions are into the old rows for ``deleted`` and into the new rows for
+# ``changed`` and ``inserted``. ``shifted`` means rows were inserted or
+# deleted mid-sheet, so every row after them moved to a new position.
+RowDelta = namedtuple("RowDelta", ["inserted", "changed", "deleted", "shifted"])
+
+
+def row_hash(row):
+    """Content hash of a row, ignoring trailing empty cells (Sheets omits them)."""
+    if row and not row[-1]:
+        end = len(row) - 1
+        while end and not row[end - 1]:
+            end -= 1
+        row = row[:end]
+    return hash(tuple(row))
+
+
+def column_fingerprint(headers):
+    """Fingerprint of a tab's column layout; row hashes only compare within one layout."""
+    return hash(tuple(headers))
+
+
+def diff_rows(old, new):
+    """
+    Compare two lists of row hashes and return the RowDelta that turns
+    ``old`` into ``new``. Unchanged leading and trailing rows are skipped in
+    one pass each; a changed row in a shifted region shows up as a delete
+    plus an insert.
+    """
+    limit = min(len(old), len(new))
+    prefix = 0
+    while prefix < limit and old[prefix] == new[prefix]:
+        prefix += 1
+
+    if len(old) == len(new):
+        changed = [position for position in range(prefix, len(new)) if old[position] != new[position]]
+        return RowDelta([], changed, [], False)
+
+    suffix = 0
+    while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+        suffix += 1
+
+    if not suffix:
+        # Rows appended or removed at the end; everything before keeps its place
+        changed = [position for position in range(prefix, limit) if old[position] != new[position]]
+        inserted = list(range(len(old), len(new)))
+        deleted = list(range(len(new), len(old)))
+        return RowDelta(inserted, changed, deleted, False)
+
+    old_end, new_end = len(old) - suffix, len(new) - suffix
+    unmatched = defaultdict(deque)
+    for position in range(prefix, old_end):
+        unmatched[old[position]].append(position)
+    inserted = []
+    for position in range(prefix, new_end):
+        positions = unmatched.get(new[position])
+        if positions:
+            positions.popleft()
+        else:
+            inserted.append(position)
+    deleted = sorted(position for positions in unmatched.values() for position in positions)
+    return RowDelta(inserted, [], deleted, True)
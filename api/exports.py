@@ -0,0 +1,165 @@
+"""
+Streaming exports of leads, disposition history and the write journal.
+
+Each dataset is a generator that yields a header row and then data rows, so
+an export never holds more than one sheet window or one DB chunk in memory.
+``csv_lines`` and ``ndjson_lines`` turn those rows into response chunks for
+a StreamingHttpResponse.
+"""
+import csv
+import json
+from datetime import timezone as dt_timezone
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .a1 import format_range
+from .backends import get_sheet_backend
+from .models import DispositionEvent, SheetMutation
+from .routers import use_replica
+from .utils import get_column_index, get_headers
+
+
+# Rows per sheet read when exporting leads
+SHEET_WINDOW_ROWS = 1000
+
+# Rows fetched per database round trip
+DB_CHUNK_SIZE = 2000
+
+
+# ----------------------
+# Datasets
+# ----------------------
+def _sheet_timestamp(value):
+    """Parse a Timestamp cell (written in UTC) into an aware datetime, or None."""
+    moment = parse_datetime(value.strip()) if value else None
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, dt_timezone.utc)
+    return moment
+
+
+def _row_count(sheet_id, tab_name):
+    """Rows in the tab's grid according to the sheet metadata, or None if it doesn't say."""
+    for sheet in get_sheet_backend().get_metadata(sheet_id).get("sheets", []):
+        properties = sheet.get("properties", {})
+        if properties.get("title") == tab_name:
+            return properties.get("gridProperties", {}).get("rowCount")
+    return None
+
+
+def export_leads(sheet_id, tab_name, start=None, end=None, agent_id=None, disposition=None):
+    """
+    Lead rows read from the sheet in windows of SHEET_WINDOW_ROWS rows, up to
+    the tab's row count, so a run of blank rows doesn't end the export early.
+    """
+    headers = get_headers(sheet_id, tab_name)
+    yield headers
+    if not headers:
+        return
+
+    disposition_idx = get_column_index(headers, "Disposition")
+    agent_idx = get_column_index(headers, "Agent_ID")
+    timestamp_idx = get_column_index(headers, "Timestamp")
+    backend = get_sheet_backend()
+    row_count = _row_count(sheet_id, tab_name)
+
+    first_row = 2
+    while row_count is None or first_row <= row_count:
+        window = format_range(tab_name, 0, first_row, len(headers) - 1, first_row + SHEET_WINDOW_ROWS - 1)
+        rows = backend.get_values(sheet_id, window)
+        if not rows and row_count is None:
+            # No grid size in the metadata: the first empty window ends the tab
+            return
+        for row in rows:
+            if not any(row):
+                continue
+            row = row + [""] * (len(headers) - len(row))
+            if disposition and (disposition_idx is None or row[disposition_idx] != disposition):
+                continue
+            if agent_id and (agent_idx is None or row[agent_idx] != str(agent_id)):
+                continue
+            if start or end:
+                moment = _sheet_timestamp(row[timestamp_idx]) if timestamp_idx is not None else None
+                if moment is None or (start and moment < start) or (end and moment >= end):
+                    continue
+            yield row
+        first_row += SHEET_WINDOW_ROWS
+
+
+def _export_queryset(queryset, columns, start, end, agent_id):
+    if start:
+        queryset = queryset.filter(created_at__gte=start)
+    if end:
+        queryset = queryset.filter(created_at__lt=end)
+    if agent_id:
+        queryset = queryset.filter(agent_id=agent_id)
+
+    yield [column.replace("__", "_") for column in columns]
+    # Pick the database up front: a generator yielding inside use_replica()
+    # would leave replica routing on for the caller between rows
+    with use_replica():
+        alias = router.db_for_read(queryset.model)
+    rows = queryset.using(alias).order_by("created_at", "id").values_list(*columns)
+    yield from rows.iterator(chunk_size=DB_CHUNK_SIZE)
+
+
+def export_dispositions(start=None, end=None, agent_id=None, disposition=None):
+    """Every accepted disposition outcome, oldest first."""
+    queryset = DispositionEvent.objects.all()
+    if disposition:
+        queryset = queryset.filter(disposition=disposition)
+    columns = [
+        "created_at", "agent_id", "agent__email", "sheet_id", "tab_name",
+        "row_index", "disposition", "extra_data",
+    ]
+    return _export_queryset(queryset, columns, start, end, agent_id)
+
+
+def export_history(start=None, end=None, agent_id=None, disposition=None):
+    """Every journaled sheet write (locks, unlocks, dispositions), oldest first."""
+    queryset = SheetMutation.objects.all()
+    if disposition:
+        queryset = queryset.filter(kind="disposition", payload__disposition=disposition)
+    columns = [
+        "id", "created_at", "kind", "agent_id", "sheet_id", "tab_name", "row_index",
+        "payload", "status", "attempts", "applied_at",
+    ]
+    return _export_queryset(queryset, columns, start, end, agent_id)
+
+
+# ----------------------
+# Output formats
+# ----------------------
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, cls=DjangoJSONEncoder)
+    return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow([_cell(value) for value in row])
+
+
+def ndjson_lines(rows):
+    """One JSON object per line, keyed by the header row."""
+    rows = iter(rows)
+    headers = next(rows, None)
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+FORMATS = {
+    "csv": (csv_lines, "text/csv"),
+    "ndjson": (ndjson_lines, "application/x-ndjson"),
+}
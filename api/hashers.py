@@ -0,0 +1,19 @@
+"""
+Password hashers.
+
+Login time is dominated by password hashing, so the work factor is a
+setting: PASSWORD_PBKDF2_ITERATIONS tunes PBKDF2 and PASSWORD_HASHER picks
+the preferred algorithm (see settings.py). Stored hashes made with another
+algorithm or iteration count keep working and are upgraded on the user's
+next successful login.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    """Django's PBKDF2-SHA256 hasher with the iteration count taken from settings."""
+
+    @property
+    def iterations(self):
+        return getattr(settings, "PASSWORD_PBKDF2_ITERATIONS", None) or hashers.PBKDF2PasswordHasher.iterations
@@ -0,0 +1,31 @@
+"""
+Append-only disposition history.
+"""
+from django.db import transaction
+
+from .models import DispositionEvent
+from .rollups import update_rollups
+
+
+def disposition_event(mutation, created_at):
+    """Build an unsaved DispositionEvent for a journaled disposition mutation."""
+    return DispositionEvent(
+        sheet_id=mutation.sheet_id,
+        tab_name=mutation.tab_name,
+        row_index=mutation.row_index,
+        disposition=mutation.payload["disposition"],
+        agent_id=mutation.agent_id,
+        extra_data=mutation.payload.get("extra_data") or {},
+        mutation=mutation,
+        created_at=created_at,
+    )
+
+
+def record_disposition_events(events, batch_size=500):
+    """
+    Bulk-insert new disposition events and add them to the stats rollups.
+    Callers pass only outcomes that are new, not idempotent retries.
+    """
+    with transaction.atomic():
+        DispositionEvent.objects.bulk_create(events, batch_size=batch_size, ignore_conflicts=True)
+        update_rollups(events)
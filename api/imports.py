@@ -0,0 +1,147 @@
+"""
+Chunked bulk import of leads into the configured sheet.
+
+The upload is saved to IMPORT_UPLOAD_DIR and parsed as a stream. Rows whose
+phone number is already in the sheet (or earlier in the file) are dropped,
+and the rest are appended IMPORT_CHUNK_ROWS at a time. Appends are spaced so
+that at most IMPORT_APPENDS_PER_MINUTE are sent, and the job counters are
+saved after every chunk.
+"""
+import csv
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
+
+from .a1 import column_letter, quote_tab
+from .backends import get_sheet_backend
+from .jobs import enqueue
+from .snapshot import expire_snapshot
+from .suppression import normalize_phone
+from .utils import REQUIRED_COLUMNS, get_column_index, get_headers
+
+
+PHONE_COLUMN = "Phone Number"
+
+
+class LeadImportError(Exception):
+    """Raised when an upload cannot be imported."""
+
+
+def _open_csv(path):
+    return open(path, encoding="utf-8-sig", newline="")
+
+
+def save_upload(upload):
+    """Write an uploaded file to IMPORT_UPLOAD_DIR chunk by chunk and return its path."""
+    os.makedirs(settings.IMPORT_UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(settings.IMPORT_UPLOAD_DIR, f"{uuid.uuid4().hex}.csv")
+    with open(path, "wb") as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+    return path
+
+
+def check_upload(path):
+    """Raise LeadImportError unless the file is UTF-8 CSV with every required column."""
+    try:
+        with _open_csv(path) as f:
+            header = next(csv.reader(f), [])
+    except UnicodeDecodeError:
+        raise LeadImportError("File must be UTF-8 encoded CSV")
+    header = [column.strip() for column in header]
+    missing = [column for column in REQUIRED_COLUMNS if column not in header]
+    if missing:
+        raise LeadImportError(f"Missing required columns: {', '.join(missing)}")
+
+
+def existing_phone_numbers(sheet_id, tab_name, headers):
+    """Normalized phone numbers already in the sheet, read as a single column."""
+    phone_idx = get_column_index(headers, PHONE_COLUMN)
+    if phone_idx is None:
+        return set()
+    letter = column_letter(phone_idx)
+    rows = get_sheet_backend().get_values(sheet_id, f"{quote_tab(tab_name)}!{letter}2:{letter}")
+    phones = {normalize_phone(row[0]) for row in rows if row}
+    phones.discard(None)
+    return phones
+
+
+class _RateLimiter:
+    """Spaces calls so no more than ``per_minute`` start in any minute."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self.next_at = 0.0
+
+    def wait(self):
+        delay = self.next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_at = time.monotonic() + self.interval
+
+
+def run_import(job):
+    """Import a job's file into its sheet, saving progress after every chunk."""
+    job.status = "running"
+    job.started_at = timezone.now()
+    job.save(update_fields=["status", "started_at"])
+
+    try:
+        headers = get_headers(job.sheet_id, job.tab_name)
+        if not headers:
+            raise LeadImportError("Sheet has no header row")
+        seen = existing_phone_numbers(job.sheet_id, job.tab_name, headers)
+        backend = get_sheet_backend()
+        limiter = _RateLimiter(settings.IMPORT_APPENDS_PER_MINUTE)
+        counters = ["processed_rows", "imported_rows", "duplicate_rows", "invalid_rows"]
+
+        def flush(chunk):
+            limiter.wait()
+            backend.append(job.sheet_id, quote_tab(job.tab_name), chunk)
+            job.imported_rows += len(chunk)
+            job.save(update_fields=counters)
+
+        with _open_csv(job.source_path) as f:
+            reader = csv.DictReader(f)
+            reader.fieldnames = [column.strip() for column in reader.fieldnames or []]
+            chunk = []
+            for record in reader:
+                job.processed_rows += 1
+                phone = normalize_phone(record.get(PHONE_COLUMN))
+                if phone is None or not (record.get("Business Name") or "").strip():
+                    job.invalid_rows += 1
+                    continue
+                if phone in seen:
+                    job.duplicate_rows += 1
+                    continue
+                seen.add(phone)
+                chunk.append([(record.get(header) or "").strip() for header in headers])
+                if len(chunk) >= settings.IMPORT_CHUNK_ROWS:
+                    flush(chunk)
+                    chunk = []
+            if chunk:
+                flush(chunk)
+
+        job.status = "completed"
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = timezone.now()
+        job.save()
+        expire_snapshot(job.sheet_id, job.tab_name)
+
+    if job.status == "completed" and os.path.exists(job.source_path):
+        os.remove(job.source_path)
+    return job
+
+
+def start_import(job):
+    """Queue the import for a job worker (or run it inline if IMPORT_IN_BACKGROUND is off)."""
+    if not settings.IMPORT_IN_BACKGROUND:
+        return run_import(job)
+    enqueue("import_leads", import_job_id=job.pk)
+    return job
@@ -0,0 +1,142 @@
+"""
+Cross-worker cache invalidation.
+
+``publish(kind, **data)`` announces that something cached per process has
+changed. The event is applied to this worker straight away (and again when
+the surrounding transaction commits) and, on Postgres, sent to every other
+worker with NOTIFY (Postgres only delivers it on commit, and drops it on
+rollback).
+Each worker runs a listener thread that LISTENs on the channel and applies
+events from other workers. On other databases (SQLite in tests and local
+development) events stay local to the process.
+
+Handlers for each kind are registered with ``register(kind, handler)``.
+"""
+import json
+import logging
+import os
+import select
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "rau_lls_invalidate"
+
+# Identifies this process so it can skip its own notifications
+ORIGIN = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+_handlers = {}
+_received = {"local": 0, "remote": 0, "errors": 0}
+
+
+def register(kind, handler):
+    """Call ``handler(**data)`` whenever an event of ``kind`` is published."""
+    _handlers.setdefault(kind, []).append(handler)
+
+
+def dispatch(kind, data, source="local"):
+    """Apply an event to this worker's caches."""
+    _received[source] += 1
+    for handler in _handlers.get(kind, []):
+        try:
+            handler(**data)
+        except Exception:
+            _received["errors"] += 1
+            logger.exception("Invalidation handler for %s failed", kind)
+
+
+def flush_all():
+    """Apply every handler with no arguments, e.g. after missing notifications."""
+    for kind in list(_handlers):
+        dispatch(kind, {})
+
+
+def publish(kind, using=DEFAULT_DB_ALIAS, on_commit_only=False, **data):
+    """
+    Invalidate ``kind`` here (again on commit) and tell the other workers.
+    With ``on_commit_only`` the local dispatch waits for the commit, for events
+    that must not be applied if the transaction rolls back.
+    """
+    connection = connections[using]
+    if not connection.in_atomic_block:
+        dispatch(kind, data)
+    else:
+        if not on_commit_only:
+            dispatch(kind, data)
+        # A reader may re-cache the old value before the commit lands
+        transaction.on_commit(lambda: dispatch(kind, data), using=using)
+
+    if connection.vendor == "postgresql":
+        payload = json.dumps({"kind": kind, "data": data, "origin": ORIGIN}, default=str)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+
+
+def _handle_payload(payload):
+    event = json.loads(payload)
+    if event.get("origin") != ORIGIN:
+        dispatch(event["kind"], event.get("data", {}), source="remote")
+
+
+# ----------------------
+# Listener
+# ----------------------
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def _listen(alias):
+    delay = 1
+    while True:
+        connection = connections[alias]
+        try:
+            connection.ensure_connection()
+            raw = connection.connection
+            with connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            # Anything published while we were not listening is lost
+            flush_all()
+            delay = 1
+            while True:
+                if callable(getattr(raw, "notifies", None)):
+                    # psycopg 3
+                    for notify in raw.notifies(timeout=settings.INVALIDATION_POLL_SECONDS):
+                        _handle_payload(notify.payload)
+                else:
+                    # psycopg2
+                    select.select([raw], [], [], settings.INVALIDATION_POLL_SECONDS)
+                    raw.poll()
+                    while raw.notifies:
+                        _handle_payload(raw.notifies.pop(0).payload)
+        except Exception:
+            logger.exception("Invalidation listener lost its connection; retrying in %ss", delay)
+            connection.close()
+            time.sleep(delay)
+            delay = min(delay * 2, 60)
+
+
+def start_listener(alias=DEFAULT_DB_ALIAS):
+    """Start this worker's listener thread (Postgres only). Returns True if running."""
+    global _listener
+    if connections[alias].vendor != "postgresql":
+        return False
+    with _listener_lock:
+        if _listener is None or not _listener.is_alive():
+            _listener = threading.Thread(target=_listen, args=(alias,), name="invalidation-listener", daemon=True)
+            _listener.start()
+    return True
+
+
+def invalidation_metrics():
+    return {
+        "listening": bool(_listener and _listener.is_alive()),
+        "events_local": _received["local"],
+        "events_remote": _received["remote"],
+        "handler_errors": _received["errors"],
+    }
@@ -0,0 +1,247 @@
+"""
+Database-backed background jobs.
+
+Work that should not run inside a request (imports, journal replay, lock
+reaping) is stored as Job rows and run by ``manage.py run_jobs``. Workers
+claim due jobs with SELECT ... FOR UPDATE SKIP LOCKED, so several workers
+can poll the same table without running a job twice. Each job kind has a
+handler registered with ``@job_handler`` (see api/tasks.py), which sets its
+retry limit and how many jobs of that kind may run at once. Failed jobs
+are retried with exponential backoff.
+
+Recurring jobs come from settings.JOB_SCHEDULES, cron expressions keyed by
+schedule name; workers enqueue each one when it is due.
+"""
+import logging
+import os
+import socket
+import traceback
+from collections import namedtuple
+from datetime import timedelta
+from zlib import crc32
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .cron import CronSchedule
+from .models import Job, JobSchedule
+
+
+logger = logging.getLogger(__name__)
+
+Handler = namedtuple("Handler", ["func", "concurrency", "max_attempts", "timeout"])
+
+_handlers = {}
+
+
+def job_handler(kind, concurrency=None, max_attempts=5, timeout=None):
+    """
+    Register the decorated function as the handler for ``kind``. The job's
+    payload is passed as keyword arguments. ``concurrency`` caps how many
+    jobs of this kind run at once across all workers (None for no cap);
+    ``timeout`` is how long a running job may go without finishing before it
+    is presumed lost and requeued (JOB_TIMEOUT by default).
+    """
+    def decorator(func):
+        _handlers[kind] = Handler(func, concurrency, max_attempts, timeout)
+        return func
+    return decorator
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(kind, run_at=None, priority=0, schedule="", **payload):
+    """Add a job to the queue. It runs at ``run_at`` (now by default) or as soon after as a worker is free."""
+    if kind not in _handlers:
+        raise ValueError(f"No handler registered for job kind: {kind}")
+    return Job.objects.create(
+        kind=kind,
+        payload=payload,
+        priority=priority,
+        run_at=run_at or timezone.now(),
+        schedule=schedule,
+    )
+
+
+# ----------------------
+# Claiming
+# ----------------------
+def _lock_kind(kind):
+    """Serialize claims of one kind until the transaction ends (Postgres only)."""
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(%s)", [crc32(f"rau_lls.jobs:{kind}".encode())])
+
+
+def _full_kinds():
+    running = dict(
+        Job.objects.filter(status="running").order_by().values_list("kind").annotate(count=Count("id"))
+    )
+    return {
+        kind for kind, handler in _handlers.items()
+        if handler.concurrency is not None and running.get(kind, 0) >= handler.concurrency
+    }
+
+
+def claim_job(worker, kinds=None):
+    """
+    Claim the next due job this worker can run, marking it running.
+    ``kinds`` restricts the worker to some job kinds. Returns None if nothing
+    is due or every due kind is at its concurrency limit.
+    """
+    kinds = set(kinds or _handlers) & set(_handlers)
+    while kinds:
+        kinds -= _full_kinds()
+        if not kinds:
+            return None
+        with transaction.atomic():
+            job = (
+                Job.objects.select_for_update(skip_locked=True)
+                .filter(status="pending", run_at__lte=timezone.now(), kind__in=kinds)
+                .order_by("priority", "run_at", "id")
+                .first()
+            )
+            if job is None:
+                return None
+
+            handler = _handlers[job.kind]
+            if handler.concurrency is not None:
+                # Recount under the kind's lock so two workers can't both take the last slot
+                _lock_kind(job.kind)
+                running = Job.objects.filter(kind=job.kind, status="running").count()
+                if running >= handler.concurrency:
+                    kinds.discard(job.kind)
+                    continue
+
+            job.status = "running"
+            job.attempts += 1
+            job.locked_by = worker
+            job.started_at = timezone.now()
+            job.save(update_fields=["status", "attempts", "locked_by", "started_at"])
+            return job
+    return None
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=min(settings.JOB_RETRY_BASE * 2 ** (attempts - 1), settings.JOB_MAX_BACKOFF))
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome, scheduling a retry if it failed and has attempts left."""
+    handler = _handlers.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind: {job.kind}")
+        handler.func(**job.payload)
+    except Exception:
+        logger.exception("Job %s failed", job)
+        job.last_error = traceback.format_exc(limit=5)
+        if handler is None or job.attempts >= handler.max_attempts:
+            job.status = "failed"
+            job.finished_at = timezone.now()
+        else:
+            job.status = "pending"
+            job.run_at = timezone.now() + _retry_delay(job.attempts)
+    else:
+        job.status = "succeeded"
+        job.finished_at = timezone.now()
+    job.locked_by = ""
+    job.save(update_fields=["status", "last_error", "run_at", "finished_at", "locked_by"])
+    return job
+
+
+def requeue_lost_jobs():
+    """
+    Put running jobs back in the queue once they have run longer than their
+    timeout, e.g. because their worker was killed. Returns how many.
+    """
+    now = timezone.now()
+    requeued = 0
+    for kind in Job.objects.filter(status="running").order_by().values_list("kind", flat=True).distinct():
+        handler = _handlers.get(kind)
+        timeout = (handler and handler.timeout) or settings.JOB_TIMEOUT
+        requeued += Job.objects.filter(
+            kind=kind, status="running", started_at__lt=now - timedelta(seconds=timeout)
+        ).update(status="pending", run_at=now, locked_by="", last_error="Requeued after worker timeout")
+    return requeued
+
+
+# ----------------------
+# Recurring schedules
+# ----------------------
+def enqueue_due_schedules(now=None):
+    """
+    Enqueue a job for every schedule in JOB_SCHEDULES that is due. A schedule
+    whose previous job is still pending or running is skipped for that run,
+    so a slow job never piles up copies of itself. Returns the jobs enqueued.
+    """
+    now = now or timezone.now()
+    schedules = settings.JOB_SCHEDULES
+    existing = set(JobSchedule.objects.filter(name__in=schedules).values_list("name", flat=True))
+    for name in set(schedules) - existing:
+        JobSchedule.objects.get_or_create(
+            name=name, defaults={"next_run_at": CronSchedule(schedules[name]["cron"]).next_after(now)}
+        )
+
+    enqueued = []
+    with transaction.atomic():
+        due = JobSchedule.objects.select_for_update(skip_locked=True).filter(
+            name__in=schedules, next_run_at__lte=now
+        )
+        for schedule in due:
+            config = schedules[schedule.name]
+            busy = Job.objects.filter(schedule=schedule.name, status__in=["pending", "running"]).exists()
+            if not busy:
+                enqueued.append(enqueue(
+                    config["kind"],
+                    run_at=schedule.next_run_at,
+                    priority=config.get("priority", 0),
+                    schedule=schedule.name,
+                    **config.get("payload", {}),
+                ))
+                schedule.last_enqueued_at = now
+            schedule.next_run_at = CronSchedule(config["cron"]).next_after(now)
+            schedule.save(update_fields=["next_run_at", "last_enqueued_at"])
+    return enqueued
+
+
+# ----------------------
+# Status
+# ----------------------
+def job_status():
+    """Queue depth per kind, running jobs, schedules and recent failures for the admin status view."""
+    now = timezone.now()
+    by_kind = {}
+    counts = Job.objects.order_by().values_list("kind", "status").annotate(count=Count("id"))
+    for kind, job_status_name, count in counts:
+        by_kind.setdefault(kind, {})[job_status_name] = count
+    oldest_due = Job.objects.filter(status="pending", run_at__lte=now).aggregate(oldest=Min("run_at"))["oldest"]
+
+    return {
+        "by_kind": by_kind,
+        "queue_lag_seconds": (now - oldest_due).total_seconds() if oldest_due else 0.0,
+        "running": list(
+            Job.objects.filter(status="running")
+            .order_by("started_at")
+            .values("id", "kind", "locked_by", "started_at", "attempts")
+        ),
+        "schedules": [
+            {
+                "name": schedule.name,
+                "kind": settings.JOB_SCHEDULES.get(schedule.name, {}).get("kind"),
+                "cron": settings.JOB_SCHEDULES.get(schedule.name, {}).get("cron"),
+                "next_run_at": schedule.next_run_at,
+                "last_enqueued_at": schedule.last_enqueued_at,
+            }
+            for schedule in JobSchedule.objects.filter(name__in=settings.JOB_SCHEDULES).order_by("name")
+        ],
+        "recent_failures": list(
+            Job.objects.filter(status="failed")
+            .order_by("-finished_at")
+            .values("id", "kind", "attempts", "last_error", "finished_at")[:10]
+        ),
+    }
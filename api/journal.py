@@ -0,0 +1,378 @@
+"""
+Durable write journal for sheet mutations.
+
+Views append every lock, unlock and disposition to the SheetMutation table
+first and then try to replay the journal inline. If Google Sheets is slow or
+down the mutation stays pending and is applied later, in order, by the next
+request or by ``manage.py replay_journal``. Consecutive pending mutations for
+the same tab are written together in one batchUpdate.
+
+Order is kept per tab, so a tab whose head entry keeps failing holds up
+only that tab. A replayer claims a batch (claimed_by/claimed_until) and
+commits before calling the sheet, so the request never runs inside a
+transaction or under row locks; a claim left by a replayer that died
+lapses after JOURNAL_CLAIM_TIMEOUT seconds.
+"""
+import hashlib
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from .backends import get_sheet_backend
+from .invalidation import publish
+from .models import SheetMutation
+from .overlay import mutation_values
+from .utils import column_cells, get_headers, lock_lead, unlock_lead, update_lead_disposition
+from .writes import WritePlan
+
+
+# Longest Idempotency-Key header accepted from clients
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+# Rows per "rows" invalidation event, keeping each NOTIFY payload well under
+# Postgres' 8000 byte limit
+ROWS_PER_EVENT = 20
+
+
+def publish_rows(sheet_id, tab_name, rows):
+    """Overlay journaled writes, as (row_index, values) pairs, on every worker once committed."""
+    for start in range(0, len(rows), ROWS_PER_EVENT):
+        publish(
+            "rows",
+            on_commit_only=True,
+            sheet_id=sheet_id,
+            tab_name=tab_name,
+            rows=[[row_index, values] for row_index, values in rows[start:start + ROWS_PER_EVENT]],
+        )
+
+
+class IdempotencyKeyReused(Exception):
+    """Raised when an idempotency key is re-sent for a different mutation than the one it journaled."""
+
+
+def scoped_idempotency_key(agent_id, idempotency_key):
+    """Stored key for a client's idempotency key, hashed with the agent so equal keys from two agents never collide."""
+    return hashlib.sha256(f"{agent_id}\0{idempotency_key}".encode()).hexdigest()[:40]
+
+
+def record_mutation(kind, sheet_id, tab_name, row_index, agent_id=None, payload=None, idempotency_key=None):
+    """
+    Append a mutation to the journal. Returns (mutation, created); re-sending
+    an idempotency key returns the original entry with created=False, or
+    raises IdempotencyKeyReused if that entry is for another row or kind.
+    """
+    fields = {
+        "kind": kind,
+        "sheet_id": sheet_id,
+        "tab_name": tab_name,
+        "row_index": row_index,
+        "agent_id": agent_id,
+        "payload": payload or {},
+    }
+    if idempotency_key:
+        key = scoped_idempotency_key(agent_id, idempotency_key)
+        try:
+            with transaction.atomic():
+                mutation = SheetMutation.objects.create(idempotency_key=key, **fields)
+        except IntegrityError:
+            existing = SheetMutation.objects.get(idempotency_key=key)
+            original = (existing.kind, existing.sheet_id, existing.tab_name, existing.row_index, str(existing.agent_id))
+            if original != (kind, sheet_id, tab_name, row_index, str(agent_id)):
+                raise IdempotencyKeyReused("Idempotency-Key was already used for a different request")
+            return existing, False
+    else:
+        mutation = SheetMutation.objects.create(**fields)
+
+    publish_rows(sheet_id, tab_name, [(row_index, mutation_values(kind, agent_id, payload))])
+    return mutation, True
+
+
+def bulk_idempotency_keys(idempotency_key, positions):
+    """Keys for the entries at ``positions`` of a bulk request, derived from the request's key."""
+    digest = hashlib.sha256(idempotency_key.encode()).hexdigest()[:40]
+    return [f"{digest}:{position}" for position in positions]
+
+
+def journaled_entries(idempotency_key, count):
+    """Entries of a bulk request already journaled under its key, as {position: mutation}."""
+    keys = bulk_idempotency_keys(idempotency_key, range(count))
+    existing = SheetMutation.objects.in_bulk(keys, field_name="idempotency_key")
+    return {position: existing[key] for position, key in enumerate(keys) if key in existing}
+
+
+def record_mutations(sheet_id, tab_name, entries, idempotency_key=None, positions=None):
+    """
+    Append many mutations to the journal in one insert. ``entries`` are
+    (kind, row_index, agent_id, payload) tuples and ``positions`` their
+    places in the original request (default 0, 1, ...), which key them for
+    idempotency. Returns (mutation, created) pairs in entry order; re-sending
+    an idempotency key returns what the first request journaled with
+    created=False.
+    """
+    if positions is None:
+        positions = range(len(entries))
+    keys = bulk_idempotency_keys(idempotency_key, positions) if idempotency_key else [None] * len(entries)
+    existing = {}
+    if idempotency_key:
+        existing = SheetMutation.objects.in_bulk(keys, field_name="idempotency_key")
+
+    results = []
+    new = []
+    for (kind, row_index, agent_id, payload), key in zip(entries, keys):
+        if key in existing:
+            results.append((existing[key], False))
+            continue
+        mutation = SheetMutation(
+            kind=kind,
+            sheet_id=sheet_id,
+            tab_name=tab_name,
+            row_index=row_index,
+            agent_id=agent_id,
+            payload=payload or {},
+        )
+        if key:
+            mutation.idempotency_key = key
+        new.append(mutation)
+        results.append((mutation, True))
+
+    if new:
+        with transaction.atomic():
+            SheetMutation.objects.bulk_create(new)
+        publish_rows(sheet_id, tab_name, [
+            (mutation.row_index, mutation_values(mutation.kind, mutation.agent_id, mutation.payload))
+            for mutation in new
+        ])
+    return results
+
+
+def apply_mutation(mutation):
+    """Send a single journaled mutation to the sheet backend."""
+    if mutation.kind == "lock":
+        lock_lead(mutation.sheet_id, mutation.tab_name, mutation.row_index, mutation.agent_id)
+    elif mutation.kind == "unlock":
+        unlock_lead(mutation.sheet_id, mutation.tab_name, mutation.row_index)
+    elif mutation.kind == "disposition":
+        update_lead_disposition(
+            mutation.sheet_id,
+            mutation.tab_name,
+            mutation.row_index,
+            mutation.payload["disposition"],
+            mutation.agent_id,
+            mutation.payload.get("extra_data"),
+            timestamp=mutation.payload.get("timestamp"),
+        )
+    else:
+        raise ValueError(f"Unknown mutation kind: {mutation.kind}")
+
+
+def apply_mutations(mutations):
+    """Send several journaled mutations for one tab in a single batchUpdate, later writes winning."""
+    sheet_id, tab_name = mutations[0].sheet_id, mutations[0].tab_name
+    headers = get_headers(sheet_id, tab_name)
+    plan = WritePlan(tab_name)
+    for mutation in mutations:
+        values = mutation_values(mutation.kind, mutation.agent_id, mutation.payload)
+        plan.set_row(mutation.row_index, column_cells(headers, values))
+    if plan:
+        get_sheet_backend().batch_update(sheet_id, plan.ranges())
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=min(2 ** attempts, settings.JOURNAL_MAX_BACKOFF))
+
+
+def _next_batch(pending, through=None):
+    """Leading run of a tab's pending mutations that can go in one write: due and not past ``through``."""
+    now = timezone.now()
+    batch = []
+    for mutation in pending:
+        if through is not None and mutation.pk > through:
+            break
+        if mutation.next_attempt_at and mutation.next_attempt_at > now:
+            break
+        batch.append(mutation)
+    return batch
+
+
+def _claim_batch(sheet_id, tab_name, size, through=None):
+    """
+    Claim the next batch of a tab's journal for this replayer and commit, so
+    the sheet request runs without holding row locks. Returns (claim, batch);
+    the batch is empty if the tab has nothing due or another replayer's
+    claim on its head is still live.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        pending = list(
+            SheetMutation.objects.select_for_update(nowait=True)
+            .filter(sheet_id=sheet_id, tab_name=tab_name, status="pending")
+            .order_by("id")[:size]
+        )
+        if any(mutation.claimed_until and mutation.claimed_until > now for mutation in pending):
+            return None, []
+        batch = _next_batch(pending, through)
+        if not batch:
+            return None, []
+        claim = uuid.uuid4().hex
+        SheetMutation.objects.filter(pk__in=[mutation.pk for mutation in batch]).update(
+            claimed_by=claim, claimed_until=now + timedelta(seconds=settings.JOURNAL_CLAIM_TIMEOUT)
+        )
+    return claim, batch
+
+
+def _release(claim):
+    SheetMutation.objects.filter(claimed_by=claim).update(claimed_by="", claimed_until=None)
+
+
+def _apply_batch(batch, claim):
+    """
+    Write a claimed batch in one request. If that fails, apply its head on
+    its own so a bad entry is retried and parked without holding up the rest.
+    Returns (ids applied, stalled) where stalled means the head is backing off.
+    """
+    if len(batch) > 1:
+        try:
+            apply_mutations(batch)
+        except Exception:
+            batch = batch[:1]
+        else:
+            SheetMutation.objects.filter(claimed_by=claim).update(
+                status="applied", attempts=F("attempts") + 1, applied_at=timezone.now(),
+                claimed_by="", claimed_until=None,
+            )
+            return [mutation.pk for mutation in batch], False
+
+    mutation = batch[0]
+    fields = {"attempts": F("attempts") + 1, "claimed_by": "", "claimed_until": None}
+    try:
+        apply_mutation(mutation)
+    except Exception as e:
+        fields["last_error"] = str(e)
+        if mutation.attempts + 1 >= settings.JOURNAL_MAX_ATTEMPTS:
+            # Park it so the rest of the tab's journal can drain
+            fields["status"] = "failed"
+        else:
+            fields["next_attempt_at"] = timezone.now() + _retry_delay(mutation.attempts + 1)
+        SheetMutation.objects.filter(pk=mutation.pk, claimed_by=claim).update(**fields)
+        return [], "status" not in fields
+
+    SheetMutation.objects.filter(pk=mutation.pk, claimed_by=claim).update(
+        status="applied", applied_at=timezone.now(), **fields
+    )
+    return [mutation.pk], False
+
+
+def _replay_tab(sheet_id, tab_name, limit=None, through=None):
+    applied = []
+    while limit is None or len(applied) < limit:
+        size = settings.JOURNAL_BATCH_SIZE
+        if limit is not None:
+            size = min(size, limit - len(applied))
+        try:
+            claim, batch = _claim_batch(sheet_id, tab_name, size, through)
+        except DatabaseError:
+            # Another replayer is claiming the head of this tab
+            break
+        if not batch:
+            break
+        try:
+            done, stalled = _apply_batch(batch, claim)
+        except BaseException:
+            _release(claim)
+            raise
+        if len(done) < len(batch):
+            # Hand back the rest of a batch whose head was tried on its own
+            _release(claim)
+
+        applied.extend(done)
+        if stalled or (through is not None and through in done):
+            break
+    return applied
+
+
+def _pending_tabs():
+    """(sheet_id, tab_name) of every tab with pending mutations, the longest waiting first."""
+    tabs = (
+        SheetMutation.objects.filter(status="pending")
+        .values("sheet_id", "tab_name")
+        .annotate(head=Min("id"))
+        .order_by("head")
+    )
+    return [(tab["sheet_id"], tab["tab_name"]) for tab in tabs]
+
+
+def replay_journal(limit=None, through=None, sheet_id=None, tab_name=None):
+    """
+    Apply pending mutations tab by tab, each tab's in journal order and up to
+    JOURNAL_BATCH_SIZE per sheet request. ``sheet_id`` and ``tab_name``
+    restrict replay to one tab.
+    A tab stops at its first failure (so later writes to it never overtake
+    earlier ones) without holding up other tabs. Replay ends after ``limit``
+    mutations, or once the mutation with id ``through`` is applied. Returns
+    the ids of the mutations applied.
+    """
+    tabs = [(sheet_id, tab_name)] if sheet_id is not None else _pending_tabs()
+    applied = []
+    for tab in tabs:
+        remaining = None if limit is None else limit - len(applied)
+        if remaining == 0:
+            break
+        done = _replay_tab(*tab, limit=remaining, through=through)
+        applied.extend(done)
+        if through is not None and through in done:
+            break
+    return applied
+
+
+def apply_now(mutation):
+    """
+    Try to apply a journaled mutation (and anything queued before it for
+    its tab) now. Returns False if it is still queued.
+    """
+    if mutation.status == "pending" and mutation.pk in replay_journal(
+        through=mutation.pk, sheet_id=mutation.sheet_id, tab_name=mutation.tab_name
+    ):
+        mutation.status = "applied"
+    return mutation.status == "applied"
+
+
+def apply_all_now(mutations):
+    """
+    Try to apply several journaled mutations now, in as few batchUpdates as
+    the journal allows. Returns the set of their ids that are applied.
+    """
+    applied = {mutation.pk for mutation in mutations if mutation.status == "applied"}
+    through = {}
+    for mutation in mutations:
+        if mutation.status == "pending":
+            tab = (mutation.sheet_id, mutation.tab_name)
+            through[tab] = max(through.get(tab, 0), mutation.pk)
+    for (sheet_id, tab_name), last in through.items():
+        applied.update(replay_journal(through=last, sheet_id=sheet_id, tab_name=tab_name))
+    return applied
+
+
+def journal_status():
+    """Summarize journal backlog and replay lag for the admin status view."""
+    pending = SheetMutation.objects.filter(status="pending")
+    oldest = pending.order_by("id").values("created_at", "attempts", "last_error").first()
+    last_applied = (
+        SheetMutation.objects.filter(status="applied")
+        .order_by("-applied_at")
+        .values_list("applied_at", flat=True)
+        .first()
+    )
+    now = timezone.now()
+    return {
+        "pending": pending.count(),
+        "failed": SheetMutation.objects.filter(status="failed").count(),
+        "oldest_pending_at": oldest["created_at"] if oldest else None,
+        "replay_lag_seconds": (now - oldest["created_at"]).total_seconds() if oldest else 0.0,
+        "head_attempts": oldest["attempts"] if oldest else 0,
+        "head_last_error": oldest["last_error"] if oldest else "",
+        "last_applied_at": last_applied,
+    }
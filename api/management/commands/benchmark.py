@@ -0,0 +1,42 @@
+import inspect
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.benchmarks import SCENARIOS
+
+
+class Command(BaseCommand):
+    help = "Run a lead pipeline benchmark against a fake sheet backend and print JSON results."
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", nargs="?", default="agents", choices=sorted(SCENARIOS))
+        parser.add_argument("--agents", type=int, default=None, help="Number of concurrent agents")
+        parser.add_argument("--leads", type=int, default=None, help="Number of leads in the fake sheet")
+        parser.add_argument("--iterations", type=int, default=None,
+                            help="Leads each agent works (agents), logins per agent (logins), leads routed (routing) or requests replayed (connections)")
+        parser.add_argument("--threads", type=int, default=None, help="Concurrent clients in one worker (logins)")
+        parser.add_argument("--duration", type=float, default=None, help="Stop after this many seconds")
+        parser.add_argument("--latency", type=float, default=None, help="Simulated Sheets latency in seconds")
+        parser.add_argument("--jitter", type=float, default=None, help="Extra random latency in seconds")
+        parser.add_argument("--error-rate", type=float, default=None, help="Probability of a simulated Sheets error")
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument("--trace", help="Recorded Sheets trace to replay (agents) or summarize (trace)")
+        parser.add_argument("--speed", type=float, default=None, help="Replay speed-up for --trace latencies")
+        parser.add_argument("--top", type=int, default=None, help="Slowest modules to list (importtime)")
+        parser.add_argument("--output", help="Also write the JSON result to this file")
+
+    def handle(self, *args, **options):
+        scenario = SCENARIOS[options["scenario"]]
+        # Pass each scenario only the options it accepts, keeping its own defaults for unset ones
+        parameters = inspect.signature(scenario).parameters
+        result = scenario(**{
+            name: value for name, value in options.items()
+            if name in parameters and value is not None
+        })
+
+        payload = json.dumps(result, indent=2, sort_keys=True)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(payload + "\n")
+        self.stdout.write(payload)
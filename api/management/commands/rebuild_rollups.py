@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from api.models import DispositionRollup
+from api.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute disposition stats rollups from the DispositionEvent history."
+
+    def handle(self, *args, **options):
+        rebuild_rollups()
+        self.stdout.write(f"Rebuilt {DispositionRollup.objects.count()} rollup row(s)")
@@ -0,0 +1,58 @@
+import fcntl
+import os
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api.models import SheetConfig
+from api.snapshot import publish_snapshot
+
+
+class Command(BaseCommand):
+    help = "Keep the shared on-disk snapshot of the lead tab current for workers to map."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Write the snapshot once, then exit")
+        parser.add_argument("--interval", type=float, default=None,
+                            help="Seconds between reads (SHEET_SNAPSHOT_REFRESH_SECONDS by default)")
+
+    def handle(self, *args, **options):
+        if not settings.SHEET_SNAPSHOT_DIR:
+            raise CommandError("SHEET_SNAPSHOT_DIR is not set")
+        interval = options["interval"] if options["interval"] is not None else settings.SHEET_SNAPSHOT_REFRESH_SECONDS
+
+        # One refresher per snapshot directory; a second one waits its turn
+        os.makedirs(settings.SHEET_SNAPSHOT_DIR, exist_ok=True)
+        lock_file = open(os.path.join(settings.SHEET_SNAPSHOT_DIR, ".refresher.lock"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.stdout.write("Another refresher holds the snapshot directory; waiting")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+        signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+
+        previous = {}
+        while not stopping:
+            started = time.monotonic()
+            config = SheetConfig.objects.first()
+            if config is not None:
+                key = (config.sheet_id, config.tab_name)
+                try:
+                    hashes = publish_snapshot(*key, previous=previous.get(key))
+                except Exception as e:
+                    self.stderr.write(f"Snapshot of {config.tab_name} failed: {e}")
+                else:
+                    state = "unchanged" if hashes == previous.get(key) else f"{len(hashes[1])} rows written"
+                    previous = {key: hashes}
+                    self.stdout.write(f"{config.tab_name}: {state} in {time.monotonic() - started:.2f}s")
+            if options["once"]:
+                break
+            connections.close_all()
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+        lock_file.close()
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.journal import journal_status, replay_journal
+
+
+class Command(BaseCommand):
+    help = "Apply pending sheet mutations from the write journal, in order for each tab."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=None, help="Maximum mutations to apply per pass")
+        parser.add_argument("--loop", action="store_true", help="Keep replaying until interrupted")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between passes with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            applied = replay_journal(limit=options["limit"])
+            summary = journal_status()
+            self.stdout.write(
+                f"Applied {len(applied)} mutation(s); {summary['pending']} pending, "
+                f"{summary['failed']} failed, lag {summary['replay_lag_seconds']:.1f}s"
+            )
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
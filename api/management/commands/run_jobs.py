@@ -0,0 +1,54 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.jobs import claim_job, enqueue_due_schedules, requeue_lost_jobs, run_job, worker_name
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs and enqueue recurring schedules until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--kind", action="append", dest="kinds", help="Only run jobs of this kind (repeatable)")
+        parser.add_argument("--once", action="store_true", help="Run every job that is due, then exit")
+        parser.add_argument("--max-jobs", type=int, default=None, help="Exit after running this many jobs")
+        parser.add_argument("--sleep", type=float, default=None, help="Seconds to wait when the queue is empty")
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        sleep = options["sleep"] if options["sleep"] is not None else settings.JOB_POLL_SECONDS
+        stopping = []
+
+        def stop(signum, frame):
+            # Finish the job in hand, then exit
+            stopping.append(signum)
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(f"Worker {worker} started")
+        processed = 0
+        while not stopping:
+            enqueue_due_schedules()
+            job = claim_job(worker, options["kinds"])
+            if job is None:
+                requeued = requeue_lost_jobs()
+                if requeued:
+                    self.stdout.write(f"Requeued {requeued} job(s) from lost workers")
+                    continue
+                if options["once"]:
+                    break
+                connections.close_all()
+                time.sleep(sleep)
+                continue
+
+            started = time.monotonic()
+            run_job(job)
+            self.stdout.write(f"{job} in {time.monotonic() - started:.2f}s")
+            processed += 1
+            if options["max_jobs"] is not None and processed >= options["max_jobs"]:
+                break
+        self.stdout.write(f"Worker {worker} stopped after {processed} job(s)")
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:00
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_alter_availability_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SheetMutation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(default=uuid.uuid4, max_length=64, unique=True)),
+                ('kind', models.CharField(choices=[('lock', 'Lock'), ('unlock', 'Unlock'), ('disposition', 'Disposition')], max_length=20)),
+                ('sheet_id', models.CharField(max_length=255)),
+                ('tab_name', models.CharField(max_length=255)),
+                ('row_index', models.PositiveIntegerField()),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('applied', 'Applied'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('applied_at', models.DateTimeField(blank=True, null=True)),
+                ('agent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='sheet_mutations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='api_sheetmu_status_788cde_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_sheetmutation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DispositionEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sheet_id', models.CharField(max_length=255)),
+                ('tab_name', models.CharField(max_length=255)),
+                ('row_index', models.PositiveIntegerField()),
+                ('disposition', models.CharField(choices=[('NA', 'No Answer'), ('NI', 'Not Interested'), ('DNC', 'Do Not Call'), ('CB', 'Call Back'), ('BOOK', 'Booked')], max_length=10)),
+                ('extra_data', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField()),
+                ('agent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='disposition_events', to=settings.AUTH_USER_MODEL)),
+                ('mutation', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='disposition_event', to='api.sheetmutation')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['agent', 'created_at'], name='api_disposi_agent_i_2b651e_idx'), models.Index(fields=['created_at'], name='api_disposi_created_d016c5_idx'), models.Index(fields=['disposition', 'created_at'], name='api_disposi_disposi_b34580_idx'), models.Index(fields=['sheet_id', 'tab_name', 'row_index'], name='api_disposi_sheet_i_de28e1_idx')],
+            },
+        ),
+    ]
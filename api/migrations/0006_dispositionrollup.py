@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_dispositionevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DispositionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sheet_id', models.CharField(max_length=255)),
+                ('tab_name', models.CharField(max_length=255)),
+                ('hour', models.DateTimeField(help_text='Start of the hour (UTC)')),
+                ('disposition', models.CharField(choices=[('NA', 'No Answer'), ('NI', 'Not Interested'), ('DNC', 'Do Not Call'), ('CB', 'Call Back'), ('BOOK', 'Booked')], max_length=10)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('agent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disposition_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='api_disposi_hour_65d8c9_idx')],
+                'constraints': [models.UniqueConstraint(fields=('agent', 'sheet_id', 'tab_name', 'hour', 'disposition'), name='unique_disposition_rollup')],
+            },
+        ),
+    ]
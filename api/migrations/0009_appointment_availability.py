@@ -0,0 +1,75 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Postgres enforces "no two scheduled appointments of one owner overlap" with
+# a GiST exclusion constraint; other databases rely on the booking check.
+# A null owner is the shared calendar, so it is compared as the nil UUID.
+EXCLUDE_OVERLAPPING_APPOINTMENTS = """
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE api_appointment ADD CONSTRAINT appointment_no_overlap EXCLUDE USING gist (
+    (COALESCE(owner_id, '00000000-0000-0000-0000-000000000000'::uuid)) WITH =,
+    tstzrange("start", "end") WITH &&
+) WHERE (status = 'scheduled');
+"""
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(EXCLUDE_OVERLAPPING_APPOINTMENTS)
+
+
+def remove_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("ALTER TABLE api_appointment DROP CONSTRAINT IF EXISTS appointment_no_overlap;")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_importjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Appointment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sheet_id', models.CharField(max_length=255)),
+                ('tab_name', models.CharField(max_length=255)),
+                ('row_index', models.PositiveIntegerField()),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], default='scheduled', max_length=20)),
+                ('notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('booked_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='booked_appointments', to=settings.AUTH_USER_MODEL)),
+                ('mutation', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='appointment', to='api.sheetmutation')),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='appointments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['start'],
+                'indexes': [models.Index(fields=['owner', 'status', 'start'], name='api_appoint_owner_i_b6a60d_idx'), models.Index(fields=['status', 'end'], name='api_appoint_status_918eb5_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Availability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('owner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='availabilities', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Availability',
+                'ordering': ['start'],
+                'indexes': [models.Index(fields=['owner', 'end'], name='api_availab_owner_i_46a2b8_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('end__gt', models.F('start'))), name='availability_end_after_start')],
+            },
+        ),
+        migrations.RunPython(add_exclusion_constraint, remove_exclusion_constraint),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='team',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
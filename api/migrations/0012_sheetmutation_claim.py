@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-19 03:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_user_team'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sheetmutation',
+            name='claimed_by',
+            field=models.CharField(blank=True, help_text='Replayer currently sending it to the sheet', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='sheetmutation',
+            name='claimed_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='sheetmutation',
+            index=models.Index(fields=['sheet_id', 'tab_name', 'status', 'id'], name='api_sheetmu_sheet_i_c5fb49_idx'),
+        ),
+    ]
@@ -50,6 +50,8 @@ class User(AbstractBaseUser, PermissionsMixin):
     password = models.CharField(max_length=255)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default="agent")
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="active")
+    # Agents on one team share premium leads fairly as a group (LEAD_ROUTING["fairness"] = "team")
+    team = models.CharField(max_length=100, blank=True, default="")
     last_login = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -100,4 +102,297 @@ class SheetConfig(models.Model):
             existing.tab_name = self.tab_name
             existing.save()
             return existing
-        return super().save(*args, **kwargs)
\ No newline at end of file
+        return super().save(*args, **kwargs)
+
+# ----------------------
+# Sheet Write Journal
+# ----------------------
+class SheetMutation(models.Model):
+    """
+    Durable, ordered journal of sheet writes (lock, unlock, disposition).
+    Every mutation is stored here before it is sent to the sheet, so an
+    upstream outage delays the write instead of losing it. Entries are
+    ordered per tab; a replayer claims a tab's head entries while it sends
+    them.
+    """
+    KIND_CHOICES = [
+        ("lock", "Lock"),
+        ("unlock", "Unlock"),
+        ("disposition", "Disposition"),
+    ]
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("applied", "Applied"),
+        ("failed", "Failed"),
+    ]
+
+    idempotency_key = models.CharField(max_length=64, unique=True, default=uuid.uuid4)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    sheet_id = models.CharField(max_length=255)
+    tab_name = models.CharField(max_length=255)
+    row_index = models.PositiveIntegerField()
+    payload = models.JSONField(default=dict, blank=True)
+    agent = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="sheet_mutations")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=64, blank=True, help_text="Replayer currently sending it to the sheet")
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    applied_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["status", "id"]),
+            models.Index(fields=["sheet_id", "tab_name", "status", "id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} row {self.row_index} ({self.status})"
+
+
+# ----------------------
+# Disposition History
+# ----------------------
+class DispositionEvent(models.Model):
+    """
+    Append-only history of disposition outcomes.
+    The sheet only holds the latest Disposition/Agent_ID/Timestamp per row;
+    every accepted outcome is also kept here for reporting and for rebuilding
+    sheet state if a manual edit goes wrong.
+    """
+    DISPOSITION_CHOICES = [
+        ("NA", "No Answer"),
+        ("NI", "Not Interested"),
+        ("DNC", "Do Not Call"),
+        ("CB", "Call Back"),
+        ("BOOK", "Booked"),
+    ]
+
+    sheet_id = models.CharField(max_length=255)
+    tab_name = models.CharField(max_length=255)
+    row_index = models.PositiveIntegerField()
+    disposition = models.CharField(max_length=10, choices=DISPOSITION_CHOICES)
+    agent = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="disposition_events")
+    extra_data = models.JSONField(default=dict, blank=True)
+    mutation = models.OneToOneField(
+        SheetMutation, null=True, blank=True, on_delete=models.SET_NULL, related_name="disposition_event"
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["agent", "created_at"]),
+            models.Index(fields=["created_at"]),
+            models.Index(fields=["disposition", "created_at"]),
+            models.Index(fields=["sheet_id", "tab_name", "row_index"]),
+        ]
+
+    def __str__(self):
+        return f"{self.disposition} row {self.row_index} at {self.created_at:%Y-%m-%d %H:%M}"
+
+    def save(self, *args, **kwargs):
+        """History is append-only: existing events are never rewritten."""
+        if not self._state.adding:
+            raise ValueError("DispositionEvent is append-only")
+        return super().save(*args, **kwargs)
+
+
+# ----------------------
+# Stats Rollups
+# ----------------------
+class DispositionRollup(models.Model):
+    """
+    Count of dispositions per agent, campaign (sheet tab), hour and outcome.
+    Incremented as outcomes are accepted, so stats never scan history or the sheet.
+    """
+    agent = models.ForeignKey(User, on_delete=models.CASCADE, related_name="disposition_rollups")
+    sheet_id = models.CharField(max_length=255)
+    tab_name = models.CharField(max_length=255)
+    hour = models.DateTimeField(help_text="Start of the hour (UTC)")
+    disposition = models.CharField(max_length=10, choices=DispositionEvent.DISPOSITION_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["agent", "sheet_id", "tab_name", "hour", "disposition"],
+                name="unique_disposition_rollup",
+            ),
+        ]
+        indexes = [models.Index(fields=["hour"])]
+
+    def __str__(self):
+        return f"{self.agent_id} {self.disposition} x{self.count} @ {self.hour:%Y-%m-%d %H:00}"
+
+
+# ----------------------
+# Call Suppression
+# ----------------------
+class SuppressedNumber(models.Model):
+    """
+    Phone number on the internal do-not-call list, stored normalized to digits.
+    Leads with a suppressed number are never served, whatever their row says.
+    """
+    phone = models.CharField(max_length=20, unique=True)
+    added_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="suppressed_numbers")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return self.phone
+
+
+# ----------------------
+# Lead Imports
+# ----------------------
+class ImportJob(models.Model):
+    """
+    A CSV of leads being appended to the configured sheet in chunks.
+    The upload is kept on disk until the job finishes; counters are updated
+    after every chunk so admins can follow progress.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("completed", "Completed"),
+        ("failed", "Failed"),
+    ]
+
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="import_jobs")
+    sheet_id = models.CharField(max_length=255)
+    tab_name = models.CharField(max_length=255)
+    filename = models.CharField(max_length=255)
+    source_path = models.CharField(max_length=500)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    processed_rows = models.PositiveIntegerField(default=0)
+    imported_rows = models.PositiveIntegerField(default=0)
+    duplicate_rows = models.PositiveIntegerField(default=0)
+    invalid_rows = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Import {self.filename} ({self.status})"
+
+
+# ----------------------
+# Appointments
+# ----------------------
+class Availability(models.Model):
+    """
+    A window in which a calendar owner takes appointments.
+    A null owner is the shared calendar used when nobody has set availability.
+    """
+    owner = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE, related_name="availabilities")
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+
+    class Meta:
+        ordering = ["start"]
+        verbose_name_plural = "Availability"
+        indexes = [models.Index(fields=["owner", "end"])]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end__gt=models.F("start")), name="availability_end_after_start"),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id or 'shared'} {self.start:%Y-%m-%d %H:%M}-{self.end:%H:%M}"
+
+
+class Appointment(models.Model):
+    """
+    An appointment booked from a BOOK disposition. Scheduled appointments of
+    the same owner never overlap (enforced by an exclusion constraint on
+    Postgres and by the booking check elsewhere).
+    """
+    STATUS_CHOICES = [
+        ("scheduled", "Scheduled"),
+        ("completed", "Completed"),
+        ("cancelled", "Cancelled"),
+    ]
+
+    owner = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE, related_name="appointments")
+    booked_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name="booked_appointments")
+    mutation = models.OneToOneField(
+        SheetMutation, null=True, blank=True, on_delete=models.SET_NULL, related_name="appointment"
+    )
+    sheet_id = models.CharField(max_length=255)
+    tab_name = models.CharField(max_length=255)
+    row_index = models.PositiveIntegerField()
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="scheduled")
+    notes = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["start"]
+        indexes = [
+            models.Index(fields=["owner", "status", "start"]),
+            models.Index(fields=["status", "end"]),
+        ]
+
+    def __str__(self):
+        return f"Row {self.row_index} at {self.start:%Y-%m-%d %H:%M} ({self.status})"
+
+
+# ----------------------
+# Background Jobs
+# ----------------------
+class Job(models.Model):
+    """
+    A unit of background work for ``manage.py run_jobs``. Workers claim due
+    pending jobs with SELECT ... FOR UPDATE SKIP LOCKED, so any number of
+    workers can share the table without double-running a job.
+    """
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    ]
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    priority = models.SmallIntegerField(default=0, help_text="Lower runs first")
+    run_at = models.DateTimeField()
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    schedule = models.CharField(max_length=100, blank=True, help_text="Recurring schedule that enqueued it")
+    locked_by = models.CharField(max_length=100, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "priority", "run_at"]),
+            models.Index(fields=["kind", "status"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.status})"
+
+
+class JobSchedule(models.Model):
+    """When each recurring schedule in settings.JOB_SCHEDULES next enqueues its job."""
+    name = models.CharField(max_length=100, unique=True)
+    next_run_at = models.DateTimeField()
+    last_enqueued_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} next at {self.next_run_at:%Y-%m-%d %H:%M}"
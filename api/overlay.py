@@ -0,0 +1,140 @@
+"""
+Read-your-writes overlay for sheet rows.
+
+Every journaled lock, unlock and disposition is recorded here as the cell
+values it will write, keyed by row. Snapshots apply the overlay when they
+are loaded and when new entries arrive, so a lead that was just locked or
+dispositioned is never served again, even before the write reaches Google
+Sheets or a fresh read reflects it. Other workers receive the same entries
+through the invalidation bus.
+
+An entry is dropped once a sheet read shows all of its values, or after
+OVERLAY_TTL seconds.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from .utils import LOCK_PREFIX, disposition_values
+
+
+_entries = {}
+_lock = threading.Lock()
+
+
+def mutation_values(kind, agent_id=None, payload=None):
+    """Column name -> value that a journaled mutation writes to its row."""
+    payload = payload or {}
+    if kind == "lock":
+        return {"Lock_Status": f"{LOCK_PREFIX}{agent_id}"}
+    if kind == "unlock":
+        return {"Lock_Status": ""}
+    if kind == "disposition":
+        return disposition_values(
+            payload["disposition"], agent_id, payload.get("timestamp", ""), payload.get("extra_data")
+        )
+    return {}
+
+
+def record(sheet_id, tab_name, row_index, values):
+    """Overlay ``values`` on a row until a read confirms them or they expire."""
+    expires_at = time.monotonic() + settings.OVERLAY_TTL
+    with _lock:
+        rows = _entries.setdefault((sheet_id, tab_name), {})
+        _, pending = rows.get(row_index, (None, {}))
+        rows[row_index] = (expires_at, {**pending, **values})
+
+
+def claim(sheet_id, tab_name, row_index, agent_id):
+    """
+    Overlay a lock on a row unless a pending lock is already overlaid on it,
+    so concurrent requests in one worker never hand out the same lead.
+    Returns True if the row was claimed.
+    """
+    now = time.monotonic()
+    with _lock:
+        rows = _entries.setdefault((sheet_id, tab_name), {})
+        expires_at, values = rows.get(row_index, (0, {}))
+        if expires_at <= now:
+            values = {}
+        elif values.get("Lock_Status"):
+            return False
+        rows[row_index] = (now + settings.OVERLAY_TTL, {**values, **mutation_values("lock", agent_id)})
+    return True
+
+
+def release(sheet_id, tab_name, row_index, agent_id):
+    """Drop a lock claimed by ``agent_id`` that never made it into the journal."""
+    with _lock:
+        rows = _entries.get((sheet_id, tab_name), {})
+        expires_at, values = rows.get(row_index, (0, {}))
+        if values.get("Lock_Status") != mutation_values("lock", agent_id)["Lock_Status"]:
+            return
+        values = {name: value for name, value in values.items() if name != "Lock_Status"}
+        if values:
+            rows[row_index] = (expires_at, values)
+        else:
+            del rows[row_index]
+
+
+def pending(sheet_id, tab_name):
+    """Unexpired overlay entries of a tab as {row_index: {column: value}}."""
+    now = time.monotonic()
+    with _lock:
+        rows = _entries.get((sheet_id, tab_name), {})
+        for row_index in [row for row, (expires_at, _) in rows.items() if expires_at <= now]:
+            del rows[row_index]
+        return {row_index: dict(values) for row_index, (_, values) in rows.items()}
+
+
+def reconcile(sheet_id, tab_name, headers, rows):
+    """
+    Apply pending entries to rows freshly read from the sheet (data rows only,
+    modified in place) and drop the entries the read already reflects.
+    """
+    positions = {name: i for i, name in enumerate(headers)}
+    confirmed = []
+    for row_index, values in pending(sheet_id, tab_name).items():
+        position = row_index - 2
+        if not 0 <= position < len(rows):
+            continue
+        if _shows(rows[position], positions, values):
+            confirmed.append(row_index)
+        else:
+            rows[position] = apply_values(rows[position], positions, values)
+
+    if confirmed:
+        with _lock:
+            tab_entries = _entries.get((sheet_id, tab_name), {})
+            for row_index in confirmed:
+                tab_entries.pop(row_index, None)
+
+
+def _shows(row, positions, values):
+    for name, value in values.items():
+        idx = positions.get(name)
+        if idx is not None and (row[idx] if idx < len(row) else "") != value:
+            return False
+    return True
+
+
+def apply_values(row, positions, values):
+    """Copy of ``row`` with the named columns set, padded as needed."""
+    row = list(row)
+    for name, value in values.items():
+        idx = positions.get(name)
+        if idx is None:
+            continue
+        if idx >= len(row):
+            row.extend([""] * (idx + 1 - len(row)))
+        row[idx] = value
+    return row
+
+
+def clear(sheet_id=None, tab_name=None):
+    with _lock:
+        if sheet_id is None:
+            _entries.clear()
+        else:
+            _entries.pop((sheet_id, tab_name), None)
@@ -0,0 +1,102 @@
+"""
+Incrementally maintained disposition rollups and the stats built from them.
+"""
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+
+from .models import DispositionEvent, DispositionRollup
+
+
+def hour_bucket(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def update_rollups(events):
+    """Add a batch of new DispositionEvents to the hourly rollups."""
+    counts = Counter(
+        (event.agent_id, event.sheet_id, event.tab_name, hour_bucket(event.created_at), event.disposition)
+        for event in events
+        if event.agent_id is not None
+    )
+    for (agent_id, sheet_id, tab_name, hour, disposition), count in counts.items():
+        key = {
+            "agent_id": agent_id,
+            "sheet_id": sheet_id,
+            "tab_name": tab_name,
+            "hour": hour,
+            "disposition": disposition,
+        }
+        if DispositionRollup.objects.filter(**key).update(count=F("count") + count):
+            continue
+        try:
+            with transaction.atomic():
+                DispositionRollup.objects.create(count=count, **key)
+        except IntegrityError:
+            # Another worker created the bucket first
+            DispositionRollup.objects.filter(**key).update(count=F("count") + count)
+
+
+def rebuild_rollups(batch_size=2000):
+    """Recompute every rollup from the disposition history."""
+    with transaction.atomic():
+        DispositionRollup.objects.all().delete()
+        batch = []
+        for event in DispositionEvent.objects.exclude(agent=None).order_by("id").iterator(chunk_size=batch_size):
+            batch.append(event)
+            if len(batch) >= batch_size:
+                update_rollups(batch)
+                batch = []
+        update_rollups(batch)
+
+
+def _summarize(dispositions, active_hours=None):
+    dials = sum(dispositions.values())
+    bookings = dispositions.get("BOOK", 0)
+    summary = {
+        "dials": dials,
+        "bookings": bookings,
+        "booking_rate": round(bookings / dials, 4) if dials else 0.0,
+        "dispositions": dict(sorted(dispositions.items())),
+    }
+    if active_hours is not None:
+        summary["active_hours"] = active_hours
+        summary["dials_per_hour"] = round(dials / active_hours, 2) if active_hours else 0.0
+    return summary
+
+
+def disposition_stats(start, end, agent_id=None):
+    """
+    Per-agent, per-campaign and total stats for hours in [start, end).
+    Reads only rollup rows, so cost depends on agents x hours, not leads worked.
+    """
+    rollups = DispositionRollup.objects.filter(hour__gte=hour_bucket(start), hour__lt=end)
+    if agent_id:
+        rollups = rollups.filter(agent_id=agent_id)
+    rows = rollups.values("agent_id", "agent__name", "sheet_id", "tab_name", "hour", "disposition").annotate(
+        total=Sum("count")
+    )
+
+    agents = defaultdict(lambda: {"name": "", "dispositions": Counter(), "hours": set()})
+    campaigns = defaultdict(Counter)
+    totals = Counter()
+    for row in rows:
+        agent = agents[row["agent_id"]]
+        agent["name"] = row["agent__name"]
+        agent["dispositions"][row["disposition"]] += row["total"]
+        agent["hours"].add(row["hour"])
+        campaigns[(row["sheet_id"], row["tab_name"])][row["disposition"]] += row["total"]
+        totals[row["disposition"]] += row["total"]
+
+    return {
+        "agents": [
+            {"agent_id": str(agent_id), "name": agent["name"], **_summarize(agent["dispositions"], len(agent["hours"]))}
+            for agent_id, agent in sorted(agents.items(), key=lambda item: item[1]["name"])
+        ],
+        "campaigns": [
+            {"sheet_id": sheet_id, "tab_name": tab_name, **_summarize(dispositions)}
+            for (sheet_id, tab_name), dispositions in sorted(campaigns.items())
+        ],
+        "totals": _summarize(totals),
+    }
@@ -0,0 +1,53 @@
+"""
+Database routing.
+
+Reads inside a ``replica_reads`` view (or a ``use_replica()`` block) go to the
+'replica' alias when one is configured. Writes, migrations and every other
+read stay on 'default'. Replica reads may lag slightly behind writes, so only
+use them for listings and reporting.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+
+REPLICA_ALIAS = "replica"
+
+_use_replica = ContextVar("use_replica", default=False)
+
+
+@contextmanager
+def use_replica():
+    """Route reads in this block to the replica, if configured."""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def replica_reads(handler):
+    """Decorator for APIView handler methods whose reads can go to the replica."""
+    @wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        with use_replica():
+            return handler(view, request, *args, **kwargs)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and REPLICA_ALIAS in settings.DATABASES:
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
@@ -0,0 +1,224 @@
+"""
+Lead routing: which qualified lead an agent is served next.
+
+Every qualified lead gets a score from settings.LEAD_ROUTING:
+
+- a base priority by kind: a due callback, a fresh lead, or a retry
+- callback urgency, growing with every hour the callback is overdue
+- age, growing with every day since a retry lead was last worked
+- an optional weight per value of a source column
+
+Ties go to the lower row, so the oldest rows come first. Leads are kept in
+two heaps per tab, rebuilt whenever the snapshot is refreshed. Premium leads
+(score at or above premium_score, e.g. due callbacks) go in one heap and
+the rest in the other, so each assignment is a heap pop. Entries that were
+locked or dispositioned since the heap was built are skipped when popped.
+
+Premium leads are shared evenly between agents, or between teams when
+fairness is "team", however often each one asks for a lead. Each group's
+recent requests and premium leads are counted with exponential decay. A
+group that is more than one lead ahead of an even share is served from the
+standard heap first while the others catch up. Shares are tracked per
+worker and reported by the metrics endpoint.
+"""
+import heapq
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import overlay
+from .utils import EXCLUDED_STATUSES, parse_callback_time
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _parse_timestamp(value):
+    try:
+        return timezone.make_aware(datetime.strptime(value, TIMESTAMP_FORMAT))
+    except ValueError:
+        return None
+
+
+def lead_score(lead, now, config=None):
+    """Routing score of a qualified lead dict; higher is served first."""
+    config = config or settings.LEAD_ROUTING
+    priorities = config["priorities"]
+    disposition = lead.get("Disposition", "")
+    if disposition == "CB":
+        score = priorities["callback"]
+        callback_at = parse_callback_time(lead.get("CB_Date", ""), lead.get("CB_Time", ""))
+        if callback_at is not None and callback_at < now:
+            score += config["callback_urgency_per_hour"] * (now - callback_at).total_seconds() / 3600
+    elif not disposition:
+        score = priorities["fresh"]
+    else:
+        score = priorities["retry"]
+        worked_at = _parse_timestamp(lead.get("Timestamp", ""))
+        if worked_at is not None and worked_at < now:
+            score += config["age_per_day"] * (now - worked_at).total_seconds() / 86400
+    source_column = config.get("source_column")
+    if source_column:
+        score += config["source_weights"].get(lead.get(source_column, ""), 0)
+    return score
+
+
+class FairShare:
+    """
+    Decayed counts of requests and premium leads served per fairness group.
+    Counts use forward decay: each event weighs 2^(t / half_life), so
+    ratios between groups never need the older counts rescaled.
+    """
+
+    def __init__(self, half_life):
+        self.half_life = half_life
+        self.started = time.monotonic()
+        self.requests = {}
+        self.premium = {}
+
+    def _weight(self):
+        weight = 2 ** ((time.monotonic() - self.started) / self.half_life)
+        if weight > 1e100:
+            # Rescale before the weights overflow
+            for counts in (self.requests, self.premium):
+                for group in counts:
+                    counts[group] /= weight
+            self.started = time.monotonic()
+            weight = 1.0
+        return weight
+
+    def ahead(self, group):
+        """
+        True if ``group`` has had more premium leads than an even share
+        between the active groups, by more than one lead. A group is active
+        while it made at least one request's worth of requests recently.
+        """
+        weight = self._weight()
+        active = sum(1 for count in self.requests.values() if count >= weight)
+        if not active:
+            return False
+        even_share = sum(self.premium.values()) / active
+        return self.premium.get(group, 0) > even_share + weight
+
+    def record(self, group, premium):
+        weight = self._weight()
+        self.requests[group] = self.requests.get(group, 0) + weight
+        if premium:
+            self.premium[group] = self.premium.get(group, 0) + weight
+
+    def shares(self):
+        """Each group's fraction of recent premium leads."""
+        total = sum(self.premium.values())
+        return {group: count / total for group, count in self.premium.items()} if total else {}
+
+
+class LeadRouter:
+    """Premium and standard heaps of (negated score, row index) for one snapshot of a tab."""
+
+    def __init__(self, snapshot, config=None, now=None):
+        config = config or settings.LEAD_ROUTING
+        now = now or timezone.now()
+        self.snapshot = snapshot
+        self.fetched_at = snapshot.fetched_at
+        self.premium = []
+        self.standard = []
+        for lead in snapshot.qualified_leads(now):
+            score = lead_score(lead, now, config)
+            heap = self.premium if score >= config["premium_score"] else self.standard
+            heap.append((-score, lead["row_index"]))
+        heapq.heapify(self.premium)
+        heapq.heapify(self.standard)
+        self.queued = {row_index for _, row_index in self.premium + self.standard}
+        self.popped = set()
+
+    def __len__(self):
+        return len(self.premium) + len(self.standard)
+
+    def claimable(self):
+        """
+        Leads left that can still be claimed: those not yet popped, less any
+        the overlay shows were locked or dispositioned out of the queue since
+        the heaps were built.
+        """
+        closed = {
+            row_index
+            for row_index, values in overlay.pending(self.snapshot.sheet_id, self.snapshot.tab_name).items()
+            if row_index in self.queued
+            and (values.get("Lock_Status", "").strip() or values.get("Disposition") in EXCLUDED_STATUSES)
+        }
+        return len(self.queued) - len(self.popped | closed)
+
+    def pop(self, agent_id, premium_first=True):
+        """
+        Pop the best lead this agent can claim, premium heap first unless
+        ``premium_first`` is False. Returns (lead, premium) or (None, False).
+        """
+        heaps = (self.premium, self.standard) if premium_first else (self.standard, self.premium)
+        snapshot = self.snapshot
+        for heap in heaps:
+            while heap:
+                _, row_index = heapq.heappop(heap)
+                self.popped.add(row_index)
+                position = row_index - 2
+                if not snapshot.is_open(position):
+                    continue
+                if overlay.claim(snapshot.sheet_id, snapshot.tab_name, row_index, agent_id):
+                    return snapshot.record(position), heap is self.premium
+        return None, False
+
+
+def fairness_group(user, config=None):
+    """Key premium leads are shared between: the agent, or their team."""
+    config = config or settings.LEAD_ROUTING
+    if config["fairness"] == "team" and getattr(user, "team", ""):
+        return f"team:{user.team}"
+    return f"agent:{user.pk}"
+
+
+# ----------------------
+# Per-worker routers
+# ----------------------
+_routers = {}
+_fair_shares = {}
+_lock = threading.Lock()
+
+
+def next_lead(snapshot, user):
+    """
+    Claim the next lead for ``user`` from a tab's snapshot.
+    Returns (lead or None, leads left that can still be claimed).
+    """
+    config = settings.LEAD_ROUTING
+    key = (snapshot.sheet_id, snapshot.tab_name)
+    with _lock:
+        router = _routers.get(key)
+        if router is None or router.snapshot is not snapshot or router.fetched_at != snapshot.fetched_at:
+            router = _routers[key] = LeadRouter(snapshot, config)
+        fair_share = _fair_shares.get(key)
+        if fair_share is None:
+            fair_share = _fair_shares[key] = FairShare(config["fairness_half_life"])
+
+        group = fairness_group(user, config) if config["fairness"] else None
+        premium_first = group is None or not fair_share.ahead(group)
+        lead, premium = router.pop(user.pk, premium_first)
+        if lead is not None and group is not None:
+            fair_share.record(group, premium)
+        return lead, router.claimable()
+
+
+def routing_metrics():
+    """This worker's recent premium lead share per fairness group, per tab."""
+    with _lock:
+        return [
+            {"sheet_id": sheet_id, "tab_name": tab_name, "premium_shares": fair_share.shares()}
+            for (sheet_id, tab_name), fair_share in _fair_shares.items()
+        ]
+
+
+def reset_routers():
+    with _lock:
+        _routers.clear()
+        _fair_shares.clear()
@@ -0,0 +1,172 @@
+"""
+In-memory lead search.
+
+The index is built once per sheet snapshot and then patched row by row as
+the snapshot changes. Text columns go into an inverted index whose terms are
+kept sorted, so a prefix query is a bisect plus a short scan. Phone numbers are kept as sorted digit strings, forwards and reversed,
+so "555 12" finds numbers starting with those digits and "4567" finds
+numbers ending with them.
+"""
+import bisect
+import re
+import threading
+from collections import defaultdict
+
+
+PHONE_COLUMN = "Phone Number"
+
+# Bookkeeping and script columns that nobody searches by
+UNINDEXED_COLUMNS = {
+    "Message",
+    "Disposition",
+    "Agent_ID",
+    "Timestamp",
+    "Lock_Status",
+    "CB_Date",
+    "CB_Time",
+    "Appointment_Date",
+    "Appointment_Time",
+}
+
+# Fewest digits a phone query needs before it is matched against numbers
+MIN_PHONE_QUERY_DIGITS = 3
+
+_TOKEN_RE = re.compile(r"[^\W_]+")
+_NON_DIGITS = re.compile(r"\D")
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.casefold())
+
+
+def phone_digits(value):
+    """Digits of a phone number with the US country code dropped."""
+    digits = _NON_DIGITS.sub("", value)
+    if len(digits) == 11 and digits[0] == "1":
+        digits = digits[1:]
+    return digits
+
+
+class _PrefixIndex:
+    """Sorted keys, each with the sorted list of row positions it appears in."""
+
+    def __init__(self, postings):
+        self.postings = postings
+        self.keys = sorted(postings)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, position):
+        positions = self.postings.get(key)
+        if positions is None:
+            self.postings[key] = [position]
+            bisect.insort(self.keys, key)
+        else:
+            bisect.insort(positions, position)
+
+    def discard(self, key, position):
+        positions = self.postings.get(key)
+        if positions is None:
+            return
+        i = bisect.bisect_left(positions, position)
+        if i < len(positions) and positions[i] == position:
+            del positions[i]
+        if not positions:
+            del self.postings[key]
+            del self.keys[bisect.bisect_left(self.keys, key)]
+
+    def matches(self, prefix):
+        """Positions under every key that starts with ``prefix``."""
+        matches = set()
+        for i in range(bisect.bisect_left(self.keys, prefix), len(self.keys)):
+            key = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            matches.update(self.postings[key])
+        return matches
+
+
+class LeadSearchIndex:
+    """
+    Prefix index over the text and phone columns of a snapshot's rows.
+    Rows can be re-indexed one at a time as the snapshot changes.
+    """
+
+    def __init__(self, headers, rows):
+        self._text_columns = [
+            i for i, header in enumerate(headers)
+            if header not in UNINDEXED_COLUMNS and header != PHONE_COLUMN
+        ]
+        self._phone_idx = headers.index(PHONE_COLUMN) if PHONE_COLUMN in headers else None
+        self._lock = threading.Lock()
+
+        postings = defaultdict(list)
+        phones = defaultdict(list)
+        for position, row in enumerate(rows):
+            terms, digits = self._keys(row)
+            for term in terms:
+                postings[term].append(position)
+            if digits:
+                phones[digits].append(position)
+
+        self.terms = _PrefixIndex(dict(postings))
+        self.phone_prefixes = _PrefixIndex(dict(phones))
+        self.phone_suffixes = _PrefixIndex({digits[::-1]: list(positions) for digits, positions in phones.items()})
+
+    def _keys(self, row):
+        """Search terms and phone digits of one row."""
+        terms = set()
+        if row is None:
+            return terms, ""
+        for i in self._text_columns:
+            if i < len(row) and row[i]:
+                terms.update(tokenize(row[i]))
+        digits = ""
+        if self._phone_idx is not None and self._phone_idx < len(row):
+            digits = phone_digits(row[self._phone_idx])
+        return terms, digits
+
+    def update(self, position, old_row, new_row):
+        """Re-index the row at ``position``; ``old_row`` is None for an insert, ``new_row`` for a delete."""
+        old_terms, old_digits = self._keys(old_row)
+        new_terms, new_digits = self._keys(new_row)
+        with self._lock:
+            for term in old_terms - new_terms:
+                self.terms.discard(term, position)
+            for term in new_terms - old_terms:
+                self.terms.add(term, position)
+            if old_digits != new_digits:
+                if old_digits:
+                    self.phone_prefixes.discard(old_digits, position)
+                    self.phone_suffixes.discard(old_digits[::-1], position)
+                if new_digits:
+                    self.phone_prefixes.add(new_digits, position)
+                    self.phone_suffixes.add(new_digits[::-1], position)
+
+    def _phone_matches(self, digits):
+        return self.phone_prefixes.matches(digits) | self.phone_suffixes.matches(digits[::-1])
+
+    def search(self, query):
+        """
+        Positions of rows matching every word of ``query`` as a prefix, in sheet
+        order. A query without letters is also matched against phone numbers.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+
+        with self._lock:
+            matches = None
+            for word in sorted(words, key=len, reverse=True):
+                word_matches = self.terms.matches(word)
+                matches = word_matches if matches is None else matches & word_matches
+                if not matches:
+                    break
+
+            if not any(char.isalpha() for char in query):
+                digits = phone_digits(query)
+                if len(digits) >= MIN_PHONE_QUERY_DIGITS:
+                    matches |= self._phone_matches(digits)
+
+        return sorted(matches)
@@ -14,6 +14,7 @@ class UserSerializer(serializers.ModelSerializer):
             "email",
             "role",
             "status",
+            "team",
             "password",
             "last_login",
             "created_at",
@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import overlay
+from .appointments import invalidate_calendar_index
+from .authentication import evict_user
+from .invalidation import publish, register
+from .models import Appointment, Availability, SheetConfig, User
+from .snapshot import cached_snapshot, invalidate_snapshot
+from .suppression import invalidate_suppressed_numbers
+from .utils import CONFIG_CACHE_KEY, headers_cache_key
+
+
+# ----------------------
+# Invalidation handlers
+# ----------------------
+def evict_sheet_config(sheet_id=None, tab_name=None):
+    """Drop cached config, column maps and snapshots for a tab (or the current one)."""
+    if sheet_id is None:
+        config = cache.get(CONFIG_CACHE_KEY)
+        if config is not None:
+            sheet_id, tab_name = config.sheet_id, config.tab_name
+    keys = [CONFIG_CACHE_KEY]
+    if sheet_id is not None:
+        keys.append(headers_cache_key(sheet_id, tab_name))
+    cache.delete_many(keys)
+    invalidate_snapshot()
+
+
+def overlay_rows(sheet_id=None, tab_name=None, rows=None):
+    """Writes were journaled for some rows; overlay them on the tab's snapshot."""
+    if sheet_id is None or rows is None:
+        invalidate_snapshot()
+        return
+    snapshot = cached_snapshot(sheet_id, tab_name)
+    for row_index, values in rows:
+        overlay.record(sheet_id, tab_name, row_index, values)
+        if snapshot is not None:
+            snapshot.apply_values(row_index, values)
+
+
+register("sheet_config", evict_sheet_config)
+register("user", evict_user)
+register("rows", overlay_rows)
+register("suppression", lambda: invalidate_suppressed_numbers())
+register("calendar", lambda: invalidate_calendar_index())
+
+
+# ----------------------
+# Model signals
+# ----------------------
+@receiver(post_save, sender=SheetConfig)
+@receiver(post_delete, sender=SheetConfig)
+def invalidate_sheet_config(sender, instance, **kwargs):
+    """Drop cached config and column maps when the sheet configuration changes."""
+    publish("sheet_config", sheet_id=instance.sheet_id, tab_name=instance.tab_name)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user(sender, instance, **kwargs):
+    """Role and status changes must reach every worker's user cache."""
+    publish("user", user_id=str(instance.pk))
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_save, sender=Availability)
+@receiver(post_delete, sender=Availability)
+def invalidate_calendar(sender, instance, **kwargs):
+    """Rebuild slot indexes once the change is committed."""
+    publish("calendar")
@@ -0,0 +1,491 @@
+"""
+Per-process snapshots of the lead sheet.
+
+A snapshot is one full read of a tab, kept for SHEET_SNAPSHOT_TTL seconds and
+shared by the lead queue, overview and search so they don't each hit Google
+Sheets. Pending writes from the overlay are applied on load and as they
+happen, so a snapshot always reflects this app's own locks and dispositions.
+Columns are extracted lazily, one list per column, so aggregations only
+touch the columns they need.
+
+Once built, a snapshot is refreshed rather than replaced: each read is
+diffed against the previous one by row hash (see api/delta.py) and only the
+inserted, changed and deleted rows are applied to the overview counts, the
+search index and the sheet DNC set.
+
+When SHEET_SNAPSHOT_DIR is set, a refresher process (``manage.py
+refresh_snapshots``) keeps a columnar copy of the tab on disk (see
+api/snapshotfile.py) and workers map that file instead of reading the sheet
+themselves, falling back to their own read only if it goes stale.
+"""
+import bisect
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from . import overlay
+from .a1 import quote_tab
+from .backends import get_sheet_backend
+from .delta import column_fingerprint, diff_rows, row_hash
+from .search import LeadSearchIndex
+from .snapshotfile import MappedRows, open_snapshot, snapshot_path, touch_snapshot, write_snapshot
+from .suppression import PhoneFilter, dnc_numbers, normalize_phone, suppressed_numbers
+from .utils import EXCLUDED_STATUSES, LOCK_PREFIX, headers_cache_key, parse_callback_time
+
+
+class SheetSnapshot:
+    """Header row plus data rows of one tab, with cached column extraction."""
+
+    def __init__(self, sheet_id, tab_name, headers, rows, fetched_at=None, source=None):
+        self.sheet_id = sheet_id
+        self.tab_name = tab_name
+        self.headers = headers
+        self.rows = rows
+        self.fetched_at = fetched_at or timezone.now()
+        self.loaded_at = time.monotonic()
+        # The MappedTab that ``rows`` come from, for snapshots mapped from a shared file
+        self.source = source
+        self.expired_at = None
+        self.fingerprint = column_fingerprint(headers)
+        self._hashes = None
+        self._columns = {}
+        self._positions = {name: i for i, name in enumerate(headers)}
+        self._lock = threading.Lock()
+        self._overview = None
+        self._search_index = None
+        self._dnc = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def hashes(self):
+        """Row hashes, computed on first use (only refreshes need them)."""
+        if self._hashes is None:
+            self._hashes = list(map(row_hash, self.rows))
+        return self._hashes
+
+    @staticmethod
+    def row_index(position):
+        """Sheet row number of the data row at ``position`` (data starts on row 2)."""
+        return position + 2
+
+    def column(self, name):
+        """All values of one column, '' where a row is short or the column is missing."""
+        values = self._columns.get(name)
+        if values is None:
+            idx = self._positions.get(name)
+            if idx is None:
+                values = [""] * len(self.rows)
+            elif isinstance(self.rows, MappedRows):
+                values = self.rows.column(idx)
+            else:
+                values = [row[idx] if idx < len(row) else "" for row in self.rows]
+            self._columns[name] = values
+        return values
+
+    def _cell(self, row, name):
+        idx = self._positions.get(name)
+        return row[idx] if idx is not None and idx < len(row) else ""
+
+    def record(self, position):
+        """Lead dict for one data row, shaped like fetch_qualified_leads output."""
+        row = self.rows[position]
+        lead = {header: row[i] if i < len(row) else "" for i, header in enumerate(self.headers)}
+        lead["row_index"] = self.row_index(position)
+        return lead
+
+    def is_open(self, position):
+        """True if the row at ``position`` is unlocked and its disposition keeps it in the queue."""
+        if not 0 <= position < len(self.rows):
+            return False
+        row = self.rows[position]
+        return not self._cell(row, "Lock_Status").strip() and self._cell(row, "Disposition") not in EXCLUDED_STATUSES
+
+    def apply_values(self, row_index, values):
+        """Set named cells of one row, keeping cached columns and indexes in step."""
+        position = row_index - 2
+        if not 0 <= position < len(self.rows):
+            return
+        with self._lock:
+            row = overlay.apply_values(self.rows[position], self._positions, values)
+            self._replace(position, row, row_hash(row))
+
+    def refresh(self, headers, rows, fetched_at=None):
+        """
+        Bring the snapshot up to date with a fresh read of the tab, re-indexing
+        only the rows whose hash changed. Returns the RowDelta, or None if the
+        column layout changed and the snapshot has to be rebuilt instead.
+        """
+        if column_fingerprint(headers) != self.fingerprint:
+            return None
+        hashes = list(map(row_hash, rows))
+        with self._lock:
+            delta = diff_rows(self.hashes, hashes)
+            for position in delta.changed:
+                self._replace(position, rows[position], hashes[position])
+            if delta.shifted:
+                # Every later row moved, so positional caches are rebuilt on demand
+                for position in delta.deleted:
+                    self._count(self.rows[position], -1)
+                for position in delta.inserted:
+                    self._count(rows[position], 1)
+                self._columns = {}
+                self._search_index = None
+            elif delta.inserted or delta.deleted:
+                for position in delta.deleted:
+                    self._reindex(position, self.rows[position], None)
+                for position in delta.inserted:
+                    self._reindex(position, None, rows[position])
+                # Fresh lists, so a reader midway through a pass keeps a consistent view
+                self._columns = {
+                    name: values[:len(rows)] + [self._cell(rows[position], name) for position in delta.inserted]
+                    for name, values in self._columns.items()
+                }
+            self.rows = rows
+            self._hashes = hashes
+            self.source = None
+            self.fetched_at = fetched_at or timezone.now()
+            self.loaded_at = time.monotonic()
+        return delta
+
+    def _replace(self, position, row, digest):
+        """Swap in a new version of one row and patch what is built on it (caller holds _lock)."""
+        if digest == self.hashes[position]:
+            return
+        self._reindex(position, self.rows[position], row)
+        self.rows[position] = row
+        self.hashes[position] = digest
+        for name, values in self._columns.items():
+            values[position] = self._cell(row, name)
+
+    def _reindex(self, position, old_row, new_row):
+        if old_row is not None:
+            self._count(old_row, -1)
+        if new_row is not None:
+            self._count(new_row, 1)
+        if self._search_index is not None:
+            self._search_index.update(position, old_row, new_row)
+
+    def _count(self, row, sign):
+        """Add (sign=1) or remove (sign=-1) one row from the order-independent summaries."""
+        disposition = self._cell(row, "Disposition")
+        if self._overview is not None:
+            self._overview.count(
+                disposition,
+                self._cell(row, "Lock_Status"),
+                self._cell(row, "CB_Date"),
+                self._cell(row, "CB_Time"),
+                sign,
+            )
+        if self._dnc is not None and disposition == "DNC":
+            phone = normalize_phone(self._cell(row, "Phone Number"))
+            if phone is not None:
+                self._dnc[phone] += sign
+                if self._dnc[phone] <= 0:
+                    del self._dnc[phone]
+
+    def dnc_numbers(self):
+        """Numbers dispositioned DNC anywhere in the tab."""
+        with self._lock:
+            if self._dnc is None:
+                self._dnc = dnc_numbers(self.column("Phone Number"), self.column("Disposition"))
+            return frozenset(self._dnc)
+
+    def qualified_leads(self, now=None):
+        """
+        Leads that can be served, in sheet order:
+        - not locked, and Disposition not in EXCLUDED_STATUSES
+        - CB leads only once their callback time has passed
+        - phone not suppressed (DNC anywhere in the sheet or on the uploaded
+          list) and not a duplicate of an earlier row
+        """
+        now = now or timezone.now()
+        phone_filter = PhoneFilter(suppressed_numbers(), self.dnc_numbers())
+        dispositions = self.column("Disposition")
+        locks = self.column("Lock_Status")
+        cb_dates = self.column("CB_Date")
+        cb_times = self.column("CB_Time")
+        phones = self.column("Phone Number")
+
+        qualified = []
+        for position, (disposition, lock, phone) in enumerate(zip(dispositions, locks, phones)):
+            # Duplicates are judged against every earlier row, served or not
+            if not phone_filter.allows(phone):
+                continue
+            if lock.strip() or disposition in EXCLUDED_STATUSES:
+                continue
+            if disposition == "CB":
+                callback_at = parse_callback_time(cb_dates[position], cb_times[position])
+                if callback_at is None or callback_at > now:
+                    continue
+            qualified.append(self.record(position))
+        return qualified
+
+    def search_index(self):
+        """Lead search index over this snapshot, built on first use."""
+        with self._lock:
+            if self._search_index is None:
+                self._search_index = LeadSearchIndex(self.headers, self.rows)
+        return self._search_index
+
+    def overview(self, now=None):
+        """Queue overview; the columnar pass runs once per snapshot, callbacks are bisected per call."""
+        now = now or timezone.now()
+        with self._lock:
+            if self._overview is None:
+                self._overview = QueueSummary(
+                    self.column("Disposition"),
+                    self.column("Lock_Status"),
+                    self.column("CB_Date"),
+                    self.column("CB_Time"),
+                )
+            return {"as_of": self.fetched_at, "total": len(self.rows), **self._overview.as_dict(now)}
+
+
+class QueueSummary:
+    """
+    Counts behind the queue overview. Built in one columnar pass, then kept
+    current row by row as the snapshot changes.
+    """
+
+    def __init__(self, dispositions, locks, cb_dates, cb_times):
+        self.by_disposition = Counter(dispositions)
+        self.locked_by_agent = Counter(_lock_owner(lock) for lock in locks if lock.strip())
+        self.fresh = 0
+        self.available = 0
+        callbacks = Counter()
+        for disposition, lock, cb_date, cb_time in zip(dispositions, locks, cb_dates, cb_times):
+            locked = bool(lock.strip())
+            if disposition == "CB":
+                callbacks[cb_date, cb_time, locked] += 1
+            elif not locked and disposition not in EXCLUDED_STATUSES:
+                self.available += 1
+                if not disposition:
+                    self.fresh += 1
+
+        # Callback slots repeat heavily, so parse each distinct date/time once
+        self.invalid_callbacks = 0
+        self.callback_times = []
+        self.open_callback_times = []
+        for (cb_date, cb_time, locked), count in callbacks.items():
+            moment = parse_callback_time(cb_date, cb_time)
+            if moment is None:
+                self.invalid_callbacks += count
+                continue
+            self.callback_times.extend([moment] * count)
+            if not locked:
+                self.open_callback_times.extend([moment] * count)
+        self.callback_times.sort()
+        self.open_callback_times.sort()
+
+    def count(self, disposition, lock, cb_date, cb_time, sign=1):
+        """Add (sign=1) or remove (sign=-1) one row."""
+        _adjust(self.by_disposition, disposition, sign)
+        locked = bool(lock.strip())
+        if locked:
+            _adjust(self.locked_by_agent, _lock_owner(lock), sign)
+        if disposition == "CB":
+            moment = parse_callback_time(cb_date, cb_time)
+            if moment is None:
+                self.invalid_callbacks += sign
+                return
+            _adjust_sorted(self.callback_times, moment, sign)
+            if not locked:
+                _adjust_sorted(self.open_callback_times, moment, sign)
+        elif not locked and disposition not in EXCLUDED_STATUSES:
+            self.available += sign
+            if not disposition:
+                self.fresh += sign
+
+    def as_dict(self, now):
+        due = bisect.bisect_right(self.callback_times, now)
+        open_due = bisect.bisect_right(self.open_callback_times, now)
+        return {
+            "by_disposition": {
+                disposition or "(none)": count for disposition, count in sorted(self.by_disposition.items())
+            },
+            "fresh": self.fresh,
+            "locked": sum(self.locked_by_agent.values()),
+            "locked_by_agent": dict(self.locked_by_agent.most_common()),
+            "callbacks": {
+                "due": due,
+                "future": len(self.callback_times) - due,
+                "invalid": self.invalid_callbacks,
+            },
+            "available": self.available + open_due,
+        }
+
+
+def _lock_owner(lock):
+    return lock[len(LOCK_PREFIX):] if lock.startswith(LOCK_PREFIX) else lock.strip()
+
+
+def _adjust(counter, key, sign):
+    counter[key] += sign
+    if counter[key] <= 0:
+        del counter[key]
+
+
+def _adjust_sorted(values, value, sign):
+    if sign > 0:
+        bisect.insort(values, value)
+    else:
+        del values[bisect.bisect_left(values, value)]
+
+
+# ----------------------
+# Snapshot cache
+# ----------------------
+_snapshots = {}
+_snapshot_locks = {}
+_registry_lock = threading.Lock()
+
+
+def fetch_tab(sheet_id, tab_name):
+    """Read the whole tab as the sheet has it. Returns (headers, data rows)."""
+    rows = get_sheet_backend().get_values(sheet_id, quote_tab(tab_name))
+    headers = rows[0] if rows else []
+    cache.set(headers_cache_key(sheet_id, tab_name), headers, settings.SHEET_HEADER_CACHE_TTL)
+    return headers, rows[1:]
+
+
+def read_tab(sheet_id, tab_name):
+    """Read the whole tab and apply pending overlay entries. Returns (headers, data rows)."""
+    headers, data_rows = fetch_tab(sheet_id, tab_name)
+    overlay.reconcile(sheet_id, tab_name, headers, data_rows)
+    return headers, data_rows
+
+
+def load_snapshot(sheet_id, tab_name):
+    """Map the shared snapshot file if it is fresh enough, otherwise build a snapshot from a full read."""
+    snapshot = shared_snapshot(sheet_id, tab_name, settings.SHEET_SNAPSHOT_TTL)
+    if snapshot is not None:
+        return snapshot
+    headers, rows = read_tab(sheet_id, tab_name)
+    return SheetSnapshot(sheet_id, tab_name, headers, rows)
+
+
+def refresh_snapshot(snapshot):
+    """
+    Re-read a snapshot's tab and apply only the rows that changed. Returns the
+    snapshot to use from now on: the same object, or a rebuilt one if the
+    column layout changed.
+    """
+    headers, rows = read_tab(snapshot.sheet_id, snapshot.tab_name)
+    if snapshot.refresh(headers, rows) is None:
+        return SheetSnapshot(snapshot.sheet_id, snapshot.tab_name, headers, rows)
+    return snapshot
+
+
+def get_snapshot(sheet_id, tab_name, max_age=None):
+    """
+    Return a snapshot no older than ``max_age`` seconds (SHEET_SNAPSHOT_TTL by
+    default). A stale snapshot is refreshed in place from a fresh read. Only
+    one thread per tab refreshes; the others wait for its result.
+    """
+    if max_age is None:
+        max_age = settings.SHEET_SNAPSHOT_TTL
+    key = (sheet_id, tab_name)
+
+    snapshot = _snapshots.get(key)
+    if snapshot is not None and time.monotonic() - snapshot.loaded_at <= max_age:
+        return snapshot
+
+    with _registry_lock:
+        lock = _snapshot_locks.setdefault(key, threading.Lock())
+    with lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is None:
+            snapshot = load_snapshot(sheet_id, tab_name)
+        elif time.monotonic() - snapshot.loaded_at > max_age:
+            snapshot = shared_snapshot(sheet_id, tab_name, max_age, snapshot) or refresh_snapshot(snapshot)
+        _snapshots[key] = snapshot
+    return snapshot
+
+
+def cached_snapshot(sheet_id, tab_name):
+    """The snapshot currently held for a tab, however old, or None."""
+    return _snapshots.get((sheet_id, tab_name))
+
+
+def fetch_qualified_leads(sheet_id, tab_name):
+    """Qualified leads from the current snapshot (see SheetSnapshot.qualified_leads)."""
+    return get_snapshot(sheet_id, tab_name).qualified_leads()
+
+
+def expire_snapshot(sheet_id, tab_name):
+    """Mark a tab's snapshot stale so the next reader refreshes it from the sheet."""
+    snapshot = _snapshots.get((sheet_id, tab_name))
+    if snapshot is not None:
+        snapshot.loaded_at = float("-inf")
+        # A shared file written before now doesn't count as a refresh
+        snapshot.expired_at = timezone.now()
+
+
+def invalidate_snapshot(sheet_id=None, tab_name=None):
+    """Drop the cached snapshot (or all of them) so the next reader fetches a fresh one."""
+    if sheet_id is None:
+        _snapshots.clear()
+    else:
+        _snapshots.pop((sheet_id, tab_name), None)
+
+
+# ----------------------
+# Shared snapshot files
+# ----------------------
+def shared_snapshot(sheet_id, tab_name, max_age, current=None):
+    """
+    Snapshot mapped from the tab's shared file, or None if there is no file
+    or it was last confirmed against the sheet more than ``max_age`` seconds
+    ago. ``current`` is kept, with its fetch time moved forward, while the
+    file is the one it was mapped from.
+    """
+    path = snapshot_path(sheet_id, tab_name)
+    if path is None:
+        return None
+    if current is not None and current.source is not None and current.source.is_current():
+        mapped = current.source
+    else:
+        mapped = open_snapshot(path)
+        if mapped is None:
+            return None
+
+    fetched_at = mapped.fetched_at
+    age = (timezone.now() - fetched_at).total_seconds()
+    if age > max_age or (current is not None and current.expired_at and fetched_at < current.expired_at):
+        return None
+    if current is not None and mapped is current.source:
+        current.fetched_at = fetched_at
+        current.loaded_at = time.monotonic() - age
+        return current
+
+    cache.set(headers_cache_key(sheet_id, tab_name), mapped.headers, settings.SHEET_HEADER_CACHE_TTL)
+    overlay.reconcile(sheet_id, tab_name, mapped.headers, mapped.rows)
+    snapshot = SheetSnapshot(sheet_id, tab_name, mapped.headers, mapped.rows, fetched_at, source=mapped)
+    snapshot.loaded_at -= age
+    return snapshot
+
+
+def publish_snapshot(sheet_id, tab_name, previous=None):
+    """
+    Read a tab and write it to its shared file for the workers to map. If the
+    rows hash the same as ``previous`` (this function's last return value)
+    only the file's fetch time is updated. Returns the row hashes read.
+    """
+    path = snapshot_path(sheet_id, tab_name)
+    if path is None:
+        raise ValueError("SHEET_SNAPSHOT_DIR is not set")
+    fetched_at = timezone.now()
+    headers, rows = fetch_tab(sheet_id, tab_name)
+    hashes = (column_fingerprint(headers), list(map(row_hash, rows)))
+    if hashes == previous and os.path.exists(path):
+        touch_snapshot(path, fetched_at)
+    else:
+        write_snapshot(path, sheet_id, tab_name, headers, rows, fetched_at)
+    return hashes
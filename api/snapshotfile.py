@@ -0,0 +1,243 @@
+"""
+Columnar snapshot files shared by every worker on a host.
+
+``manage.py refresh_snapshots`` reads the lead tab and writes it to
+SHEET_SNAPSHOT_DIR in a compact columnar layout. Workers map the file
+read-only, so its pages are shared between them through the page cache
+instead of each worker holding its own copy of every row, and a freshly
+started worker can serve leads without reading the sheet first.
+
+Layout (native byte order, every section 8-byte aligned):
+
+- header: magic, fetched_at (float64 Unix time), metadata length
+- metadata: JSON with the sheet, tab, header row, row count and the
+  offset of every section below
+- row lengths: one uint32 per row, so short rows read back as short rows
+- per column: a string table (uint32 offsets into a UTF-8 heap of the
+  column's distinct values) and one uint32 code per row into that table
+
+Files are replaced atomically with os.replace(), so a worker that still
+maps the previous file keeps a consistent view until it opens the new one.
+When a read shows no changes the refresher only rewrites fetched_at in
+place, which mapped readers see immediately.
+"""
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from datetime import datetime, timezone as dt_timezone
+from itertools import accumulate
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"RAULSNP1"
+# magic, fetched_at, metadata length, padding
+HEADER = struct.Struct("=8sdI4x")
+FETCHED_AT_OFFSET = len(MAGIC)
+ALIGNMENT = 8
+
+assert array("I").itemsize == 4, "snapshot files need a 4-byte unsigned int array type"
+
+
+def snapshot_path(sheet_id, tab_name):
+    """Where the shared snapshot of a tab lives, or None when SHEET_SNAPSHOT_DIR is unset."""
+    directory = settings.SHEET_SNAPSHOT_DIR
+    if not directory:
+        return None
+    digest = hashlib.sha1(f"{sheet_id}\0{tab_name}".encode()).hexdigest()[:20]
+    return os.path.join(directory, f"{digest}.snap")
+
+
+# ----------------------
+# Writing
+# ----------------------
+def _pad(length):
+    return -length % ALIGNMENT
+
+
+def _string_table(values):
+    """Distinct values as (offsets, heap) plus one code per value."""
+    distinct = {}
+    codes = array("I", [distinct.setdefault(value, len(distinct)) for value in values])
+    encoded = [value.encode() for value in distinct]
+    offsets = array("I", [0])
+    offsets.extend(accumulate(map(len, encoded)))
+    return offsets, b"".join(encoded), codes
+
+
+def write_snapshot(path, sheet_id, tab_name, headers, rows, fetched_at):
+    """Write a tab's rows to ``path`` in the columnar layout, replacing any previous file atomically."""
+    width = max(len(headers), max(map(len, rows), default=0))
+    sections = []
+    size = 0
+
+    def add(data):
+        nonlocal size
+        data = bytes(data)
+        start = size
+        sections.append(data + b"\0" * _pad(len(data)))
+        size += len(sections[-1])
+        return start
+
+    lengths = add(array("I", map(len, rows)))
+    columns = []
+    for idx in range(width):
+        offsets, heap, codes = _string_table([row[idx] if idx < len(row) else "" for row in rows])
+        columns.append([add(offsets), len(offsets), add(heap), add(codes)])
+
+    metadata = json.dumps({
+        "sheet_id": sheet_id,
+        "tab_name": tab_name,
+        "headers": headers,
+        "rows": len(rows),
+        "byteorder": sys.byteorder,
+        "lengths": lengths,
+        "columns": columns,
+    }).encode()
+    metadata += b" " * _pad(HEADER.size + len(metadata))
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snap-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, fetched_at.timestamp(), len(metadata)))
+            f.write(metadata)
+            for section in sections:
+                f.write(section)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def touch_snapshot(path, fetched_at):
+    """Mark an unchanged snapshot file as confirmed by a read at ``fetched_at``."""
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        os.pwrite(fd, struct.pack("=d", fetched_at.timestamp()), FETCHED_AT_OFFSET)
+    finally:
+        os.close(fd)
+
+
+# ----------------------
+# Reading
+# ----------------------
+class MappedRows:
+    """
+    The data rows of a snapshot file as a read-only-backed sequence of lists.
+    Cells are decoded from the mapping on access; rows assigned in this
+    process (overlay writes) are kept aside and take precedence.
+    """
+
+    def __init__(self, buffer, metadata, data_start):
+        self._count = metadata["rows"]
+        self._lengths = self._view(buffer, data_start + metadata["lengths"], self._count)
+        self._columns = [
+            (
+                self._view(buffer, data_start + offsets_start, table_size),
+                buffer[data_start + heap_start:data_start + codes_start],
+                self._view(buffer, data_start + codes_start, self._count),
+            )
+            for offsets_start, table_size, heap_start, codes_start in metadata["columns"]
+        ]
+        self._overrides = {}
+
+    @staticmethod
+    def _view(buffer, start, count):
+        return buffer[start:start + 4 * count].cast("I")
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += self._count
+        row = self._overrides.get(position)
+        if row is not None:
+            return row
+        if not 0 <= position < self._count:
+            raise IndexError("row position out of range")
+        return [self._cell(idx, position) for idx in range(self._lengths[position])]
+
+    def __setitem__(self, position, row):
+        if not 0 <= position < self._count:
+            raise IndexError("row position out of range")
+        self._overrides[position] = row
+
+    def __iter__(self):
+        for position in range(self._count):
+            yield self[position]
+
+    def _cell(self, idx, position):
+        offsets, heap, codes = self._columns[idx]
+        code = codes[position]
+        return str(heap[offsets[code]:offsets[code + 1]], "utf-8")
+
+    def column(self, idx):
+        """Every value of column ``idx`` as a list, decoding each distinct value once."""
+        if idx >= len(self._columns):
+            values = [""] * self._count
+        else:
+            offsets, heap, codes = self._columns[idx]
+            table = [str(heap[offsets[i]:offsets[i + 1]], "utf-8") for i in range(len(offsets) - 1)]
+            values = list(map(table.__getitem__, codes))
+        for position, row in self._overrides.items():
+            values[position] = row[idx] if idx < len(row) else ""
+        return values
+
+
+class MappedTab:
+    """An open snapshot file: its header row, mapped rows and live fetch time."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        self.identity = (stat.st_dev, stat.st_ino)
+
+        magic, _, metadata_size = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"Not a snapshot file: {path}")
+        metadata = json.loads(self._mmap[HEADER.size:HEADER.size + metadata_size])
+        if metadata["byteorder"] != sys.byteorder:
+            raise ValueError(f"Snapshot file was written with {metadata['byteorder']}-endian byte order")
+
+        self.sheet_id = metadata["sheet_id"]
+        self.tab_name = metadata["tab_name"]
+        self.headers = metadata["headers"]
+        self.rows = MappedRows(memoryview(self._mmap), metadata, HEADER.size + metadata_size)
+
+    @property
+    def fetched_at(self):
+        """When the refresher last confirmed this file against the sheet."""
+        (timestamp,) = struct.unpack_from("=d", self._mmap, FETCHED_AT_OFFSET)
+        return datetime.fromtimestamp(timestamp, dt_timezone.utc)
+
+    def is_current(self):
+        """True if the file at our path is still the one we mapped."""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return (stat.st_dev, stat.st_ino) == self.identity
+
+
+def open_snapshot(path):
+    """Map the snapshot file at ``path``; None if it is missing or unreadable."""
+    try:
+        return MappedTab(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, struct.error):
+        logger.warning("Ignoring unreadable snapshot file %s", path, exc_info=True)
+        return None
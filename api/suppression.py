@@ -0,0 +1,129 @@
+"""
+Phone-number suppression for lead qualification.
+
+Numbers are normalized to a single int (digits only, US country code
+dropped) so the uploaded do-not-call list can be held as a compact
+per-process frozenset and checked in O(1) per row. The set is reloaded
+from the database at most every SUPPRESSION_CACHE_TTL seconds.
+"""
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from .invalidation import publish
+from .models import SuppressedNumber
+
+
+_NON_DIGITS = re.compile(r"\D")
+
+# Shortest digit string accepted as a phone number
+MIN_PHONE_DIGITS = 7
+
+
+def normalize_phone(value):
+    """Return a phone number as an int of its digits, or None if it isn't one."""
+    digits = _NON_DIGITS.sub("", value or "")
+    if len(digits) == 11 and digits[0] == "1":
+        digits = digits[1:]
+    if len(digits) < MIN_PHONE_DIGITS:
+        return None
+    return int(digits)
+
+
+# ----------------------
+# Uploaded suppression list
+# ----------------------
+_suppressed = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def suppressed_numbers():
+    """The uploaded do-not-call list as a frozenset of normalized numbers."""
+    global _suppressed, _loaded_at
+    if _suppressed is None or time.monotonic() - _loaded_at > settings.SUPPRESSION_CACHE_TTL:
+        with _lock:
+            if _suppressed is None or time.monotonic() - _loaded_at > settings.SUPPRESSION_CACHE_TTL:
+                phones = SuppressedNumber.objects.order_by().values_list("phone", flat=True).iterator()
+                _suppressed = frozenset(int(phone) for phone in phones)
+                _loaded_at = time.monotonic()
+    return _suppressed
+
+
+def invalidate_suppressed_numbers():
+    """Force the next caller to reload the list from the database."""
+    global _suppressed
+    with _lock:
+        _suppressed = None
+
+
+def add_suppressed_numbers(values, added_by=None, batch_size=1000):
+    """
+    Add raw phone numbers to the list. Returns (added, invalid), where
+    numbers already on the list count as neither.
+    """
+    added = invalid = 0
+    batch = set()
+
+    def flush():
+        existing = set(SuppressedNumber.objects.filter(phone__in=batch).values_list("phone", flat=True))
+        new = batch - existing
+        SuppressedNumber.objects.bulk_create(
+            [SuppressedNumber(phone=phone, added_by=added_by) for phone in new],
+            ignore_conflicts=True,
+        )
+        batch.clear()
+        return len(new)
+
+    with transaction.atomic():
+        for value in values:
+            phone = normalize_phone(value)
+            if phone is None:
+                invalid += 1
+                continue
+            batch.add(str(phone))
+            if len(batch) >= batch_size:
+                added += flush()
+        if batch:
+            added += flush()
+
+    publish("suppression")
+    return added, invalid
+
+
+# ----------------------
+# Qualification filter
+# ----------------------
+def dnc_numbers(phones, dispositions):
+    """Counter of the normalized numbers dispositioned DNC in a tab, one count per row."""
+    dnc = Counter(normalize_phone(phone) for phone, disposition in zip(phones, dispositions) if disposition == "DNC")
+    dnc.pop(None, None)
+    return dnc
+
+
+class PhoneFilter:
+    """
+    Per-pass check that rejects suppressed and repeated numbers.
+    ``blocked`` is the uploaded list and ``dnc`` every number dispositioned
+    DNC in the sheet; a number seen on an earlier row is a duplicate.
+    """
+
+    def __init__(self, blocked, dnc=frozenset()):
+        self.blocked = blocked
+        self.dnc = dnc
+        self.seen = set()
+
+    def allows(self, value):
+        """Record the number and return False if it is suppressed or a duplicate."""
+        phone = normalize_phone(value)
+        if phone is None:
+            return True
+        if phone in self.seen or phone in self.blocked or phone in self.dnc:
+            self.seen.add(phone)
+            return False
+        self.seen.add(phone)
+        return True
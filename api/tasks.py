@@ -0,0 +1,79 @@
+"""
+Background job handlers, run by ``manage.py run_jobs`` (see api/jobs.py).
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .imports import run_import
+from .jobs import job_handler
+from .journal import record_mutations, replay_journal
+from .models import ImportJob, SheetMutation
+from .rollups import rebuild_rollups
+from .snapshot import get_snapshot
+from .utils import LOCK_PREFIX
+
+
+# Locks older than this past LEAD_LOCK_TTL are left alone rather than rescanned on every run
+REAP_LOOKBACK = timedelta(days=1)
+
+
+@job_handler("replay_journal", concurrency=1)
+def replay_journal_job():
+    replay_journal()
+
+
+@job_handler("import_leads", max_attempts=1, timeout=6 * 3600)
+def import_leads_job(import_job_id):
+    # run_import records its own failure on the ImportJob, so it is never retried blindly
+    run_import(ImportJob.objects.get(pk=import_job_id))
+
+
+@job_handler("rebuild_rollups", concurrency=1)
+def rebuild_rollups_job():
+    rebuild_rollups()
+
+
+@job_handler("reap_locks", concurrency=1)
+def reap_locks(ttl=None):
+    """
+    Release leads locked for longer than LEAD_LOCK_TTL seconds with nothing
+    journaled for them since, e.g. because the agent closed the app. A lock
+    is only released while the sheet still shows it. Returns how many.
+    """
+    cutoff = timezone.now() - timedelta(seconds=ttl or settings.LEAD_LOCK_TTL)
+    later = SheetMutation.objects.filter(
+        sheet_id=OuterRef("sheet_id"),
+        tab_name=OuterRef("tab_name"),
+        row_index=OuterRef("row_index"),
+        pk__gt=OuterRef("pk"),
+    )
+    stale = (
+        SheetMutation.objects.filter(
+            kind="lock", status="applied", created_at__lt=cutoff, created_at__gte=cutoff - REAP_LOOKBACK
+        )
+        .exclude(Exists(later))
+        .values_list("sheet_id", "tab_name", "row_index", "agent_id")
+    )
+    by_tab = defaultdict(list)
+    for sheet_id, tab_name, row_index, agent_id in stale:
+        by_tab[sheet_id, tab_name].append((row_index, agent_id))
+
+    released = 0
+    for (sheet_id, tab_name), locks in by_tab.items():
+        snapshot = get_snapshot(sheet_id, tab_name)
+        locks_column = snapshot.column("Lock_Status")
+        entries = [
+            ("unlock", row_index, None, None)
+            for row_index, agent_id in locks
+            if 0 <= row_index - 2 < len(locks_column) and locks_column[row_index - 2] == f"{LOCK_PREFIX}{agent_id}"
+        ]
+        if entries:
+            record_mutations(sheet_id, tab_name, entries)
+            released += len(entries)
+    if released:
+        replay_journal()
+    return released
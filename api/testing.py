@@ -0,0 +1,74 @@
+"""
+Test helpers for asserting per-request DB query and Sheets call budgets.
+"""
+from contextlib import ContextDecorator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+from .backends import add_observer, remove_observer
+
+
+# Transaction bookkeeping emitted by TestCase's wrapping atomic blocks; in
+# production these are BEGIN/COMMIT on the connection, not counted queries.
+TRANSACTION_STATEMENTS = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+class BudgetExceeded(AssertionError):
+    """Raised when a block runs more DB queries or Sheets calls than allowed."""
+
+
+def _format_calls(label, calls, limit):
+    """List the calls made, marking those beyond the budget with '+'."""
+    lines = [f"{label}: {len(calls)} made, budget {limit}"]
+    for number, call in enumerate(calls, start=1):
+        marker = "+" if number > limit else " "
+        lines.append(f"{marker} {number}. {call}")
+    return lines
+
+
+class budget(ContextDecorator):
+    """
+    Assert that a block (or decorated test) stays within a budget of DB
+    queries and Sheets backend calls. ``None`` means unlimited.
+
+        with budget(queries=2, sheet_calls=1, label="LeadQueueView"):
+            self.client.get("/api/leads/next/")
+    """
+
+    def __init__(self, queries=None, sheet_calls=None, label=None, using=DEFAULT_DB_ALIAS):
+        self.queries = queries
+        self.sheet_calls = sheet_calls
+        self.label = label
+        self.using = using
+
+    def __enter__(self):
+        self.sheet_log = []
+        self._capture = CaptureQueriesContext(connections[self.using])
+        self._capture.__enter__()
+        add_observer(self._record_sheet_call)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        remove_observer(self._record_sheet_call)
+        self._capture.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+
+        query_log = [
+            query["sql"] for query in self._capture.captured_queries
+            if not query["sql"].startswith(TRANSACTION_STATEMENTS)
+        ]
+        problems = []
+        if self.queries is not None and len(query_log) > self.queries:
+            problems.extend(_format_calls("DB queries", query_log, self.queries))
+        if self.sheet_calls is not None and len(self.sheet_log) > self.sheet_calls:
+            problems.extend(_format_calls("Sheets calls", self.sheet_log, self.sheet_calls))
+
+        if problems:
+            header = f"Budget exceeded for {self.label}" if self.label else "Budget exceeded"
+            raise BudgetExceeded("\n".join([header] + problems))
+        return False
+
+    def _record_sheet_call(self, record):
+        self.sheet_log.append(f"{record.method} {', '.join(record.ranges)}".strip())
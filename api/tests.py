@@ -1,3 +1,1547 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection, router
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import exports, jobs, overlay, routers, routing
+from .a1 import column_index, column_letter, format_range, parse_range, quote_tab
+from .admission import AdmissionController, Overloaded
+from .backends import FakeSheetBackend, QuotaExceeded, SheetBackendError, get_sheet_backend
+from .benchmarks import make_lead_rows, make_worked_rows
+from .cron import CronError, CronSchedule
+from .delta import diff_rows, row_hash
+from .invalidation import ORIGIN, _handle_payload, flush_all
+from .journal import record_mutation, replay_journal
+from .models import (
+    Appointment, Availability, DispositionEvent, Job, JobSchedule, User, SheetConfig, SheetMutation,
+)
+from .routers import REPLICA_ALIAS, replica_reads, use_replica
+from .snapshot import (
+    SheetSnapshot, expire_snapshot, fetch_qualified_leads, get_snapshot, invalidate_snapshot, publish_snapshot, read_tab,
+)
+from .snapshotfile import open_snapshot, snapshot_path
+from .suppression import normalize_phone
+from .tasks import reap_locks
+from .testing import budget, BudgetExceeded
+from .traces import RecordingBackend, ReplayBackend, TraceScrubber, load_trace, trace_summary
+from .warmup import warm_threads
+from .writes import WritePlan
+
+
+SHEET_ID = "test-sheet"
+TAB_NAME = "Leads"
+
+def reset_worker_caches():
+    """Start each test with cold per-process caches, as in a fresh worker."""
+    cache.clear()
+    flush_all()
+    overlay.clear()
+    routing.reset_routers()
+
+
+# Baseline budgets per endpoint invocation. Raising one of these should be a
+# deliberate decision reviewed alongside the change that needs it.
+ENDPOINT_BUDGETS = {
+    "LoginView": {"queries": 2, "sheet_calls": 0},
+    "UserManagementView.get": {"queries": 2, "sheet_calls": 0},
+    "UserManagementView.post": {"queries": 3, "sheet_calls": 0},
+    # Worst case: this worker reloads the do-not-call list. Sheet writes
+    # claim their journal entries and commit before the request is sent.
+    "LeadQueueView": {"queries": 7, "sheet_calls": 2},
+    # Worst case: the outcome opens a new hourly rollup bucket
+    "DispositionView": {"queries": 9, "sheet_calls": 2},
+}
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class EndpointBudgetTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.admin = User.objects.create_user("admin@example.com", "Admin", "secret-pass", role="admin")
+        self.agent = User.objects.create_user("agent@example.com", "Agent", "secret-pass")
+        SheetConfig.objects.create(sheet_id=SHEET_ID, tab_name=TAB_NAME)
+        get_sheet_backend().load_rows(SHEET_ID, TAB_NAME, make_lead_rows(20, seed=1))
+        self.client = APIClient()
+
+    def authenticate(self, user):
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def within_budget(self, name):
+        return budget(label=name, **ENDPOINT_BUDGETS[name])
+
+    def test_login(self):
+        with self.within_budget("LoginView"):
+            response = self.client.post(
+                "/api/login/", {"email": "agent@example.com", "password": "secret-pass"}, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_user_list(self):
+        User.objects.create_user("other@example.com", "Other", "secret-pass")
+        self.authenticate(self.admin)
+        with self.within_budget("UserManagementView.get"):
+            response = self.client.get("/api/users/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 3)
+
+    def test_user_create(self):
+        self.authenticate(self.admin)
+        with self.within_budget("UserManagementView.post"):
+            response = self.client.post(
+                "/api/users/", {"email": "new@example.com", "name": "New"}, format="json"
+            )
+        self.assertEqual(response.status_code, 201)
+
+    def test_lead_queue(self):
+        self.authenticate(self.agent)
+        with self.within_budget("LeadQueueView"):
+            response = self.client.get("/api/leads/next/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["lead"]["row_index"], 2)
+
+    def test_disposition(self):
+        self.authenticate(self.agent)
+        with self.within_budget("DispositionView"):
+            response = self.client.post(
+                "/api/leads/disposition/",
+                {"row_index": 2, "disposition": "CB", "extra_data": {"CB_Date": "2030-01-01", "CB_Time": "09:00"}},
+                format="json",
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_readiness_primes_caches(self):
+        response = self.client.get("/api/health/ready/")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["ready"])
+        self.assertIn("columns", response.data["steps"])
+
+        self.authenticate(self.agent)
+        with budget(queries=8, sheet_calls=1, label="DispositionView after warm-up"):
+            self.client.post("/api/leads/disposition/", {"row_index": 2, "disposition": "NA"}, format="json")
+
+    def test_budget_failure_lists_calls(self):
+        self.authenticate(self.agent)
+        with self.assertRaises(BudgetExceeded) as ctx:
+            with budget(queries=0, sheet_calls=0, label="LeadQueueView"):
+                self.client.get("/api/leads/next/")
+        message = str(ctx.exception)
+        self.assertIn("Budget exceeded for LeadQueueView", message)
+        self.assertIn("+ 1. get_values", message)
+        self.assertIn("+ 1. SELECT", message)
+
+
+class WarmThreadsTests(SimpleTestCase):
+    def test_every_pool_thread_is_warmed_once(self):
+        seen = []
+
+        def warm_thread():
+            seen.append(threading.get_ident())
+            if len(seen) == 4:
+                raise SheetBackendError("Sheets unavailable")
+
+        with ThreadPoolExecutor(max_workers=4) as pool, mock.patch("api.warmup.warm_thread", side_effect=warm_thread):
+            self.assertEqual(warm_threads(pool, 4), 3)
+        self.assertEqual(len(set(seen)), 4)
+
+
+class A1NotationTests(SimpleTestCase):
+    def test_column_letters_round_trip_past_z_and_az(self):
+        for index, letters in [(0, "A"), (25, "Z"), (26, "AA"), (51, "AZ"), (52, "BA"), (701, "ZZ"), (702, "AAA")]:
+            self.assertEqual(column_letter(index), letters)
+            self.assertEqual(column_index(letters), index)
+        with self.assertRaises(ValueError):
+            column_letter(-1)
+
+    def test_ranges_round_trip_with_quoted_tabs(self):
+        for range_name, parsed in [
+            ("Leads!D2:F2", ("Leads", 3, 2, 5, 2)),
+            ("Leads!J4", ("Leads", 9, 4, 9, 4)),
+            ("'Q3 Leads'!AA2:BA10", ("Q3 Leads", 26, 2, 52, 10)),
+            ("'O''Brien'!AZ7", ("O'Brien", 51, 7, 51, 7)),
+        ]:
+            self.assertEqual(parse_range(range_name), parsed)
+            self.assertEqual(format_range(*parsed), range_name)
+        self.assertEqual(quote_tab("Leads_2"), "Leads_2")
+        self.assertEqual(quote_tab("O'Brien"), "'O''Brien'")
+
+    def test_open_ended_ranges(self):
+        self.assertEqual(parse_range("Leads!B2:D"), ("Leads", 1, 2, 3, None))
+        self.assertEqual(parse_range("Leads!A:A"), ("Leads", 0, None, 0, None))
+        self.assertEqual(parse_range("'My Tab'!3:5"), ("My Tab", None, 3, None, 5))
+        self.assertEqual(parse_range("'My Tab'"), ("My Tab", None, None, None, None))
+        with self.assertRaises(ValueError):
+            parse_range("Leads!2B")
+
+
+class FakeSheetBackendTests(SimpleTestCase):
+    def test_quota_per_minute(self):
+        backend = FakeSheetBackend(quota_per_minute=3, sheets={SHEET_ID: {TAB_NAME: [["Name"]]}})
+        with mock.patch("api.backends.time.monotonic", return_value=1000.0):
+            for _ in range(3):
+                backend.get_values(SHEET_ID, TAB_NAME)
+            with self.assertRaises(QuotaExceeded):
+                backend.get_values(SHEET_ID, TAB_NAME)
+        with mock.patch("api.backends.time.monotonic", return_value=1061.0):
+            self.assertEqual(backend.get_values(SHEET_ID, TAB_NAME), [["Name"]])
+
+    def test_error_injection_is_reproducible_with_a_seed(self):
+        def outcomes(seed):
+            backend = FakeSheetBackend(error_rate=0.5, seed=seed, sheets={SHEET_ID: {TAB_NAME: [["Name"]]}})
+            results = []
+            for _ in range(40):
+                try:
+                    backend.get_values(SHEET_ID, TAB_NAME)
+                    results.append(True)
+                except SheetBackendError as e:
+                    self.assertNotIsInstance(e, QuotaExceeded)
+                    results.append(False)
+            return results
+
+        first = outcomes(seed=7)
+        self.assertEqual(first, outcomes(seed=7))
+        self.assertIn(True, first)
+        self.assertIn(False, first)
+
+    def test_latency_and_jitter(self):
+        backend = FakeSheetBackend(latency=0.2, jitter=0.1, seed=3, sheets={SHEET_ID: {TAB_NAME: [["Name"]]}})
+        with mock.patch("api.backends.time.sleep") as sleep:
+            for _ in range(20):
+                backend.get_values(SHEET_ID, TAB_NAME)
+        delays = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(len(delays), 20)
+        self.assertTrue(all(0.2 <= delay <= 0.3 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    def test_writes_persist_to_path(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = f"{directory}/sheets.json"
+            backend = FakeSheetBackend(path=path)
+            backend.load_rows(SHEET_ID, TAB_NAME, [["Name", "Phone"], ["Ann", "555"]])
+            backend.batch_update(SHEET_ID, [{"range": "Leads!B2", "values": [["556"]]}])
+            response = backend.append(SHEET_ID, "Leads!A:B", [["Bob", "557"]])
+            self.assertEqual(response["updates"]["updatedRange"], "Leads!A3:B3")
+
+            reloaded = FakeSheetBackend(path=path)
+            self.assertEqual(reloaded.rows(SHEET_ID, TAB_NAME), [["Name", "Phone"], ["Ann", "556"], ["Bob", "557"]])
+            self.assertEqual(reloaded.get_values(SHEET_ID, "Leads!A2:B"), [["Ann", "556"], ["Bob", "557"]])
+
+
+class BenchmarkCommandTests(SimpleTestCase):
+    def test_small_scenario_prints_json(self):
+        out = io.StringIO()
+        call_command("benchmark", "overview", leads=200, iterations=2, seed=1, stdout=out)
+        result = json.loads(out.getvalue())
+        self.assertEqual(result["scenario"], "overview")
+        self.assertEqual(result["leads"], 200)
+
+    def test_unset_options_keep_the_scenario_defaults(self):
+        calls = []
+
+        def scenario(leads=100000, agents=8, latency=0.5):
+            calls.append({"leads": leads, "agents": agents, "latency": latency})
+            return calls[-1]
+
+        with mock.patch.dict("api.benchmarks.SCENARIOS", {"probe": scenario}):
+            call_command("benchmark", "probe", stdout=io.StringIO())
+            call_command("benchmark", "probe", "--agents", "3", stdout=io.StringIO())
+        self.assertEqual(calls, [
+            {"leads": 100000, "agents": 8, "latency": 0.5},
+            {"leads": 100000, "agents": 3, "latency": 0.5},
+        ])
+
+
+class WritePlanTests(SimpleTestCase):
+    def test_adjacent_cells_share_a_range(self):
+        plan = WritePlan("Leads")
+        plan.set_row(4, {3: "NA", 4: "7", 5: "2030-01-01 09:00:00", 6: ""})
+        plan.set(4, 9, "x")
+        self.assertEqual(plan.ranges(), [
+            {"range": "Leads!D4:G4", "values": [["NA", "7", "2030-01-01 09:00:00", ""]]},
+            {"range": "Leads!J4", "values": [["x"]]},
+        ])
+
+    def test_rows_stack_and_columns_pass_z(self):
+        plan = WritePlan("Q3 Leads")
+        for row in (2, 3, 5):
+            plan.set_row(row, {26: "CB", 27: "a"})
+        self.assertEqual(plan.ranges(), [
+            {"range": "'Q3 Leads'!AA2:AB3", "values": [["CB", "a"], ["CB", "a"]]},
+            {"range": "'Q3 Leads'!AA5:AB5", "values": [["CB", "a"]]},
+        ])
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class WriteJournalTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.agent = User.objects.create_user("agent@example.com", "Agent", "secret-pass")
+        SheetConfig.objects.create(sheet_id=SHEET_ID, tab_name=TAB_NAME)
+        self.backend = get_sheet_backend()
+        self.backend.load_rows(SHEET_ID, TAB_NAME, make_lead_rows(5, seed=1))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.agent).access_token}")
+
+    def post_disposition(self, key, row_index=3):
+        return self.client.post(
+            "/api/leads/disposition/",
+            {"row_index": row_index, "disposition": "NI"},
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_disposition_is_queued_during_outage_and_replayed(self):
+        self.backend.error_rate = 1.0
+        response = self.post_disposition("call-1")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["status"], "queued")
+
+        # A client retry with the same key does not duplicate the journal entry
+        self.post_disposition("call-1")
+        self.assertEqual(SheetMutation.objects.count(), 1)
+        self.assertEqual(DispositionEvent.objects.filter(disposition="NI", row_index=3).count(), 1)
+
+        self.backend.error_rate = 0.0
+        SheetMutation.objects.update(next_attempt_at=None)
+        self.assertEqual(len(replay_journal()), 1)
+        self.assertEqual(self.backend.rows(SHEET_ID, TAB_NAME)[2][3], "NI")
+        self.assertEqual(SheetMutation.objects.get().status, "applied")
+
+    def test_idempotency_keys_are_scoped_per_agent(self):
+        self.assertEqual(self.post_disposition("call-1").status_code, 200)
+        other = User.objects.create_user("other@example.com", "Other", "secret-pass")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(other).access_token}")
+        self.assertEqual(self.post_disposition("call-1", row_index=4).status_code, 200)
+
+        self.assertEqual(SheetMutation.objects.count(), 2)
+        self.assertEqual(self.backend.rows(SHEET_ID, TAB_NAME)[3][3], "NI")
+        self.assertTrue(all(len(key) <= 64 for key in SheetMutation.objects.values_list("idempotency_key", flat=True)))
+
+    def test_reused_or_malformed_idempotency_keys_are_rejected(self):
+        self.assertEqual(self.post_disposition("call-1").status_code, 200)
+        response = self.post_disposition("call-1", row_index=4)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(SheetMutation.objects.count(), 1)
+
+        self.assertEqual(self.post_disposition("").status_code, 400)
+        self.assertEqual(self.post_disposition("k" * 300).status_code, 400)
+        self.assertEqual(SheetMutation.objects.count(), 1)
+
+    def test_failing_tab_does_not_hold_up_other_tabs(self):
+        broken, _ = record_mutation("disposition", SHEET_ID, "Missing", 3, self.agent.pk, {"disposition": "NI"})
+        working, _ = record_mutation("disposition", SHEET_ID, TAB_NAME, 3, self.agent.pk, {"disposition": "NA"})
+
+        self.assertEqual(replay_journal(), [working.pk])
+        self.assertEqual(self.backend.rows(SHEET_ID, TAB_NAME)[2][3], "NA")
+        broken.refresh_from_db()
+        self.assertEqual((broken.status, broken.attempts, broken.claimed_by), ("pending", 1, ""))
+        self.assertIsNotNone(broken.next_attempt_at)
+
+    def test_sheet_request_runs_after_the_claim_commits(self):
+        first, _ = record_mutation("disposition", SHEET_ID, TAB_NAME, 3, self.agent.pk, {"disposition": "NI"})
+        second, _ = record_mutation("disposition", SHEET_ID, TAB_NAME, 4, self.agent.pk, {"disposition": "NA"})
+        depth = len(connection.atomic_blocks)
+        seen = []
+
+        def send(mutations):
+            # No transaction is open and the batch is claimed, so other replayers skip the tab
+            seen.append(len(connection.atomic_blocks))
+            seen.append(set(SheetMutation.objects.values_list("claimed_by", flat=True)) - {""})
+            seen.append(replay_journal())
+
+        with mock.patch("api.journal.apply_mutations", side_effect=send):
+            self.assertEqual(replay_journal(), [first.pk, second.pk])
+        self.assertEqual(seen[0], depth)
+        self.assertEqual(len(seen[1]), 1)
+        self.assertEqual(seen[2], [])
+        self.assertFalse(SheetMutation.objects.exclude(claimed_by="").exists())
+
+    def test_lapsed_claim_is_retried(self):
+        mutation, _ = record_mutation("disposition", SHEET_ID, TAB_NAME, 3, self.agent.pk, {"disposition": "NI"})
+        SheetMutation.objects.update(claimed_by="dead-replayer", claimed_until=timezone.now() + timedelta(minutes=1))
+        self.assertEqual(replay_journal(), [])
+
+        SheetMutation.objects.update(claimed_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(replay_journal(), [mutation.pk])
+        self.assertEqual(self.backend.rows(SHEET_ID, TAB_NAME)[2][3], "NI")
+
+
+class ReadReplicaRouterTests(SimpleTestCase):
+    def test_reads_use_the_replica_only_inside_use_replica(self):
+        with mock.patch.dict(settings.DATABASES, {REPLICA_ALIAS: {}}):
+            self.assertEqual(User.objects.all().db, "default")
+            with use_replica():
+                self.assertEqual(User.objects.all().db, REPLICA_ALIAS)
+                self.assertEqual(router.db_for_read(SheetMutation), REPLICA_ALIAS)
+            self.assertEqual(User.objects.all().db, "default")
+
+    def test_replica_reads_decorator_scopes_the_view(self):
+        class View:
+            @replica_reads
+            def get(self, request):
+                return User.objects.all().db
+
+        with mock.patch.dict(settings.DATABASES, {REPLICA_ALIAS: {}}):
+            self.assertEqual(View().get(None), REPLICA_ALIAS)
+            self.assertEqual(User.objects.all().db, "default")
+
+    def test_writes_and_migrations_stay_on_default(self):
+        with mock.patch.dict(settings.DATABASES, {REPLICA_ALIAS: {}}), use_replica():
+            self.assertEqual(router.db_for_write(User), "default")
+            self.assertEqual(User.objects.select_for_update().db, "default")
+            self.assertTrue(router.allow_migrate("default", "api"))
+            self.assertFalse(router.allow_migrate(REPLICA_ALIAS, "api"))
+
+    def test_falls_back_to_default_without_a_replica(self):
+        self.assertNotIn(REPLICA_ALIAS, settings.DATABASES)
+        with use_replica():
+            self.assertEqual(User.objects.all().db, "default")
+
+
+class AdmissionControlTests(SimpleTestCase):
+    def test_sheds_when_queue_is_full(self):
+        controller = AdmissionController("test", max_concurrency=1, max_queue=0, queue_timeout=0.01)
+        with controller:
+            with self.assertRaises(Overloaded) as ctx:
+                controller.acquire()
+        self.assertEqual(ctx.exception.reason, "queue_full")
+        self.assertEqual(controller.metrics()["rejected_queue_full"], 1)
+        self.assertEqual(controller.metrics()["in_flight"], 0)
+
+    def test_queued_request_times_out(self):
+        controller = AdmissionController("test", max_concurrency=1, max_queue=1, queue_timeout=0.01)
+        with controller:
+            with self.assertRaises(Overloaded) as ctx:
+                controller.acquire()
+        self.assertEqual(ctx.exception.reason, "queue_timeout")
+
+    @override_settings(ADMISSION_CONTROL={"sheets": {"max_concurrency": 0, "max_queue": 0, "retry_after": 7}})
+    def test_view_returns_503_with_retry_after(self):
+        agent = User(email="agent@example.com", name="Agent")
+        client = APIClient()
+        client.force_authenticate(agent)
+        response = client.get("/api/leads/next/")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "7")
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class StatsRollupTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.admin = User.objects.create_user("admin@example.com", "Admin", "secret-pass", role="admin")
+        self.agent = User.objects.create_user("agent@example.com", "Agent", "secret-pass")
+        SheetConfig.objects.create(sheet_id=SHEET_ID, tab_name=TAB_NAME)
+        get_sheet_backend().load_rows(SHEET_ID, TAB_NAME, make_lead_rows(10, seed=1))
+        self.client = APIClient()
+
+    def test_stats_reflect_accepted_dispositions(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.agent).access_token}")
+        outcomes = [("NA", {}), ("NA", {}), ("BOOK", {"Appointment_Date": "2030-01-02", "Appointment_Time": "10:00"})]
+        for row_index, (disposition, extra_data) in enumerate(outcomes, start=2):
+            self.client.post(
+                "/api/leads/disposition/",
+                {"row_index": row_index, "disposition": disposition, "extra_data": extra_data},
+                format="json",
+            )
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.admin).access_token}")
+        with budget(queries=2, sheet_calls=0, label="StatsView"):
+            response = self.client.get("/api/stats/")
+        self.assertEqual(response.status_code, 200)
+        agent_stats = response.data["agents"][0]
+        self.assertEqual(agent_stats["dials"], 3)
+        self.assertEqual(agent_stats["bookings"], 1)
+        self.assertEqual(agent_stats["dispositions"], {"BOOK": 1, "NA": 2})
+        self.assertEqual(agent_stats["dials_per_hour"], 3.0)
+        self.assertEqual(response.data["totals"]["booking_rate"], round(1 / 3, 4))
+
+    def test_bad_agent_id_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.admin).access_token}")
+        response = self.client.get("/api/stats/", {"agent_id": "abc"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"error": "Invalid agent_id"})
+
+        response = self.client.get("/api/stats/", {"agent_id": str(self.agent.pk)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["agents"], [])
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class QueueOverviewTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.admin = User.objects.create_user("admin@example.com", "Admin", "secret-pass", role="admin")
+        SheetConfig.objects.create(sheet_id=SHEET_ID, tab_name=TAB_NAME)
+        rows = make_lead_rows(6, seed=1)
+        headers = rows[0]
+        for row in rows[1:]:
+            row.extend([""] * (len(headers) - len(row)))
+        disposition, lock = headers.index("Disposition"), headers.index("Lock_Status")
+        cb_date, cb_time = headers.index("CB_Date"), headers.index("CB_Time")
+        rows[1][disposition] = "NA"
+        rows[2][lock] = "In Progress by Agent 7"
+        rows[3][disposition], rows[3][cb_date], rows[3][cb_time] = "CB", "2000-01-01", "09:00"
+        rows[4][disposition], rows[4][cb_date], rows[4][cb_time] = "CB", "2999-01-01", "09:00"
+        rows[5][disposition], rows[5][cb_date] = "CB", "not a date"
+        get_sheet_backend().load_rows(SHEET_ID, TAB_NAME, rows)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.admin).access_token}")
+
+    def test_overview_counts_and_reuses_snapshot(self):
+        response = self.client.get("/api/leads/overview/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total"], 6)
+        self.assertEqual(response.data["by_disposition"], {"(none)": 2, "CB": 3, "NA": 1})
+        self.assertEqual(response.data["locked_by_agent"], {"7": 1})
+        self.assertEqual(response.data["callbacks"], {"due": 1, "future": 1, "invalid": 1})
+        self.assertEqual(response.data["fresh"], 1)
+        self.assertEqual(response.data["available"], 2)
+
+        with budget(sheet_calls=0, label="QueueOverviewView (cached)"):
+            self.client.get("/api/leads/overview/")
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class SuppressionTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.admin = User.objects.create_user("admin@example.com", "Admin", "secret-pass", role="admin")
+        self.agent = User.objects.create_user("agent@example.com", "Agent", "secret-pass")
+        SheetConfig.objects.create(sheet_id=SHEET_ID, tab_name=TAB_NAME)
+        self.rows = make_lead_rows(5, seed=1)
+        self.client = APIClient()
+
+    def served_rows(self):
+        get_sheet_backend().load_rows(SHEET_ID, TAB_NAME, self.rows)
+        return [lead["row_index"] for lead in fetch_qualified_leads(SHEET_ID, TAB_NAME)]
+
+    def test_normalize_phone(self):
+        self.assertEqual(normalize_phone("+1 (555) 123-4567"), 5551234567)
+        self.assertEqual(normalize_phone("555.123.4567"), 5551234567)
+        self.assertIsNone(normalize_phone("n/a"))
+
+    def test_dnc_and_duplicate_numbers_are_skipped(self):
+        phone, disposition = self.rows[0].index("Phone Number"), self.rows[0].index("Disposition")
+        self.rows[5].extend([""] * (disposition + 1 - len(self.rows[5])))
+        self.rows[5][disposition] = "DNC"
+        self.rows[2][phone] = "+1 " + self.rows[5][phone]
+        self.rows[3][phone] = self.rows[1][phone].replace(" ", "")
+        self.assertEqual(self.served_rows(), [2, 5])
+
+    def test_uploaded_list_suppresses_leads(self):
+        phone = self.rows[0].index("Phone Number")
+        upload = SimpleUploadedFile(
+            "dnc.csv", f"Name,Phone\nA,{self.rows[1][phone]}\nB,oops\n".encode(), content_type="text/csv"
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.admin).access_token}")
+        response = self.client.post("/api/suppression/", {"file": upload})
+        self.assertEqual(response.data, {"added": 1, "invalid": 1, "count": 1})
+        self.assertNotIn(2, self.served_rows())
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class LeadSearchTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.agent = User.objects.create_user("agent@example.com", "Agent", "secret-pass")
+        SheetConfig.objects.create(sheet_id=SHEET_ID, tab_name=TAB_NAME)
+        rows = make_lead_rows(3, seed=1)
+        rows[1][:2] = ["Harbor Dental Care", "(555) 201-4567"]
+        rows[2][:2] = ["Harbor Plumbing", "555-777-0000"]
+        rows[3][:2] = ["Summit Realty", "+1 212 555 4567"]
+        get_sheet_backend().load_rows(SHEET_ID, TAB_NAME, rows)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.agent).access_token}")
+
+    def search(self, query, **params):
+        response = self.client.get("/api/leads/search/", {"q": query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_name_prefixes_and_pagination(self):
+        data = self.search("harb", page_size=1, page=2)
+        self.assertEqual(data["count"], 2)
+        self.assertEqual([lead["row_index"] for lead in data["results"]], [3])
+        self.assertEqual(self.search("harbor den")["results"][0]["Business Name"], "Harbor Dental Care")
+
+    def test_phone_prefix_and_suffix(self):
+        self.assertEqual([lead["row_index"] for lead in self.search("4567")["results"]], [2, 4])
+        self.assertEqual([lead["row_index"] for lead in self.search("(555) 777")["results"]], [3])
+        with budget(sheet_calls=0, label="LeadSearchView (cached)"):
+            self.search("212-555")
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class ExportTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.admin = User.objects.create_user("admin@example.com", "Admin", "secret-pass", role="admin")
+        self.agent = User.objects.create_user("agent@example.com", "Agent", "secret-pass")
+        SheetConfig.objects.create(sheet_id=SHEET_ID, tab_name=TAB_NAME)
+        self.rows = make_lead_rows(5, seed=1)
+        get_sheet_backend().load_rows(SHEET_ID, TAB_NAME, self.rows)
+        self.client = APIClient()
+
+    def export(self, path, **params):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.admin).access_token}")
+        response = self.client.get(f"/api/export/{path}/", params)
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content).decode()
+
+    def test_leads_stream_in_sheet_windows(self):
+        with mock.patch.object(exports, "SHEET_WINDOW_ROWS", 2), budget(sheet_calls=5) as used:
+            lines = self.export("leads").splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[1].startswith(self.rows[1][0]))
+        # headers, metadata and three windows covering rows 2-7
+        self.assertEqual(len(used.sheet_log), 5)
+
+    def test_blank_rows_do_not_end_the_lead_export(self):
+        get_sheet_backend().load_rows(SHEET_ID, TAB_NAME, self.rows[:2] + [[]] * 5 + self.rows[2:])
+        with mock.patch.object(exports, "SHEET_WINDOW_ROWS", 2):
+            lines = self.export("leads").splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[-1].startswith(self.rows[-1][0]))
+
+    def test_replica_routing_does_not_leak_between_rows(self):
+        DispositionEvent.objects.create(
+            sheet_id=SHEET_ID, tab_name=TAB_NAME, row_index=2, disposition="NA", agent=self.agent,
+            created_at=timezone.now(),
+        )
+        rows = exports.export_dispositions()
+        next(rows)
+        next(rows)
+        self.assertFalse(routers._use_replica.get())
+
+    def test_dispositions_as_ndjson_with_filters(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.agent).access_token}")
+        for row_index, disposition in [(2, "NA"), (3, "NI"), (4, "NA")]:
+            self.client.post(
+                "/api/leads/disposition/",
+                {"row_index": row_index, "disposition": disposition},
+                format="json",
+            )
+
+        lines = self.export("dispositions", output="ndjson", disposition="NA", agent_id=str(self.agent.id))
+        records = [json.loads(line) for line in lines.splitlines()]
+        self.assertEqual([record["row_index"] for record in records], [2, 4])
+        self.assertEqual(records[0]["agent_email"], "agent@example.com")
+
+        lines = self.export("leads", disposition="NI").splitlines()
+        self.assertEqual(len(lines), 2)
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    IMPORT_IN_BACKGROUND=False,
+    IMPORT_UPLOAD_DIR=tempfile.gettempdir(),
+    IMPORT_CHUNK_ROWS=2,
+    IMPORT_APPENDS_PER_MINUTE=0,
+)
+class LeadImportTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.admin = User.objects.create_user("admin@example.com", "Admin", "secret-pass", role="admin")
+        SheetConfig.objects.create(sheet_id=SHEET_ID, tab_name=TAB_NAME)
+        self.rows = make_lead_rows(2, seed=1)
+        get_sheet_backend().load_rows(SHEET_ID, TAB_NAME, self.rows)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.admin).access_token}")
+
+    def upload(self, text):
+        upload = SimpleUploadedFile("leads.csv", text.encode(), content_type="text/csv")
+        return self.client.post("/api/leads/import/", {"file": upload})
+
+    def test_rejects_missing_columns(self):
+        response = self.upload("Business Name,Phone Number\nAcme,5551234567\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Message", response.data["error"])
+
+    def test_appends_new_numbers_in_chunks(self):
+        existing = self.rows[1][1]
+        csv_text = "\n".join([
+            "Business Name,Phone Number,Message,Disposition,City",
+            "New One,555-201-0001,Hi,,Austin",
+            f"Already There,{existing},Hi,,Austin",
+            "New Two,(555) 201-0002,Hi,,Austin",
+            "Repeat,+1 555 201 0001,Hi,,Austin",
+            "No Phone,n/a,Hi,,Austin",
+            "New Three,5552010003,Hi,,Austin",
+        ])
+        with budget(sheet_calls=4) as used:
+            response = self.upload(csv_text)
+        self.assertEqual(response.status_code, 202)
+        # header + phone column reads, then two appends
+        self.assertEqual([call.split()[0] for call in used.sheet_log], ["get_values", "get_values", "append", "append"])
+
+        status = self.client.get(f"/api/leads/import/{response.data['id']}/").data
+        self.assertEqual(status["status"], "completed")
+        self.assertEqual(
+            [status["processed_rows"], status["imported_rows"], status["duplicate_rows"], status["invalid_rows"]],
+            [6, 3, 2, 1],
+        )
+        sheet = get_sheet_backend().rows(SHEET_ID, TAB_NAME)
+        self.assertEqual([row[0] for row in sheet[3:]], ["New One", "New Two", "New Three"])
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    APPOINTMENT_MINUTES=30,
+)
+class AppointmentTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.agent = User.objects.create_user("agent@example.com", "Agent", "secret-pass")
+        self.closer = User.objects.create_user("closer@example.com", "Closer", "secret-pass")
+        SheetConfig.objects.create(sheet_id=SHEET_ID, tab_name=TAB_NAME)
+        get_sheet_backend().load_rows(SHEET_ID, TAB_NAME, make_lead_rows(5, seed=1))
+        Availability.objects.create(owner=self.closer, start=self.at(9), end=self.at(11))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.agent).access_token}")
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime(2030, 1, 2, hour, minute))
+
+    def book(self, row_index, when):
+        return self.client.post(
+            "/api/leads/disposition/",
+            {"row_index": row_index, "disposition": "BOOK",
+             "extra_data": {"Appointment_Date": "2030-01-02", "Appointment_Time": when}},
+            format="json",
+        )
+
+    def test_double_booking_is_rejected_with_alternatives(self):
+        self.assertEqual(self.book(2, "09:30").status_code, 200)
+        response = self.book(3, "09:45")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([slot["start"] for slot in response.data["alternatives"]], [self.at(10), self.at(10, 30)])
+        self.assertEqual(Appointment.objects.get().owner, self.closer)
+        self.assertFalse(SheetMutation.objects.filter(row_index=3).exists())
+        self.assertEqual(self.book(4, "12:00").status_code, 409)
+
+    def test_slots_skip_booked_times(self):
+        self.book(2, "09:30")
+        response = self.client.get("/api/appointments/slots/", {"from": "2030-01-02"})
+        self.assertEqual(
+            [slot["start"] for slot in response.data["slots"]],
+            [self.at(9), self.at(10), self.at(10, 30)],
+        )
+
+    def test_offered_slots_spanning_adjacent_windows_can_be_booked(self):
+        Availability.objects.create(owner=self.closer, start=self.at(13), end=self.at(13, 45))
+        Availability.objects.create(owner=self.closer, start=self.at(13, 45), end=self.at(15))
+        response = self.client.get("/api/appointments/slots/", {"from": "2030-01-02T13:00:00"})
+        self.assertIn(self.at(13, 30), [slot["start"] for slot in response.data["slots"]])
+        self.assertEqual(self.book(2, "13:30").status_code, 200)
+
+    def test_concurrent_booking_falls_through_to_the_next_owner(self):
+        other = User.objects.create_user("other@example.com", "Other", "secret-pass")
+        Availability.objects.create(owner=other, start=self.at(9), end=self.at(11))
+        create = Appointment.objects.create
+        owners = []
+
+        def racing_create(**fields):
+            owners.append(fields["owner_id"])
+            if len(owners) == 1:
+                raise IntegrityError("conflicting key value violates exclusion constraint")
+            return create(**fields)
+
+        with mock.patch.object(Appointment.objects, "create", side_effect=racing_create):
+            self.assertEqual(self.book(2, "09:30").status_code, 200)
+        self.assertEqual(len(set(owners)), 2)
+        self.assertEqual(Appointment.objects.get().owner_id, owners[1])
+
+    def test_free_form_appointment_cells_are_kept_without_booking(self):
+        response = self.client.post(
+            "/api/leads/disposition/",
+            {"row_index": 2, "disposition": "BOOK",
+             "extra_data": {"Appointment_Date": "Jan 2", "Appointment_Time": "morning"}},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Appointment.objects.exists())
+        self.assertEqual(get_sheet_backend().rows(SHEET_ID, TAB_NAME)[1][3], "BOOK")
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class LoginTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.user = User.objects.create_user("agent@example.com", "Agent", "secret-pass")
+        self.client = APIClient()
+
+    def login(self, password="secret-pass", email="agent@example.com"):
+        return self.client.post("/api/login/", {"email": email, "password": password}, format="json")
+
+    def test_login_writes_last_login_without_saving_the_user(self):
+        with mock.patch("api.signals.publish") as publish:
+            response = self.login()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(publish.called)
+        self.user.refresh_from_db()
+        self.assertIsNotNone(self.user.last_login)
+
+    def test_bad_credentials_are_rejected(self):
+        self.assertEqual(self.login(password="wrong").status_code, 401)
+        self.assertEqual(self.login(email="nobody@example.com").status_code, 401)
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+
+    def test_outdated_hash_is_upgraded_on_login(self):
+        hashers = ["api.hashers.PBKDF2PasswordHasher", "django.contrib.auth.hashers.MD5PasswordHasher"]
+        with self.settings(PASSWORD_HASHERS=hashers, PASSWORD_PBKDF2_ITERATIONS=1000):
+            with budget(queries=2):
+                self.assertEqual(self.login().status_code, 200)
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith("pbkdf2_sha256$1000$"))
+
+        with self.settings(PASSWORD_HASHERS=hashers, PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self.login().status_code, 200)
+            self.user.refresh_from_db()
+            self.assertTrue(self.user.password.startswith("pbkdf2_sha256$2000$"))
+            self.assertEqual(self.login().status_code, 200)
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class InvalidationTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.user = User.objects.create_user("agent@example.com", "Agent", "secret-pass")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.user).access_token}")
+
+    def test_cached_user_is_evicted_when_saved(self):
+        self.assertEqual(self.client.get("/api/users/").status_code, 403)
+        with budget(queries=0):
+            self.client.get("/api/users/")
+
+        self.user.role = "admin"
+        self.user.save()
+        self.assertEqual(self.client.get("/api/users/").status_code, 200)
+
+    def test_remote_events_apply_and_own_events_are_skipped(self):
+        SheetConfig.objects.create(sheet_id=SHEET_ID, tab_name=TAB_NAME)
+        self.client.get("/api/leads/next/")
+        self.assertIsNotNone(cache.get("sheet_config"))
+
+        event = {"kind": "sheet_config", "data": {"sheet_id": SHEET_ID, "tab_name": TAB_NAME}}
+        _handle_payload(json.dumps({**event, "origin": ORIGIN}))
+        self.assertIsNotNone(cache.get("sheet_config"))
+        _handle_payload(json.dumps({**event, "origin": "another-worker"}))
+        self.assertIsNone(cache.get("sheet_config"))
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class WriteOverlayTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.agent = User.objects.create_user("agent@example.com", "Agent", "secret-pass")
+        SheetConfig.objects.create(sheet_id=SHEET_ID, tab_name=TAB_NAME)
+        self.backend = get_sheet_backend()
+        self.backend.load_rows(SHEET_ID, TAB_NAME, make_lead_rows(3, seed=1))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.agent).access_token}")
+
+    def test_locked_lead_is_not_served_again_from_snapshot(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.get("/api/leads/next/").data["lead"]["row_index"], 2)
+        with budget(sheet_calls=1) as used:
+            response = self.client.get("/api/leads/next/")
+        self.assertEqual(response.data["lead"]["row_index"], 3)
+        self.assertEqual([call.split()[0] for call in used.sheet_log], ["batch_update"])
+
+    def test_claim_is_released_when_the_lock_cannot_be_journaled(self):
+        with mock.patch("api.views.record_mutation", side_effect=DatabaseError("journal down")):
+            response = self.client.get("/api/leads/next/")
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(overlay.pending(SHEET_ID, TAB_NAME), {})
+
+    def test_queued_disposition_stays_applied_until_the_sheet_shows_it(self):
+        self.backend.error_rate = 1.0
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                "/api/leads/disposition/", {"row_index": 2, "disposition": "NI"}, format="json"
+            )
+        self.assertEqual(response.status_code, 202)
+
+        # A fresh read still lacks the write, so the overlay keeps row 2 out of the queue
+        self.backend.error_rate = 0.0
+        invalidate_snapshot()
+        self.assertEqual([lead["row_index"] for lead in fetch_qualified_leads(SHEET_ID, TAB_NAME)], [3, 4])
+        self.assertIn(2, overlay.pending(SHEET_ID, TAB_NAME))
+
+        SheetMutation.objects.update(next_attempt_at=None)
+        replay_journal()
+        invalidate_snapshot()
+        fetch_qualified_leads(SHEET_ID, TAB_NAME)
+        self.assertEqual(overlay.pending(SHEET_ID, TAB_NAME), {})
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class BulkDispositionTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.agent = User.objects.create_user("agent@example.com", "Agent", "secret-pass")
+        SheetConfig.objects.create(sheet_id=SHEET_ID, tab_name=TAB_NAME)
+        self.backend = get_sheet_backend()
+        self.backend.load_rows(SHEET_ID, TAB_NAME, make_lead_rows(150, seed=1))
+        self.headers = self.backend.rows(SHEET_ID, TAB_NAME)[0]
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.agent).access_token}")
+
+    def submit(self, dispositions, **headers):
+        return self.client.post(
+            "/api/leads/disposition/bulk/", {"dispositions": dispositions}, format="json", headers=headers
+        )
+
+    def cell(self, row_index, column):
+        row = self.backend.rows(SHEET_ID, TAB_NAME)[row_index - 1]
+        idx = self.headers.index(column)
+        return row[idx] if idx < len(row) else ""
+
+    def test_rows_are_validated_individually_and_written_together(self):
+        dispositions = [{"row_index": row, "disposition": "NI"} for row in range(2, 122)]
+        dispositions[5] = {"row_index": 7, "disposition": "CB", "extra_data": {"CB_Date": "2030-01-02"}}
+        dispositions[9] = {"row_index": 11, "disposition": "MAYBE"}
+        dispositions[20] = {"row_index": 22, "disposition": "CB",
+                            "extra_data": {"CB_Date": "2030-01-02", "CB_Time": "10:00"}}
+
+        with budget(sheet_calls=2) as used:
+            response = self.submit(dispositions)
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data["summary"], {"success": 118, "invalid": 2})
+        self.assertEqual(response.data["results"][5]["error"], "CB_Date and CB_Time are required for Call Back disposition")
+        self.assertEqual(response.data["results"][9]["status"], "invalid")
+        self.assertEqual([call.split()[0] for call in used.sheet_log], ["get_values", "batch_update"])
+
+        self.assertEqual(self.cell(2, "Disposition"), "NI")
+        self.assertEqual(self.cell(7, "Disposition"), "")
+        self.assertEqual((self.cell(22, "Disposition"), self.cell(22, "CB_Time")), ("CB", "10:00"))
+        self.assertEqual(DispositionEvent.objects.count(), 118)
+
+    def test_queued_rows_drain_in_one_batch_and_retries_are_idempotent(self):
+        dispositions = [{"row_index": row, "disposition": "NA"} for row in range(2, 52)]
+        self.backend.error_rate = 1.0
+        response = self.submit(dispositions, **{"Idempotency-Key": "dialer-batch-1"})
+        self.assertEqual(response.data["summary"], {"queued": 50})
+
+        response = self.submit(dispositions, **{"Idempotency-Key": "dialer-batch-1"})
+        self.assertEqual(response.data["summary"], {"queued": 50})
+        self.assertEqual(SheetMutation.objects.count(), 50)
+        self.assertEqual(DispositionEvent.objects.count(), 50)
+
+        self.backend.error_rate = 0.0
+        SheetMutation.objects.update(next_attempt_at=None)
+        with budget(sheet_calls=2) as used:
+            self.assertEqual(len(replay_journal()), 50)
+        self.assertEqual([call.split()[0] for call in used.sheet_log], ["get_values", "batch_update"])
+        self.assertEqual(self.cell(51, "Disposition"), "NA")
+
+    def test_idempotency_keys_are_scoped_per_agent(self):
+        self.submit([{"row_index": 2, "disposition": "NA"}], **{"Idempotency-Key": "batch-1"})
+        other = User.objects.create_user("other@example.com", "Other", "secret-pass")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(other).access_token}")
+        response = self.submit([{"row_index": 3, "disposition": "NI"}], **{"Idempotency-Key": "batch-1"})
+        self.assertEqual(response.data["results"], [{"row_index": 3, "status": "success"}])
+        self.assertEqual(self.cell(3, "Disposition"), "NI")
+
+        response = self.submit([{"row_index": 4, "disposition": "NI"}], **{"Idempotency-Key": " "})
+        self.assertEqual(response.status_code, 400)
+
+    def test_booking_conflicts_are_reported_per_row(self):
+        extra_data = {"Appointment_Date": "2030-01-02", "Appointment_Time": "09:30"}
+        response = self.submit([
+            {"row_index": 2, "disposition": "BOOK", "extra_data": extra_data},
+            {"row_index": 3, "disposition": "BOOK", "extra_data": extra_data},
+            {"row_index": 4, "disposition": "DNC"},
+        ])
+        self.assertEqual([result["status"] for result in response.data["results"]], ["success", "conflict", "success"])
+        self.assertEqual(Appointment.objects.get().mutation.row_index, 2)
+        self.assertFalse(SheetMutation.objects.filter(row_index=3).exists())
+
+    def test_payload_must_be_a_bounded_list(self):
+        self.assertEqual(self.submit([]).status_code, 400)
+        with override_settings(BULK_DISPOSITION_MAX_ROWS=2):
+            self.assertEqual(self.submit([{"row_index": 2, "disposition": "NA"}] * 3).status_code, 400)
+
+
+class CronScheduleTests(SimpleTestCase):
+    def at(self, *args):
+        return timezone.make_aware(datetime(*args))
+
+    def test_next_after(self):
+        business_hours = CronSchedule("*/15 9-17 * * 1-5")
+        # Friday 17:50 -> Monday 09:00
+        self.assertEqual(business_hours.next_after(self.at(2030, 1, 4, 17, 50)), self.at(2030, 1, 7, 9, 0))
+        self.assertEqual(business_hours.next_after(self.at(2030, 1, 7, 9, 0)), self.at(2030, 1, 7, 9, 15))
+        self.assertEqual(CronSchedule("0 3 29 2 *").next_after(self.at(2030, 3, 1)), self.at(2032, 2, 29, 3, 0))
+        # Both day fields restricted: either may match
+        self.assertEqual(CronSchedule("0 0 1 * 0").next_after(self.at(2030, 1, 2)), self.at(2030, 1, 6, 0, 0))
+
+    def test_rejects_bad_expressions(self):
+        for expression in ("* * * *", "60 * * * *", "*/0 * * * *", "a * * * *"):
+            with self.assertRaises(CronError):
+                CronSchedule(expression)
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    JOB_RETRY_BASE=30,
+    JOB_SCHEDULES={},
+)
+class JobRunnerTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.calls = []
+        handlers = {
+            "flaky": jobs.Handler(self.flaky, None, 2, None),
+            "single": jobs.Handler(lambda: self.calls.append("single"), 1, 5, None),
+        }
+        patcher = mock.patch.dict(jobs._handlers, handlers)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def flaky(self, fail):
+        self.calls.append(fail)
+        if fail:
+            raise RuntimeError("upstream unavailable")
+
+    def test_failed_jobs_back_off_then_give_up(self):
+        job = jobs.enqueue("flaky", fail=True)
+        with self.assertLogs("api.jobs", "ERROR"):
+            jobs.run_job(jobs.claim_job("w1"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("pending", 1))
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=25))
+        self.assertIsNone(jobs.claim_job("w1"))
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs("api.jobs", "ERROR"):
+            jobs.run_job(jobs.claim_job("w1"))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("failed", 2))
+        self.assertIn("upstream unavailable", job.last_error)
+
+    def test_concurrency_limit_per_kind(self):
+        jobs.enqueue("single")
+        jobs.enqueue("single")
+        jobs.enqueue("flaky", fail=False)
+        first = jobs.claim_job("w1")
+        self.assertEqual(first.kind, "single")
+        # The second "single" job waits for the first; other kinds still run
+        self.assertEqual(jobs.claim_job("w2").kind, "flaky")
+        self.assertIsNone(jobs.claim_job("w2"))
+        jobs.run_job(first)
+        self.assertEqual(jobs.claim_job("w2").kind, "single")
+
+    def test_lost_jobs_are_requeued(self):
+        jobs.enqueue("single")
+        jobs.claim_job("w1")
+        Job.objects.update(started_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.requeue_lost_jobs(), 1)
+        self.assertEqual(jobs.claim_job("w2").attempts, 2)
+
+    def test_schedules_enqueue_once_per_due_run(self):
+        start = timezone.make_aware(datetime(2030, 1, 2, 9, 7))
+        with override_settings(JOB_SCHEDULES={"every-15": {"kind": "single", "cron": "*/15 * * * *"}}):
+            self.assertEqual(jobs.enqueue_due_schedules(start), [])
+            self.assertEqual(JobSchedule.objects.get().next_run_at, start.replace(minute=15))
+
+            enqueued = jobs.enqueue_due_schedules(start.replace(minute=16))
+            self.assertEqual([(job.kind, job.schedule) for job in enqueued], [("single", "every-15")])
+            # The last run is still queued, so this one is skipped rather than piled up
+            self.assertEqual(jobs.enqueue_due_schedules(start.replace(minute=31)), [])
+            self.assertEqual(JobSchedule.objects.get().next_run_at, start.replace(minute=45))
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    IMPORT_IN_BACKGROUND=True,
+    IMPORT_UPLOAD_DIR=tempfile.gettempdir(),
+    IMPORT_APPENDS_PER_MINUTE=0,
+    JOB_SCHEDULES={},
+)
+class BackgroundTaskTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.admin = User.objects.create_user("admin@example.com", "Admin", "secret-pass", role="admin")
+        SheetConfig.objects.create(sheet_id=SHEET_ID, tab_name=TAB_NAME)
+        self.backend = get_sheet_backend()
+        self.backend.load_rows(SHEET_ID, TAB_NAME, make_lead_rows(3, seed=1))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(self.admin).access_token}")
+
+    def test_import_runs_on_the_job_worker(self):
+        upload = SimpleUploadedFile(
+            "leads.csv", b"Business Name,Phone Number,Message,Disposition\nNew One,555-201-0001,Hi,\n", content_type="text/csv"
+        )
+        response = self.client.post("/api/leads/import/", {"file": upload})
+        self.assertEqual(response.data["status"], "pending")
+        self.assertEqual(Job.objects.get().kind, "import_leads")
+
+        call_command("run_jobs", once=True, stdout=io.StringIO())
+        self.assertEqual(self.client.get(f"/api/leads/import/{response.data['id']}/").data["status"], "completed")
+        self.assertEqual(self.client.get("/api/jobs/status/").data["by_kind"], {"import_leads": {"succeeded": 1}})
+
+    def test_reap_locks_releases_abandoned_leads(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            row_index = self.client.get("/api/leads/next/").data["lead"]["row_index"]
+        SheetMutation.objects.update(created_at=timezone.now() - timedelta(hours=2))
+        lock_status = self.backend.rows(SHEET_ID, TAB_NAME)[0].index("Lock_Status")
+        self.assertTrue(self.backend.rows(SHEET_ID, TAB_NAME)[row_index - 1][lock_status])
+
+        self.assertEqual(reap_locks(), 1)
+        self.assertEqual(self.backend.rows(SHEET_ID, TAB_NAME)[row_index - 1][lock_status], "")
+        # The unlock supersedes the lock, so the next run has nothing to do
+        self.assertEqual(reap_locks(), 0)
+
+
+class RowDeltaTests(SimpleTestCase):
+    def test_changed_appended_and_truncated_rows_keep_positions(self):
+        self.assertEqual(diff_rows([1, 2, 3], [1, 9, 3]), ([], [1], [], False))
+        self.assertEqual(diff_rows([1, 2, 3], [1, 9, 3, 4, 5]), ([3, 4], [1], [], False))
+        self.assertEqual(diff_rows([1, 2, 3, 4], [1, 2]), ([], [], [2, 3], False))
+
+    def test_mid_sheet_insert_and_delete_shift_later_rows(self):
+        self.assertEqual(diff_rows([1, 2, 3, 4], [1, 3, 4]), ([], [], [1], True))
+        self.assertEqual(diff_rows([1, 2, 3], [1, 7, 2, 3]), ([1], [], [], True))
+        self.assertEqual(diff_rows([1, 2, 3, 4], [1, 5, 4]), ([1], [], [1, 2], True))
+
+    def test_row_hash_ignores_trailing_empty_cells(self):
+        self.assertEqual(row_hash(["a", "b", "", ""]), row_hash(["a", "b"]))
+        self.assertNotEqual(row_hash(["a", "", "b"]), row_hash(["a", "b"]))
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class SnapshotRefreshTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        self.backend = get_sheet_backend()
+        self.rows = make_worked_rows(40, seed=3)
+        self.headers = self.rows[0]
+        self.backend.load_rows(SHEET_ID, TAB_NAME, self.rows)
+        self.snapshot = get_snapshot(SHEET_ID, TAB_NAME)
+        # Build every index so the refresh has to patch them
+        self.snapshot.overview()
+        self.snapshot.search_index()
+        self.snapshot.qualified_leads()
+
+    def refresh(self):
+        self.backend.load_rows(SHEET_ID, TAB_NAME, self.rows)
+        headers, rows = read_tab(SHEET_ID, TAB_NAME)
+        return self.snapshot.refresh(headers, rows)
+
+    def assertMatchesRebuilt(self):
+        rebuilt = SheetSnapshot(SHEET_ID, TAB_NAME, *read_tab(SHEET_ID, TAB_NAME))
+        now = timezone.now()
+        overview, expected = self.snapshot.overview(now), rebuilt.overview(now)
+        overview.pop("as_of"), expected.pop("as_of")
+        self.assertEqual(overview, expected)
+        self.assertEqual(self.snapshot.qualified_leads(now), rebuilt.qualified_leads(now))
+        for query in ("acme", "harbor", "555", "0001"):
+            self.assertEqual(self.snapshot.search_index().search(query), rebuilt.search_index().search(query))
+
+    def test_changed_and_appended_rows_are_patched_in_place(self):
+        disposition, name = self.headers.index("Disposition"), self.headers.index("Business Name")
+        self.rows[3][disposition] = "DNC"
+        self.rows[7][name] = "Harbor Acme Works"
+        self.rows.extend(make_worked_rows(45, seed=4)[42:])
+        search_index = self.snapshot.search_index()
+
+        delta = self.refresh()
+        self.assertEqual((delta.inserted, delta.changed, delta.deleted, delta.shifted), ([40, 41, 42, 43], [2, 6], [], False))
+        self.assertIs(self.snapshot.search_index(), search_index)
+        self.assertMatchesRebuilt()
+
+        del self.rows[-3:]
+        self.assertEqual(self.refresh().deleted, [41, 42, 43])
+        self.assertMatchesRebuilt()
+
+    def test_mid_sheet_delete_rebuilds_positional_indexes(self):
+        del self.rows[5]
+        delta = self.refresh()
+        self.assertEqual((delta.deleted, delta.shifted), ([4], True))
+        self.assertMatchesRebuilt()
+
+    def test_stale_snapshot_is_refreshed_not_replaced(self):
+        with budget(sheet_calls=1):
+            self.assertIs(get_snapshot(SHEET_ID, TAB_NAME, max_age=0), self.snapshot)
+
+        self.backend.load_rows(SHEET_ID, TAB_NAME, [self.headers + ["Notes"]] + self.rows[1:])
+        self.assertIsNot(get_snapshot(SHEET_ID, TAB_NAME, max_age=0), self.snapshot)
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class SharedSnapshotFileTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(SHEET_SNAPSHOT_DIR=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_worker_caches()
+
+        self.backend = get_sheet_backend()
+        self.rows = make_worked_rows(40, seed=5)
+        self.rows[4] = self.rows[4][:3]
+        self.rows[6][1] = "Café Ünïcode"
+        self.backend.load_rows(SHEET_ID, TAB_NAME, self.rows)
+        self.path = snapshot_path(SHEET_ID, TAB_NAME)
+
+    def test_file_round_trips_rows_and_columns(self):
+        publish_snapshot(SHEET_ID, TAB_NAME)
+        mapped = open_snapshot(self.path)
+        headers, rows = read_tab(SHEET_ID, TAB_NAME)
+        self.assertEqual(mapped.headers, headers)
+        self.assertEqual(list(mapped.rows), rows)
+        self.assertEqual(mapped.rows[-1], rows[-1])
+        disposition = headers.index("Disposition")
+        self.assertEqual(mapped.rows.column(disposition), [row[disposition] if disposition < len(row) else "" for row in rows])
+
+    def test_workers_serve_from_the_file_without_reading_the_sheet(self):
+        publish_snapshot(SHEET_ID, TAB_NAME)
+        expected = SheetSnapshot(SHEET_ID, TAB_NAME, *read_tab(SHEET_ID, TAB_NAME))
+        invalidate_snapshot()
+        now = timezone.now()
+        with budget(sheet_calls=0):
+            snapshot = get_snapshot(SHEET_ID, TAB_NAME)
+            self.assertIsNotNone(snapshot.source)
+            self.assertEqual(snapshot.qualified_leads(now), expected.qualified_leads(now))
+            self.assertEqual(snapshot.search_index().search("acme"), expected.search_index().search("acme"))
+
+        row_index = expected.qualified_leads(now)[0]["row_index"]
+        snapshot.apply_values(row_index, {"Lock_Status": "LOCKED_BY_7"})
+        self.assertNotIn(row_index, [lead["row_index"] for lead in snapshot.qualified_leads(now)])
+
+    def test_unchanged_read_only_moves_the_fetch_time(self):
+        hashes = publish_snapshot(SHEET_ID, TAB_NAME)
+        snapshot = get_snapshot(SHEET_ID, TAB_NAME)
+        fetched_at = snapshot.fetched_at
+
+        publish_snapshot(SHEET_ID, TAB_NAME, previous=hashes)
+        self.assertTrue(snapshot.source.is_current())
+        snapshot.loaded_at -= 1
+        with budget(sheet_calls=0):
+            self.assertIs(get_snapshot(SHEET_ID, TAB_NAME, max_age=0.5), snapshot)
+        self.assertGreater(snapshot.fetched_at, fetched_at)
+
+        self.rows[2][0] = "Changed"
+        self.backend.load_rows(SHEET_ID, TAB_NAME, self.rows)
+        publish_snapshot(SHEET_ID, TAB_NAME, previous=hashes)
+        self.assertFalse(snapshot.source.is_current())
+        snapshot.loaded_at -= 1
+        with budget(sheet_calls=0):
+            refreshed = get_snapshot(SHEET_ID, TAB_NAME, max_age=0.5)
+        self.assertEqual(refreshed.rows[1][0], "Changed")
+
+    def test_stale_or_expired_file_falls_back_to_the_sheet(self):
+        publish_snapshot(SHEET_ID, TAB_NAME)
+        with mock.patch("api.snapshot.timezone.now", return_value=timezone.now() + timedelta(minutes=5)):
+            with budget(sheet_calls=1):
+                snapshot = get_snapshot(SHEET_ID, TAB_NAME)
+        self.assertIsNone(snapshot.source)
+
+        invalidate_snapshot()
+        self.assertIsNotNone(get_snapshot(SHEET_ID, TAB_NAME).source)
+        expire_snapshot(SHEET_ID, TAB_NAME)
+        with budget(sheet_calls=1):
+            self.assertIsNone(get_snapshot(SHEET_ID, TAB_NAME).source)
+
+    def test_refresher_command_writes_the_configured_tab(self):
+        SheetConfig.objects.create(sheet_id=SHEET_ID, tab_name=TAB_NAME)
+        out = io.StringIO()
+        call_command("refresh_snapshots", "--once", stdout=out)
+        self.assertIn("40 rows written", out.getvalue())
+        self.assertEqual(list(open_snapshot(self.path).rows), read_tab(SHEET_ID, TAB_NAME)[1])
+
+
+@override_settings(
+    SHEETS_BACKEND="api.backends.FakeSheetBackend",
+    SHEETS_BACKEND_OPTIONS={},
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+)
+class LeadRoutingTests(TestCase):
+    HEADERS = ["Business Name", "Phone Number", "Disposition", "Timestamp", "Lock_Status", "CB_Date", "CB_Time", "Source"]
+
+    def setUp(self):
+        reset_worker_caches()
+        self.agent = User.objects.create_user("agent@example.com", "Agent", "secret-pass")
+        self.other = User.objects.create_user("other@example.com", "Other", "secret-pass")
+
+    def make_snapshot(self, rows):
+        rows = [[f"Lead {i}", f"(555) 010-{i:04d}", *row] for i, row in enumerate(rows)]
+        return SheetSnapshot(SHEET_ID, TAB_NAME, self.HEADERS, rows)
+
+    def drain(self, snapshot, users):
+        served = []
+        for user in users:
+            lead, _ = routing.next_lead(snapshot, user)
+            if lead is not None:
+                served.append((user, lead))
+        return served
+
+    def test_leads_are_served_by_weighted_priority(self):
+        now = timezone.now()
+
+        def stamp(ago):
+            return timezone.localtime(now - ago).strftime("%Y-%m-%d %H:%M:%S")
+
+        def callback(ago):
+            return timezone.localtime(now - ago).strftime("%Y-%m-%d %H:%M").split()
+        snapshot = self.make_snapshot([
+            [],                                             # row 2: fresh
+            ["Voicemail", stamp(timedelta(days=3))],        # row 3: retry, older
+            ["Voicemail", stamp(timedelta(days=1))],        # row 4: retry
+            ["CB", "", "", *callback(timedelta(hours=2))],  # row 5: overdue callback
+            ["CB", "", "", *callback(timedelta(minutes=10))],
+            ["", "", "", "", "", "referral"],               # row 7: weighted source
+            ["CB", "", "", *callback(-timedelta(hours=1))], # row 8: callback not due
+            ["NI"],                                         # row 9: out of the queue
+        ])
+        config = {**settings.LEAD_ROUTING, "source_weights": {"referral": 20}}
+        with override_settings(LEAD_ROUTING=config):
+            served = self.drain(snapshot, [self.agent] * 8)
+        self.assertEqual([lead["row_index"] for _, lead in served], [5, 6, 7, 2, 3, 4])
+
+    def test_rows_locked_after_the_heap_is_built_are_skipped(self):
+        snapshot = self.make_snapshot([[]] * 4)
+        lead, remaining = routing.next_lead(snapshot, self.agent)
+        self.assertEqual((lead["row_index"], remaining), (2, 3))
+        snapshot.apply_values(3, {"Lock_Status": "LOCKED_BY_9"})
+        snapshot.apply_values(4, {"Disposition": "DNC"})
+        self.assertEqual(routing.next_lead(snapshot, self.other)[0]["row_index"], 5)
+        self.assertEqual(routing.next_lead(snapshot, self.agent), (None, 0))
+
+    def test_queue_count_excludes_leads_claimed_elsewhere(self):
+        snapshot = self.make_snapshot([[]] * 5)
+        routing.next_lead(snapshot, self.agent)
+        # Another worker locks row 4 and dispositions row 5 out of the queue
+        for row_index, values in [(4, {"Lock_Status": "LOCKED_BY_9"}), (5, {"Disposition": "NI"})]:
+            overlay.record(SHEET_ID, TAB_NAME, row_index, values)
+            snapshot.apply_values(row_index, values)
+        lead, remaining = routing.next_lead(snapshot, self.other)
+        self.assertEqual((lead["row_index"], remaining), (3, 1))
+        shares = routing.routing_metrics()
+        self.assertEqual([(m["sheet_id"], m["tab_name"]) for m in shares], [(SHEET_ID, TAB_NAME)])
+
+    def test_concurrent_agents_never_share_a_lead(self):
+        snapshot = self.make_snapshot([["CB", "", "", "2020-01-01", "09:00"] if i % 3 else [] for i in range(600)])
+        users = [User.objects.create_user(f"agent{i}@example.com", f"Agent {i}", "secret-pass") for i in range(6)]
+        served = [routing.next_lead(snapshot, users[0])[0]["row_index"]]
+
+        def work(user):
+            while True:
+                lead, _ = routing.next_lead(snapshot, user)
+                if lead is None:
+                    return
+                served.append(lead["row_index"])
+
+        threads = [threading.Thread(target=work, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(served), list(range(2, 602)))
+
+    def premium_share_of_slow_agent(self, fairness):
+        # One callback in four; the fast agent asks three times as often
+        snapshot = self.make_snapshot([["CB", "", "", "2020-01-01", "09:00"] if i % 4 == 0 else [] for i in range(400)])
+        with override_settings(LEAD_ROUTING={**settings.LEAD_ROUTING, "fairness": fairness}):
+            served = self.drain(snapshot, [self.agent, self.agent, self.agent, self.other] * 50)
+        premium = [user for user, lead in served if lead["Disposition"] == "CB"]
+        return premium.count(self.other) / len(premium)
+
+    def test_premium_leads_are_shared_fairly(self):
+        self.assertLess(self.premium_share_of_slow_agent(""), 0.3)
+        routing.reset_routers()
+        overlay.clear()
+        self.assertGreater(self.premium_share_of_slow_agent("agent"), 0.4)
+
+    def test_team_fairness_groups_agents_by_team(self):
+        self.agent.team = "north"
+        config = {**settings.LEAD_ROUTING, "fairness": "team"}
+        self.assertEqual(routing.fairness_group(self.agent, config), "team:north")
+        self.assertEqual(routing.fairness_group(self.other, config), f"agent:{self.other.pk}")
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class SheetTraceTests(TestCase):
+    def setUp(self):
+        reset_worker_caches()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = f"{directory.name}/sheets.trace"
+        self.rows = make_worked_rows(30, seed=8)
+
+    def use_backend(self, backend_class, **options):
+        settings_override = override_settings(SHEETS_BACKEND=backend_class, SHEETS_BACKEND_OPTIONS=options)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        return get_sheet_backend()
+
+    def record(self, **inner_options):
+        self.use_backend(
+            "api.traces.RecordingBackend",
+            path=self.path,
+            backend="api.backends.FakeSheetBackend",
+            options={"sheets": {SHEET_ID: {TAB_NAME: self.rows}}, **inner_options},
+        )
+
+    def test_scrubber_keeps_shape_and_equality_but_not_values(self):
+        scrubber = TraceScrubber()
+        phone = scrubber.value("(555) 123-4567")
+        self.assertNotEqual(phone, "(555) 123-4567")
+        self.assertRegex(phone, r"^\(\d{3}\) \d{3}-\d{4}$")
+        self.assertEqual(scrubber.value("(555) 123-4567"), phone)
+        self.assertEqual(len(scrubber.value("Acme Plumbing")), len("Acme Plumbing"))
+        for value in ("", "DNC", "CB", "2030-01-05", "09:30", "2030-01-05 09:30:00"):
+            self.assertEqual(scrubber.value(value), value)
+        self.assertEqual(scrubber.read("'Leads'", [["Business Name"], ["Acme"]])[0], ["Business Name"])
+
+    def test_workers_share_pseudonyms_and_one_trace_file(self):
+        with override_settings(SHEETS_TRACE_KEY="trace-key"):
+            self.assertEqual(TraceScrubber().value("Acme Plumbing"), TraceScrubber().value("Acme Plumbing"))
+            first, second = [
+                RecordingBackend(
+                    self.path,
+                    backend="api.backends.FakeSheetBackend",
+                    options={"sheets": {SHEET_ID: {TAB_NAME: self.rows}}},
+                )
+                for _ in range(2)
+            ]
+        started = time.time()
+        first.get_values(SHEET_ID, TAB_NAME)
+        second.get_values(SHEET_ID, TAB_NAME)
+
+        header, records = load_trace(self.path)
+        with open(self.path) as f:
+            self.assertEqual(sum(1 for line in f if '"trace"' in line), 1)
+        self.assertEqual(header["trace"], 1)
+        self.assertEqual(records[0]["response"], records[1]["response"])
+        self.assertLessEqual(started, records[0]["at"])
+
+    def test_recorded_session_replays_offline(self):
+        self.record()
+        agent = User.objects.create_user("agent@example.com", "Agent", "secret-pass")
+        SheetConfig.objects.create(sheet_id=SHEET_ID, tab_name=TAB_NAME)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(agent).access_token}")
+        response = client.get("/api/leads/next/")
+        self.assertEqual(response.status_code, 200)
+        first_lead = response.data["lead"]["row_index"]
+
+        with open(self.path) as f:
+            trace = f.read()
+        self.assertNotIn(self.rows[1][0], trace)
+        self.assertNotIn(SHEET_ID, trace)
+        summary = trace_summary(self.path)
+        self.assertEqual(summary["methods"]["get_values"]["requests"], 1)
+        self.assertIn("batch_update", summary["methods"])
+
+        reset_worker_caches()
+        replay = self.use_backend("api.traces.ReplayBackend", path=self.path)
+        (sheet_id, tab_name), = replay.tabs()
+        self.assertEqual(tab_name, TAB_NAME)
+        replayed = replay.rows(sheet_id, tab_name)
+        self.assertEqual(replayed[0], self.rows[0])
+        disposition = self.rows[0].index("Disposition")
+        self.assertEqual(
+            [row[disposition] if disposition < len(row) else "" for row in replayed],
+            [row[disposition] for row in self.rows],
+        )
+        response = client.get("/api/leads/next/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["lead"]["row_index"], first_lead)
+
+    def test_replay_reproduces_latency_and_failures(self):
+        self.record(latency=0.02)
+        get_sheet_backend().get_values(SHEET_ID, TAB_NAME)
+        self.record(error_rate=1.0)
+        with self.assertRaises(SheetBackendError):
+            get_sheet_backend().get_values(SHEET_ID, TAB_NAME)
+
+        replay = ReplayBackend(self.path)
+        started = time.perf_counter()
+        replay.get_values("any-sheet", TAB_NAME)
+        self.assertGreaterEqual(time.perf_counter() - started, 0.015)
+        with self.assertRaises(SheetBackendError):
+            replay.get_values("any-sheet", TAB_NAME)
+        fast = ReplayBackend(self.path, speed=100.0, errors=False)
+        fast.get_values("any-sheet", TAB_NAME)
+        fast.get_values("any-sheet", TAB_NAME)
 
-# Create your tests here.
@@ -0,0 +1,332 @@
+"""
+Record and replay Google Sheets traffic.
+
+``RecordingBackend`` wraps the real backend and appends every request to a
+JSON-lines trace file. Each line holds the method, ranges, request and
+response payloads, payload sizes, duration and any error. Cell values are
+scrubbed before they are written:
+
+- Header rows, statuses, dates and times are kept as they are.
+- Every other value is replaced by a pseudonym that keeps its length and
+  its pattern of digits, letters and punctuation.
+
+Pseudonyms are keyed by SHEETS_TRACE_KEY, so equal values stay equal
+across every worker recording into one trace. Phone duplicates and
+do-not-call matches still behave the same, but the values cannot be looked
+up later. Workers append to the same file under an exclusive lock, and
+each record is stamped with wall-clock time.
+
+``ReplayBackend`` serves a trace offline. The sheet is rebuilt from the
+first value the trace read for each cell. Each request then sleeps for the
+duration recorded for the same call of the same method and fails where the
+recorded call failed. Production-shaped data and latency can be reproduced
+without a network, even when the code under test issues different requests
+than the recording did.
+
+Record by pointing SHEETS_BACKEND at api.traces.RecordingBackend, e.g.
+SHEETS_BACKEND_OPTIONS='{"path": "sheets.trace", "backend":
+"api.backends.GoogleSheetsBackend"}'; replay with api.traces.ReplayBackend
+and '{"path": "sheets.trace", "speed": 1.0}'.
+"""
+import fcntl
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .a1 import parse_range
+from .backends import BaseSheetBackend, FakeSheetBackend, QuotaExceeded, SheetBackendError
+from .utils import EXCLUDED_STATUSES, LOCK_PREFIX
+
+
+TRACE_VERSION = 1
+
+# Bookkeeping values that carry no personal data and that lead selection depends on
+SAFE_VALUES = EXCLUDED_STATUSES | {"CB", "BOOK", "TRUE", "FALSE"}
+SAFE_PATTERN = re.compile(
+    r"\d{4}-\d{2}-\d{2}( \d{2}:\d{2}(:\d{2})?)?"  # dates and timestamps
+    r"|\d{1,2}:\d{2}(:\d{2})?"                   # times
+    r"|-?\d{1,3}"                                 # small counts
+)
+# Distinct values whose pseudonyms are remembered between requests
+SCRUB_CACHE_SIZE = 200000
+_DIGITS = "0123456789"
+_LOWER = "abcdefghijklmnopqrstuvwxyz"
+_UPPER = _LOWER.upper()
+
+
+class TraceScrubber:
+    """Replaces sensitive cell values with stable, shape-preserving pseudonyms."""
+
+    def __init__(self, key=None):
+        key = key or settings.SHEETS_TRACE_KEY
+        self.key = (key.encode() if isinstance(key, str) else key) or secrets.token_bytes(32)
+        self._cache = {}
+
+    def value(self, value):
+        if not isinstance(value, str):
+            return value
+        if not value or value in SAFE_VALUES or SAFE_PATTERN.fullmatch(value):
+            return value
+        if value.startswith(LOCK_PREFIX):
+            return LOCK_PREFIX + self.value(value[len(LOCK_PREFIX):])
+        pseudonym = self._cache.get(value)
+        if pseudonym is None:
+            digest = hmac.new(self.key, value.encode(), hashlib.sha256).digest()
+            while len(digest) < len(value):
+                digest += hashlib.sha256(digest).digest()
+            pseudonym = "".join(
+                _DIGITS[byte % 10] if char.isdigit()
+                else _LOWER[byte % 26] if char.islower()
+                else _UPPER[byte % 26] if char.isupper()
+                else char
+                for char, byte in zip(value, digest)
+            )
+            if len(self._cache) >= SCRUB_CACHE_SIZE:
+                self._cache.clear()
+            self._cache[value] = pseudonym
+        return pseudonym
+
+    def rows(self, rows, keep_first=False):
+        """Scrub a list of rows; ``keep_first`` keeps a header row as it is."""
+        return [
+            list(row) if keep_first and i == 0 else [self.value(cell) for cell in row]
+            for i, row in enumerate(rows)
+        ]
+
+    def read(self, range_name, rows):
+        """Scrub the rows read from ``range_name``, keeping the header row when the range starts on row 1."""
+        return self.rows(rows, keep_first=parse_range(range_name)[2] in (None, 1))
+
+    def sheet_id(self, sheet_id):
+        return "sheet-" + hmac.new(self.key, sheet_id.encode(), hashlib.sha256).hexdigest()[:12]
+
+
+def _size(payload):
+    return len(json.dumps(payload, default=str))
+
+
+# ----------------------
+# Recording
+# ----------------------
+class RecordingBackend(BaseSheetBackend):
+    """
+    Sends every request to the wrapped backend and appends a scrubbed record
+    of it to the trace file at ``path``.
+    """
+
+    def __init__(self, path, backend="api.backends.GoogleSheetsBackend", options=None):
+        self.path = path
+        self.inner = import_string(backend)(**(options or {}))
+        self.scrubber = TraceScrubber()
+        self._lock = threading.Lock()
+        self._file = open(path, "a")
+        self._write(
+            {"trace": TRACE_VERSION, "started_at": timezone.now().isoformat(), "backend": backend},
+            only_if_empty=True,
+        )
+
+    def warm_up(self):
+        self.inner.warm_up()
+
+    def _write(self, record, only_if_empty=False):
+        """Append one line; the file lock keeps lines from other workers whole."""
+        line = json.dumps(record, separators=(",", ":"), default=str) + "\n"
+        with self._lock:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            try:
+                if not only_if_empty or not os.fstat(self._file.fileno()).st_size:
+                    self._file.write(line)
+                    self._file.flush()
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    def _call(self, method, sheet_id, ranges, func, *args):
+        at = time.time()
+        started = time.monotonic()
+        result = error = None
+        try:
+            result = super()._call(method, sheet_id, ranges, func, *args)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._write({
+                "at": round(at, 6),
+                "method": method,
+                "sheet_id": self.scrubber.sheet_id(sheet_id),
+                "ranges": ranges,
+                "request": self._scrub_request(method, args),
+                "request_bytes": _size(args),
+                "response": None if error else self._scrub_response(method, args, result),
+                "response_bytes": 0 if error else _size(result),
+                "duration": round(time.monotonic() - started, 6),
+                "error": {"type": type(error).__name__, "message": str(error)} if error else None,
+            })
+
+    def _scrub_request(self, method, args):
+        if method == "batch_update":
+            return [{"range": entry["range"], "values": self.scrubber.rows(entry["values"])} for entry in args[0]]
+        if method == "append":
+            return self.scrubber.rows(args[1])
+        return None
+
+    def _scrub_response(self, method, args, result):
+        if method == "get_values":
+            return self.scrubber.read(args[0], result)
+        if method == "batch_get":
+            return [self.scrubber.read(range_name, rows) for range_name, rows in zip(args[0], result)]
+        if method == "get_metadata":
+            return {"sheets": result.get("sheets", [])}
+        if isinstance(result, dict) and "spreadsheetId" in result:
+            return {**result, "spreadsheetId": self.scrubber.sheet_id(result["spreadsheetId"])}
+        return result
+
+    def _get_values(self, sheet_id, range_name):
+        return self.inner._get_values(sheet_id, range_name)
+
+    def _batch_get(self, sheet_id, ranges):
+        return self.inner._batch_get(sheet_id, ranges)
+
+    def _batch_update(self, sheet_id, data):
+        return self.inner._batch_update(sheet_id, data)
+
+    def _append(self, sheet_id, range_name, values):
+        return self.inner._append(sheet_id, range_name, values)
+
+    def _get_metadata(self, sheet_id):
+        return self.inner._get_metadata(sheet_id)
+
+
+# ----------------------
+# Replay
+# ----------------------
+def load_trace(path):
+    """Return (header, records) from a trace file."""
+    header = None
+    records = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "trace" in record:
+                header = header or record
+            else:
+                records.append(record)
+    return header, records
+
+
+def _read_ranges(record):
+    if record["method"] == "get_values":
+        return [(record["ranges"][0], record["response"])]
+    if record["method"] == "batch_get":
+        return list(zip(record["ranges"], record["response"]))
+    return []
+
+
+class ReplayBackend(FakeSheetBackend):
+    """
+    Serves a recorded trace offline: the sheet as the trace first read it,
+    with each method's recorded latencies and failures replayed in order
+    (cycling once exhausted). ``speed`` divides every delay, so 2.0 replays
+    twice as fast; ``errors=False`` drops the recorded failures.
+    """
+
+    def __init__(self, path, speed=1.0, errors=True, seed=None):
+        super().__init__(seed=seed)
+        self.speed = speed
+        self.errors = errors
+        _, records = load_trace(path)
+        self.profile = defaultdict(list)
+        for record in records:
+            self.profile[record["method"]].append((record["duration"], record["error"]))
+        self._calls = defaultdict(int)
+        self._seed_sheets(records)
+
+    def _seed_sheets(self, records):
+        grids = {}
+        for record in records:
+            if record["error"]:
+                continue
+            if record["method"] == "get_metadata":
+                for sheet in record["response"]["sheets"]:
+                    grids.setdefault((record["sheet_id"], sheet["properties"]["title"]), {})
+            for range_name, rows in _read_ranges(record):
+                tab_name, start_col, start_row, _, _ = parse_range(range_name)
+                grid = grids.setdefault((record["sheet_id"], tab_name), {})
+                for row_offset, row in enumerate(rows):
+                    for col_offset, value in enumerate(row):
+                        # The first read of a cell is the state the recording started from
+                        grid.setdefault(((start_row or 1) + row_offset - 1, (start_col or 0) + col_offset), value)
+
+        for (sheet_id, tab_name), grid in grids.items():
+            height = max((row for row, _ in grid), default=-1) + 1
+            rows = [[] for _ in range(height)]
+            for (row, col), value in grid.items():
+                cells = rows[row]
+                cells.extend([""] * (col + 1 - len(cells)))
+                cells[col] = value
+            self.sheets.setdefault(sheet_id, {})[tab_name] = rows
+
+    def tabs(self):
+        """(sheet_id, tab_name) of every tab the trace read."""
+        return [(sheet_id, tab_name) for sheet_id, tabs in self.sheets.items() for tab_name in tabs]
+
+    def _sheet_id(self, sheet_id):
+        # Serve a single-sheet trace whatever sheet id the app is configured with
+        if sheet_id not in self.sheets and len(self.sheets) == 1:
+            return next(iter(self.sheets))
+        return sheet_id
+
+    def _call(self, method, sheet_id, ranges, func, *args):
+        def replayed(sheet_id, *args):
+            with self._lock:
+                samples = self.profile.get(method)
+                index = self._calls[method]
+                self._calls[method] += 1
+            if samples:
+                duration, error = samples[index % len(samples)]
+                if duration:
+                    time.sleep(duration / self.speed)
+                if error and self.errors:
+                    error_class = QuotaExceeded if error["type"] == "QuotaExceeded" else SheetBackendError
+                    raise error_class(error["message"])
+            return func(self._sheet_id(sheet_id), *args)
+
+        return super()._call(method, sheet_id, ranges, replayed, *args)
+
+
+def trace_summary(path):
+    """Request counts, payload sizes and recorded latency per method of a trace."""
+    from .benchmarks import latency_summary
+
+    header, records = load_trace(path)
+    by_method = defaultdict(list)
+    for record in records:
+        by_method[record["method"]].append(record)
+    return {
+        "started_at": header and header.get("started_at"),
+        "requests": len(records),
+        "span_s": round(max(r["at"] for r in records) - min(r["at"] for r in records), 3) if records else 0.0,
+        "methods": {
+            method: {
+                "requests": len(calls),
+                "errors": sum(1 for call in calls if call["error"]),
+                "request_bytes": sum(call["request_bytes"] for call in calls),
+                "response_bytes": sum(call["response_bytes"] for call in calls),
+                "latency": latency_summary([call["duration"] for call in calls]),
+            }
+            for method, calls in sorted(by_method.items())
+        },
+    }
@@ -1,15 +1,33 @@
 from django.urls import path
 from .views import (
+    LivenessView,
+    ReadinessView,
     LoginView,
     UserManagementView,
     ToggleUserStatusView,
     SheetConfigView,
     LeadQueueView,
     DispositionView,
+    BulkDispositionView,
+    QueueOverviewView,
+    LeadSearchView,
+    LeadImportView,
+    LeadImportStatusView,
+    AppointmentSlotsView,
+    SuppressionListView,
     ResetPasswordView,
+    JournalStatusView,
+    JobStatusView,
+    MetricsView,
+    StatsView,
+    ExportView,
 )
 
 urlpatterns = [
+    # --- Health ---
+    path("health/live/", LivenessView.as_view(), name="health-live"),
+    path("health/ready/", ReadinessView.as_view(), name="health-ready"),
+    
     # --- Auth ---
     path("login/", LoginView.as_view(), name="login"),
     
@@ -22,7 +40,33 @@ urlpatterns = [
     # --- Google Sheets Config (Admin) ---
     path("sheet-config/", SheetConfigView.as_view(), name="sheet-config"),
     
+    # --- Do-Not-Call List (Admin) ---
+    path("suppression/", SuppressionListView.as_view(), name="suppression-list"),
+    
+    # --- Bulk Lead Import (Admin) ---
+    path("leads/import/", LeadImportView.as_view(), name="lead-import"),
+    path("leads/import/<int:job_id>/", LeadImportStatusView.as_view(), name="lead-import-status"),
+    
     # --- Lead Processing (Agent) ---
     path("leads/next/", LeadQueueView.as_view(), name="lead-next"),
     path("leads/disposition/", DispositionView.as_view(), name="lead-disposition"),
+    path("leads/disposition/bulk/", BulkDispositionView.as_view(), name="lead-disposition-bulk"),
+    path("leads/overview/", QueueOverviewView.as_view(), name="lead-overview"),
+    path("leads/search/", LeadSearchView.as_view(), name="lead-search"),
+    
+    # --- Appointments ---
+    path("appointments/slots/", AppointmentSlotsView.as_view(), name="appointment-slots"),
+    
+    # --- Reporting (Admin) ---
+    path("stats/", StatsView.as_view(), name="stats"),
+    path("export/<str:dataset>/", ExportView.as_view(), name="export"),
+    
+    # --- Sheet Write Journal (Admin) ---
+    path("journal/status/", JournalStatusView.as_view(), name="journal-status"),
+    
+    # --- Background Jobs (Admin) ---
+    path("jobs/status/", JobStatusView.as_view(), name="job-status"),
+    
+    # --- Worker Metrics (Admin) ---
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
\ No newline at end of file
@@ -1,54 +1,55 @@
-import json
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
-from django.conf import settings
 from datetime import datetime
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 
+from .a1 import quote_tab
+from .backends import get_sheet_backend
+from .models import SheetConfig
+from .writes import WritePlan
+
+
+CONFIG_CACHE_KEY = "sheet_config"
+
+# Lock_Status value written by lock_lead, followed by the agent id
+LOCK_PREFIX = "In Progress by Agent "
+
+# Columns a lead tab must have before it can be used or imported into
+REQUIRED_COLUMNS = ["Business Name", "Phone Number", "Message", "Disposition"]
+
+# Dispositions that take a lead out of the queue for good
+EXCLUDED_STATUSES = {"Called", "NA", "NI", "DNC", "Booked", "BOOK"}
+
+
+def headers_cache_key(sheet_id, tab_name):
+    return f"sheet_headers:{sheet_id}:{tab_name}"
+
+
+def get_sheet_config():
+    """Return the active SheetConfig, cached until it changes (or None)."""
+    config = cache.get(CONFIG_CACHE_KEY)
+    if config is None:
+        config = SheetConfig.objects.first()
+        if config is not None:
+            cache.set(CONFIG_CACHE_KEY, config, settings.SHEET_CONFIG_CACHE_TTL)
+    return config
 
-def get_google_sheets_client():
-    """Create and return Google Sheets API client."""
-    try:
-        # Check if GOOGLE_SHEETS_CREDENTIALS is a file path or JSON string
-        creds_path_or_json = settings.GOOGLE_SHEETS_CREDENTIALS
-        
-        # If it's a file path (ends with .json or is a valid path)
-        if creds_path_or_json.endswith('.json') or os.path.isfile(creds_path_or_json):
-            creds = Credentials.from_service_account_file(
-                creds_path_or_json,
-                scopes=["https://www.googleapis.com/auth/spreadsheets"]
-            )
-        else:
-            # It's a JSON string
-            creds_json = json.loads(creds_path_or_json)
-            creds = Credentials.from_service_account_info(
-                creds_json,
-                scopes=["https://www.googleapis.com/auth/spreadsheets"]
-            )
-        
-        return build("sheets", "v4", credentials=creds)
-    except Exception as e:
-        raise Exception(f"Failed to initialize Google Sheets client: {str(e)}")
 
 def verify_sheet_connection(sheet_id, tab_name):
     """Verify Google Sheet + tab exist and check for required columns."""
     try:
-        client = get_google_sheets_client()
-        sheet_metadata = client.spreadsheets().get(spreadsheetId=sheet_id).execute()
+        backend = get_sheet_backend()
+        sheet_metadata = backend.get_metadata(sheet_id)
         sheets = [s["properties"]["title"] for s in sheet_metadata.get("sheets", [])]
         
         if tab_name not in sheets:
             return False, f"Tab '{tab_name}' not found in sheet"
         
         # Verify required columns exist
-        result = client.spreadsheets().values().get(
-            spreadsheetId=sheet_id,
-            range=f"{tab_name}!A1:Z1"
-        ).execute()
+        rows = backend.get_values(sheet_id, f"{quote_tab(tab_name)}!1:1")
         
-        headers = result.get("values", [[]])[0]
-        required_columns = ["Business Name", "Phone Number", "Message", "Disposition"]
-        missing = [col for col in required_columns if col not in headers]
+        headers = rows[0] if rows else []
+        missing = [col for col in REQUIRED_COLUMNS if col not in headers]
         
         if missing:
             return False, f"Missing required columns: {', '.join(missing)}"
@@ -66,209 +67,101 @@ def get_column_index(headers, column_name):
         return None
 
 
-def fetch_qualified_leads(sheet_id, tab_name):
-    """
-    Fetch all qualified leads from Google Sheet based on PRD logic:
-    - Status is NOT "Called", "NA", "NI", "DNC", "Booked"
-    - If Status is "CB", CB_TIMESTAMP must be in the past
-    """
-    client = get_google_sheets_client()
-    
-    # Fetch all data
-    result = client.spreadsheets().values().get(
-        spreadsheetId=sheet_id,
-        range=f"{tab_name}!A:Z"
-    ).execute()
-    
-    rows = result.get("values", [])
-    if not rows:
-        return []
-    
-    headers = rows[0]
-    data_rows = rows[1:]
-    
-    # Get column indices
-    disposition_idx = get_column_index(headers, "Disposition")
-    cb_date_idx = get_column_index(headers, "CB_Date")
-    cb_time_idx = get_column_index(headers, "CB_Time")
-    lock_status_idx = get_column_index(headers, "Lock_Status")
-    
-    qualified_leads = []
-    current_time = timezone.now()
-    
-    for idx, row in enumerate(data_rows, start=2):  # Start at row 2 (after header)
-        # Ensure row has enough columns
-        while len(row) < len(headers):
-            row.append("")
-        
-        disposition = row[disposition_idx] if disposition_idx is not None else ""
-        lock_status = row[lock_status_idx] if lock_status_idx is not None else ""
-        
-        # Skip if already locked
-        if lock_status and lock_status.strip():
-            continue
-        
-        # Skip if disposition is in excluded list
-        excluded_statuses = ["Called", "NA", "NI", "DNC", "Booked", "BOOK"]
-        if disposition in excluded_statuses:
-            continue
-        
-        # Handle CB (Call Back) logic
-        if disposition == "CB":
-            cb_date = row[cb_date_idx] if cb_date_idx is not None else ""
-            cb_time = row[cb_time_idx] if cb_time_idx is not None else ""
-            
-            if cb_date and cb_time:
-                try:
-                    # Parse CB timestamp
-                    cb_datetime_str = f"{cb_date} {cb_time}"
-                    cb_datetime = datetime.strptime(cb_datetime_str, "%Y-%m-%d %H:%M")
-                    cb_datetime = timezone.make_aware(cb_datetime)
-                    
-                    # Skip if CB time is in the future
-                    if cb_datetime > current_time:
-                        continue
-                except ValueError:
-                    # Invalid date format, skip
-                    continue
-            else:
-                # No CB time set, skip
-                continue
-        
-        # Build lead data dictionary
-        lead_data = {header: row[i] if i < len(row) else "" for i, header in enumerate(headers)}
-        lead_data["row_index"] = idx
-        qualified_leads.append(lead_data)
-    
-    return qualified_leads
+def parse_callback_time(cb_date, cb_time):
+    """Parse CB_Date/CB_Time cells into an aware datetime, or None if unset/invalid."""
+    if not cb_date or not cb_time:
+        return None
+    try:
+        return timezone.make_aware(datetime.strptime(f"{cb_date} {cb_time}", "%Y-%m-%d %H:%M"))
+    except ValueError:
+        return None
+
+
+def get_headers(sheet_id, tab_name):
+    """Fetch the header row of a tab, served from cache when possible."""
+    key = headers_cache_key(sheet_id, tab_name)
+    headers = cache.get(key)
+    if headers is None:
+        header_rows = get_sheet_backend().get_values(sheet_id, f"{quote_tab(tab_name)}!1:1")
+        headers = header_rows[0] if header_rows else []
+        cache.set(key, headers, settings.SHEET_HEADER_CACHE_TTL)
+    return headers
 
 
 def lock_lead(sheet_id, tab_name, row_index, agent_id):
     """Lock a lead by setting Lock_Status column."""
-    client = get_google_sheets_client()
-    
-    # Get headers to find Lock_Status column
-    result = client.spreadsheets().values().get(
-        spreadsheetId=sheet_id,
-        range=f"{tab_name}!A1:Z1"
-    ).execute()
-    
-    headers = result.get("values", [[]])[0]
+    headers = get_headers(sheet_id, tab_name)
     lock_status_idx = get_column_index(headers, "Lock_Status")
     
     if lock_status_idx is None:
         raise Exception("Lock_Status column not found in sheet")
     
-    # Convert to A1 notation
-    column_letter = chr(65 + lock_status_idx)  # A=65
-    cell_range = f"{tab_name}!{column_letter}{row_index}"
-    
     # Set lock
-    lock_value = f"In Progress by Agent {agent_id}"
-    client.spreadsheets().values().update(
-        spreadsheetId=sheet_id,
-        range=cell_range,
-        valueInputOption="RAW",
-        body={"values": [[lock_value]]}
-    ).execute()
+    plan = WritePlan(tab_name)
+    plan.set(row_index, lock_status_idx, f"{LOCK_PREFIX}{agent_id}")
+    get_sheet_backend().batch_update(sheet_id, plan.ranges())
 
 
 def unlock_lead(sheet_id, tab_name, row_index):
     """Unlock a lead by clearing Lock_Status column."""
-    client = get_google_sheets_client()
-    
-    # Get headers
-    result = client.spreadsheets().values().get(
-        spreadsheetId=sheet_id,
-        range=f"{tab_name}!A1:Z1"
-    ).execute()
-    
-    headers = result.get("values", [[]])[0]
+    headers = get_headers(sheet_id, tab_name)
     lock_status_idx = get_column_index(headers, "Lock_Status")
     
     if lock_status_idx is None:
         return
     
-    column_letter = chr(65 + lock_status_idx)
-    cell_range = f"{tab_name}!{column_letter}{row_index}"
-    
-    client.spreadsheets().values().update(
-        spreadsheetId=sheet_id,
-        range=cell_range,
-        valueInputOption="RAW",
-        body={"values": [[""]]}
-    ).execute()
+    plan = WritePlan(tab_name)
+    plan.set(row_index, lock_status_idx, "")
+    get_sheet_backend().batch_update(sheet_id, plan.ranges())
 
 
-def update_lead_disposition(sheet_id, tab_name, row_index, disposition, agent_id, extra_data=None):
+def disposition_values(disposition, agent_id, timestamp, extra_data=None):
     """
-    Write lead disposition back to Google Sheet.
-    Updates: Disposition, Agent_ID, Timestamp, Lock_Status, and any extra fields.
+    Map column name -> value for a disposition write:
+    Disposition, Agent_ID, Timestamp, cleared Lock_Status, and any extra fields.
     """
-    client = get_google_sheets_client()
-    
-    # Get headers
-    result = client.spreadsheets().values().get(
-        spreadsheetId=sheet_id,
-        range=f"{tab_name}!A1:Z1"
-    ).execute()
-    
-    headers = result.get("values", [[]])[0]
-    
-    # Prepare updates
-    updates = []
-    timestamp = timezone.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Update Disposition
-    disp_idx = get_column_index(headers, "Disposition")
-    if disp_idx is not None:
-        col_letter = chr(65 + disp_idx)
-        updates.append({
-            "range": f"{tab_name}!{col_letter}{row_index}",
-            "values": [[disposition]]
-        })
-    
-    # Update Agent_ID
-    agent_idx = get_column_index(headers, "Agent_ID")
-    if agent_idx is not None:
-        col_letter = chr(65 + agent_idx)
-        updates.append({
-            "range": f"{tab_name}!{col_letter}{row_index}",
-            "values": [[str(agent_id)]]
-        })
-    
-    # Update Timestamp
-    ts_idx = get_column_index(headers, "Timestamp")
-    if ts_idx is not None:
-        col_letter = chr(65 + ts_idx)
-        updates.append({
-            "range": f"{tab_name}!{col_letter}{row_index}",
-            "values": [[timestamp]]
-        })
-    
-    # Clear Lock_Status
-    lock_idx = get_column_index(headers, "Lock_Status")
-    if lock_idx is not None:
-        col_letter = chr(65 + lock_idx)
-        updates.append({
-            "range": f"{tab_name}!{col_letter}{row_index}",
-            "values": [[""]]
-        })
+    values = {
+        "Disposition": disposition,
+        "Agent_ID": str(agent_id),
+        "Timestamp": timestamp,
+        "Lock_Status": "",
+    }
     
     # Handle extra data (CB dates/times, appointment info)
     if extra_data:
         for key, value in extra_data.items():
-            idx = get_column_index(headers, key)
-            if idx is not None:
-                col_letter = chr(65 + idx)
-                updates.append({
-                    "range": f"{tab_name}!{col_letter}{row_index}",
-                    "values": [[str(value)]]
-                })
+            values[key] = str(value)
+    return values
+
+
+def column_cells(headers, values):
+    """Map column name -> value to column index -> value, dropping columns the tab lacks."""
+    cells = {}
+    for column_name, value in values.items():
+        idx = get_column_index(headers, column_name)
+        if idx is not None:
+            cells[idx] = value
+    return cells
+
+
+def disposition_cells(headers, disposition, agent_id, timestamp, extra_data=None):
+    """Map column index -> value for a disposition write (see disposition_values)."""
+    return column_cells(headers, disposition_values(disposition, agent_id, timestamp, extra_data))
+
+
+def update_lead_disposition(sheet_id, tab_name, row_index, disposition, agent_id, extra_data=None, timestamp=None):
+    """
+    Write lead disposition back to Google Sheet.
+    Updates: Disposition, Agent_ID, Timestamp, Lock_Status, and any extra fields.
+    Adjacent cells are coalesced into as few ranges as possible.
+    """
+    headers = get_headers(sheet_id, tab_name)
+    if timestamp is None:
+        timestamp = timezone.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    plan = WritePlan(tab_name)
+    plan.set_row(int(row_index), disposition_cells(headers, disposition, agent_id, timestamp, extra_data))
     
     # Batch update
-    if updates:
-        client.spreadsheets().values().batchUpdate(
-            spreadsheetId=sheet_id,
-            body={"data": updates, "valueInputOption": "RAW"}
-        ).execute()
\ No newline at end of file
+    if plan:
+        get_sheet_backend().batch_update(sheet_id, plan.ranges())
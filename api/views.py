@@ -2,21 +2,57 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth.hashers import check_password
-from django.utils.timezone import now
-from datetime import datetime
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import now, make_aware, is_naive
+from collections import Counter
+from datetime import datetime, time, timedelta
+import csv
+import io
+import os
 import string
+import uuid
 import random
 
-from .models import User, SheetConfig
+from . import overlay
+from .admission import admission_controlled, admission_metrics
+from .appointments import (
+    SlotUnavailable,
+    appointment_duration,
+    book_appointment,
+    get_calendar_index,
+    invalidate_calendar_index,
+)
+from .history import disposition_event, record_disposition_events
+from .journal import (
+    MAX_IDEMPOTENCY_KEY_LENGTH,
+    IdempotencyKeyReused,
+    apply_all_now,
+    apply_now,
+    journal_status,
+    journaled_entries,
+    record_mutation,
+    record_mutations,
+    scoped_idempotency_key,
+)
+from .models import Appointment, ImportJob, User, SheetConfig, SuppressedNumber
+from .routers import replica_reads
+from .routing import next_lead
 from .serializers import UserSerializer, SheetConfigSerializer
+from .snapshot import get_snapshot
 from .utils import (
     verify_sheet_connection,
-    fetch_qualified_leads,
-    lock_lead,
-    update_lead_disposition,
+    get_sheet_config,
+    parse_callback_time,
 )
 
+# Subsystems behind admin and ops endpoints (exports, imports, metrics, stats,
+# job status, warm-up) are imported inside those views, so a worker doesn't
+# load them before serving its first lead.
+
 
 # ----------------------
 # Custom Permission
@@ -31,6 +67,63 @@ class IsAdmin(permissions.BasePermission):
         )
 
 
+# ----------------------
+# Request Params
+# ----------------------
+def parse_moment(value, end_of_day=False):
+    """Parse an ISO date or datetime query param into an aware datetime (or None)."""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Invalid date: {value}")
+        moment = datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min)
+    return make_aware(moment) if is_naive(moment) else moment
+
+
+def idempotency_key(request):
+    """The request's Idempotency-Key header (None if absent); ValueError if it is empty or too long."""
+    key = request.headers.get("Idempotency-Key")
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise ValueError(f"Idempotency-Key must be 1-{MAX_IDEMPOTENCY_KEY_LENGTH} characters")
+    return key
+
+
+# ----------------------
+# Health Checks
+# ----------------------
+class LivenessView(APIView):
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        """The process is up and serving requests."""
+        return Response({"status": "ok"})
+
+
+class ReadinessView(APIView):
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+
+    def get(self, request):
+        """
+        The worker has opened DB connections, built the Sheets client and
+        primed its caches. Returns 503 until warm-up succeeds.
+        """
+        from .warmup import readiness
+
+        state = readiness()
+        return Response(
+            state,
+            status=status.HTTP_200_OK if state["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+
 # ----------------------
 # Auth
 # ----------------------
@@ -50,40 +143,53 @@ class LoginView(APIView):
         
         try:
             user = User.objects.get(email=email)
-            
-            # Check if user is active
-            if user.status != "active":
-                return Response(
-                    {"error": "Account is inactive"},
-                    status=status.HTTP_403_FORBIDDEN,
-                )
-            
-            if check_password(password, user.password):
-                # Update last login
-                user.last_login = now()
-                user.save()
-                
-                # Generate tokens
-                refresh = RefreshToken.for_user(user)
-                
-                return Response({
-                    "refresh": str(refresh),
-                    "access": str(refresh.access_token),
-                    "role": user.role,
-                    "user_id": str(user.id),
-                    "name": user.name,
-                })
-            
+        except User.DoesNotExist:
+            # Hash anyway so unknown emails take as long as wrong passwords
+            User().set_password(password)
             return Response(
                 {"error": "Invalid credentials"},
                 status=status.HTTP_401_UNAUTHORIZED,
             )
-        except User.DoesNotExist:
+
+        # Check if user is active
+        if user.status != "active":
+            return Response(
+                {"error": "Account is inactive"},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        rehashed = []
+
+        def rehash(raw_password):
+            # Stored hash uses an old algorithm or work factor; upgrade it
+            user.set_password(raw_password)
+            rehashed.append(user.password)
+
+        if not check_password(password, user.password, rehash):
             return Response(
                 {"error": "Invalid credentials"},
                 status=status.HTTP_401_UNAUTHORIZED,
             )
 
+        # Write only the changed columns, without save()'s post_save
+        # invalidation: cached users don't depend on last_login
+        user.last_login = now()
+        fields = {"last_login": user.last_login}
+        if rehashed:
+            fields["password"] = rehashed[0]
+        User.objects.filter(pk=user.pk).update(**fields)
+
+        # Generate tokens
+        refresh = RefreshToken.for_user(user)
+
+        return Response({
+            "refresh": str(refresh),
+            "access": str(refresh.access_token),
+            "role": user.role,
+            "user_id": str(user.id),
+            "name": user.name,
+        })
+
 
 # ----------------------
 # User Management (Admin Only)
@@ -91,6 +197,7 @@ class LoginView(APIView):
 class UserManagementView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsAdmin]
 
+    @replica_reads
     def get(self, request, user_id=None):
         """Get all users or a specific user."""
         if user_id:
@@ -260,6 +367,7 @@ class SheetConfigView(APIView):
             status=status.HTTP_404_NOT_FOUND,
         )
 
+    @admission_controlled("sheets")
     def post(self, request):
         """Create or update sheet configuration."""
         sheet_id = request.data.get("sheet_id")
@@ -299,18 +407,159 @@ class SheetConfigView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+# ----------------------
+# Do-Not-Call List (Admin Only)
+# ----------------------
+def uploaded_phone_numbers(upload):
+    """
+    Phone numbers from an uploaded CSV or plain list, one per line. Uses the
+    first column whose header mentions "phone", else the first column.
+    """
+    reader = csv.reader(io.TextIOWrapper(upload, encoding="utf-8-sig", newline=""))
+    column = 0
+    for line_number, row in enumerate(reader):
+        if not row:
+            continue
+        if line_number == 0:
+            phone_columns = [i for i, cell in enumerate(row) if "phone" in cell.lower()]
+            if phone_columns:
+                column = phone_columns[0]
+                continue
+        if column < len(row):
+            yield row[column]
+
+
+class SuppressionListView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        """Size of the do-not-call list."""
+        return Response({"count": SuppressedNumber.objects.count()})
+
+    def post(self, request):
+        """
+        Add numbers from an uploaded file ("file") or a JSON list ("numbers").
+        Numbers are normalized, so formatting differences don't matter.
+        """
+        from .suppression import add_suppressed_numbers
+
+        upload = request.FILES.get("file")
+        if upload is not None:
+            numbers = uploaded_phone_numbers(upload)
+        else:
+            numbers = request.data.get("numbers")
+            if not isinstance(numbers, list):
+                return Response(
+                    {"error": "Upload a file or provide a list of numbers"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            numbers = [str(number) for number in numbers]
+
+        try:
+            added, invalid = add_suppressed_numbers(numbers, added_by=request.user)
+        except UnicodeDecodeError:
+            return Response(
+                {"error": "File must be UTF-8 text"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response({
+            "added": added,
+            "invalid": invalid,
+            "count": SuppressedNumber.objects.count(),
+        })
+
+
+# ----------------------
+# Bulk Lead Import (Admin Only)
+# ----------------------
+def import_job_status(job):
+    return {
+        "id": job.pk,
+        "filename": job.filename,
+        "status": job.status,
+        "processed_rows": job.processed_rows,
+        "imported_rows": job.imported_rows,
+        "duplicate_rows": job.duplicate_rows,
+        "invalid_rows": job.invalid_rows,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
+
+
+class LeadImportView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def post(self, request):
+        """
+        Upload a CSV of leads to append to the configured sheet. The file is
+        checked for the required columns, then imported in the background;
+        poll the returned job for progress.
+        """
+        from .imports import LeadImportError, check_upload, save_upload, start_import
+
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response(
+                {"error": "file is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        config = get_sheet_config()
+        if not config:
+            return Response(
+                {"error": "Google Sheet not configured"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        path = save_upload(upload)
+        try:
+            check_upload(path)
+        except LeadImportError as e:
+            os.remove(path)
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        job = ImportJob.objects.create(
+            created_by=request.user,
+            sheet_id=config.sheet_id,
+            tab_name=config.tab_name,
+            filename=upload.name,
+            source_path=path,
+        )
+        job = start_import(job)
+        return Response(import_job_status(job), status=status.HTTP_202_ACCEPTED)
+
+
+class LeadImportStatusView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def get(self, request, job_id):
+        """Progress of an import job."""
+        try:
+            job = ImportJob.objects.get(pk=job_id)
+        except ImportJob.DoesNotExist:
+            return Response(
+                {"error": "Import job not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        return Response(import_job_status(job))
+
+
 # ----------------------
 # Lead Queue (Agent Access)
 # ----------------------
 class LeadQueueView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @admission_controlled("sheets")
     def get(self, request):
         """
-        Fetch next available qualified lead and lock it for the agent.
-        Returns lead data from Google Sheets.
+        Route the next qualified lead to the agent (see api/routing.py) and
+        lock it for them. Returns lead data from Google Sheets.
         """
-        config = SheetConfig.objects.first()
+        config = get_sheet_config()
         if not config:
             return Response(
                 {"error": "Google Sheet not configured. Please contact admin."},
@@ -318,25 +567,32 @@ class LeadQueueView(APIView):
             )
         
         try:
-            # Fetch all qualified leads
-            qualified_leads = fetch_qualified_leads(config.sheet_id, config.tab_name)
-            
-            if not qualified_leads:
+            # Best qualified lead by routing priority that no other request
+            # in this worker has just claimed
+            snapshot = get_snapshot(config.sheet_id, config.tab_name)
+            lead, queue_count = next_lead(snapshot, request.user)
+            if lead is None:
                 return Response(
                     {"message": "No available leads"},
                     status=status.HTTP_404_NOT_FOUND,
                 )
-            
-            # Get first qualified lead
-            lead = qualified_leads[0]
             row_index = lead["row_index"]
             
-            # Lock the lead for this agent
-            lock_lead(config.sheet_id, config.tab_name, row_index, request.user.id)
+            # Lock the lead for this agent (queued if the sheet is unavailable);
+            # if the lock can't be journaled, give the claimed row back
+            try:
+                mutation, _ = record_mutation(
+                    "lock", config.sheet_id, config.tab_name, row_index, request.user.id
+                )
+            except Exception:
+                overlay.release(config.sheet_id, config.tab_name, row_index, request.user.id)
+                raise
+            locked = apply_now(mutation)
             
             return Response({
                 "lead": lead,
-                "queue_count": len(qualified_leads)
+                "queue_count": queue_count,
+                "lock_pending": not locked,
             })
         
         except Exception as e:
@@ -347,79 +603,528 @@ class LeadQueueView(APIView):
 
 
 # ----------------------
-# Lead Disposition (Agent Access)
+# Queue Overview (Admin Only)
 # ----------------------
-class DispositionView(APIView):
-    permission_classes = [permissions.IsAuthenticated]
+class QueueOverviewView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
 
-    def post(self, request):
+    @admission_controlled("sheets")
+    def get(self, request):
         """
-        Update lead disposition in Google Sheets.
-        Handles: NA, NI, DNC, CB, BOOK
+        Counts by disposition, locks per agent, due/future callbacks and fresh
+        leads, computed from the cached sheet snapshot.
         """
-        config = SheetConfig.objects.first()
+        config = get_sheet_config()
         if not config:
             return Response(
                 {"error": "Google Sheet not configured"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        row_index = request.data.get("row_index")
-        disposition = request.data.get("disposition")
-        extra_data = request.data.get("extra_data", {})
+        try:
+            snapshot = get_snapshot(config.sheet_id, config.tab_name)
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to load queue: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        return Response(snapshot.overview())
+
+
+# ----------------------
+# Lead Search
+# ----------------------
+class LeadSearchView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
 
-        if not row_index or not disposition:
+    @admission_controlled("sheets")
+    def get(self, request):
+        """
+        Search leads by business name, phone number and other columns.
+        Params: q, page (default 1), page_size (default 20, max 100).
+        """
+        query = request.query_params.get("q", "").strip()
+        if not query:
             return Response(
-                {"error": "row_index and disposition are required"},
+                {"error": "q is required"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            page = max(int(request.query_params.get("page", 1)), 1)
+            page_size = min(max(int(request.query_params.get("page_size", 20)), 1), 100)
+        except ValueError:
+            return Response(
+                {"error": "page and page_size must be integers"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Validate disposition
-        valid_dispositions = ["NA", "NI", "DNC", "CB", "BOOK"]
-        if disposition not in valid_dispositions:
+        config = get_sheet_config()
+        if not config:
             return Response(
-                {"error": f"Invalid disposition. Must be one of: {', '.join(valid_dispositions)}"},
+                {"error": "Google Sheet not configured"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Validate extra data for CB and BOOK
-        if disposition == "CB":
-            if not extra_data.get("CB_Date") or not extra_data.get("CB_Time"):
-                return Response(
-                    {"error": "CB_Date and CB_Time are required for Call Back disposition"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
-        
-        if disposition == "BOOK":
-            if not extra_data.get("Appointment_Date") or not extra_data.get("Appointment_Time"):
-                return Response(
-                    {"error": "Appointment_Date and Appointment_Time are required for Book disposition"},
-                    status=status.HTTP_400_BAD_REQUEST,
-                )
+        try:
+            snapshot = get_snapshot(config.sheet_id, config.tab_name)
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to load leads: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        positions = snapshot.search_index().search(query)
+        start = (page - 1) * page_size
+        return Response({
+            "count": len(positions),
+            "page": page,
+            "page_size": page_size,
+            "as_of": snapshot.fetched_at,
+            "results": [snapshot.record(position) for position in positions[start:start + page_size]],
+        })
+
+
+# ----------------------
+# Lead Disposition (Agent Access)
+# ----------------------
+VALID_DISPOSITIONS = ["NA", "NI", "DNC", "CB", "BOOK"]
 
+
+def clean_disposition(data):
+    """
+    Validate one disposition submission. Returns (row_index, disposition,
+    extra_data, owner_id, appointment_start), or raises ValueError with the
+    message for the client.
+    """
+    row_index = data.get("row_index")
+    disposition = data.get("disposition")
+    extra_data = data.get("extra_data") or {}
+
+    if not row_index or not disposition:
+        raise ValueError("row_index and disposition are required")
+
+    try:
+        row_index = int(row_index)
+    except (TypeError, ValueError):
+        raise ValueError("row_index must be an integer")
+
+    # Validate disposition
+    if disposition not in VALID_DISPOSITIONS:
+        raise ValueError(f"Invalid disposition. Must be one of: {', '.join(VALID_DISPOSITIONS)}")
+
+    if not isinstance(extra_data, dict):
+        raise ValueError("extra_data must be an object")
+
+    # Validate extra data for CB and BOOK
+    if disposition == "CB":
+        if not extra_data.get("CB_Date") or not extra_data.get("CB_Time"):
+            raise ValueError("CB_Date and CB_Time are required for Call Back disposition")
+
+    owner_id = data.get("owner_id") or None
+    if owner_id is not None:
         try:
-            update_lead_disposition(
-                config.sheet_id,
-                config.tab_name,
-                row_index,
-                disposition,
-                request.user.id,
-                extra_data,
+            owner_id = uuid.UUID(str(owner_id))
+        except ValueError:
+            raise ValueError("Invalid owner_id")
+
+    appointment_start = None
+    if disposition == "BOOK":
+        if not extra_data.get("Appointment_Date") or not extra_data.get("Appointment_Time"):
+            raise ValueError("Appointment_Date and Appointment_Time are required for Book disposition")
+        # Appointments are booked when the cells use the callback format
+        # (YYYY-MM-DD / HH:MM); other free-form values are still accepted and
+        # written to the sheet, just without a calendar booking
+        appointment_start = parse_callback_time(extra_data["Appointment_Date"], extra_data["Appointment_Time"])
+
+    return row_index, disposition, extra_data, owner_id, appointment_start
+
+
+class DispositionView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @admission_controlled("sheets")
+    def post(self, request):
+        """
+        Update lead disposition in Google Sheets.
+        Handles: NA, NI, DNC, CB, BOOK
+        """
+        config = get_sheet_config()
+        if not config:
+            return Response(
+                {"error": "Google Sheet not configured"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
+
+        try:
+            row_index, disposition, extra_data, owner_id, appointment_start = clean_disposition(request.data)
+            key = idempotency_key(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # Journal first so the outcome survives a Sheets outage; a booking
+            # conflict rolls the journal entry back with it
+            dispositioned_at = now()
+            with transaction.atomic():
+                mutation, created = record_mutation(
+                    "disposition",
+                    config.sheet_id,
+                    config.tab_name,
+                    row_index,
+                    request.user.id,
+                    payload={
+                        "disposition": disposition,
+                        "extra_data": extra_data,
+                        "timestamp": dispositioned_at.strftime("%Y-%m-%d %H:%M:%S"),
+                    },
+                    idempotency_key=key,
+                )
+                if created:
+                    if appointment_start is not None:
+                        book_appointment(
+                            appointment_start,
+                            config.sheet_id,
+                            config.tab_name,
+                            row_index,
+                            booked_by=request.user,
+                            owner_id=owner_id,
+                            mutation=mutation,
+                        )
+                    record_disposition_events([disposition_event(mutation, dispositioned_at)])
+            applied = apply_now(mutation)
             
-            response_data = {
-                "status": "success",
-                "message": "Disposition updated successfully"
-            }
+            if applied:
+                response_data = {
+                    "status": "success",
+                    "message": "Disposition updated successfully"
+                }
+                response_status = status.HTTP_200_OK
+            else:
+                response_data = {
+                    "status": "queued",
+                    "message": "Disposition saved and will be written to the sheet shortly"
+                }
+                response_status = status.HTTP_202_ACCEPTED
             
             # Add celebration flag for bookings
             if disposition == "BOOK":
                 response_data["celebration"] = True
             
-            return Response(response_data)
+            return Response(response_data, status=response_status)
+        
+        except SlotUnavailable as e:
+            # Someone else may have just booked it, so suggest from fresh data
+            invalidate_calendar_index()
+            alternatives = get_calendar_index().free_slots(
+                appointment_start, appointment_start + timedelta(days=7), appointment_duration(),
+                owner_id=owner_id, limit=3,
+            )
+            return Response(
+                {"error": str(e), "alternatives": [slot_data(slot) for slot in alternatives]},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        except IdempotencyKeyReused as e:
+            return Response({"error": str(e)}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
         
         except Exception as e:
             return Response(
                 {"error": f"Failed to update disposition: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            )
\ No newline at end of file
+            )
+
+
+class BulkDispositionView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @admission_controlled("sheets")
+    def post(self, request):
+        """
+        Disposition many leads at once, e.g. a supervisor clean-up or a dialer
+        flushing its outcomes. Body: {"dispositions": [{row_index, disposition,
+        extra_data, owner_id}, ...]}, each validated like DispositionView.
+        Valid rows are journaled together and written in as few batchUpdates
+        as the journal allows. Returns one result per submitted row, in order.
+        """
+        config = get_sheet_config()
+        if not config:
+            return Response(
+                {"error": "Google Sheet not configured"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        items = request.data.get("dispositions")
+        if not isinstance(items, list) or not items:
+            return Response(
+                {"error": "dispositions must be a non-empty list"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > settings.BULK_DISPOSITION_MAX_ROWS:
+            return Response(
+                {"error": f"At most {settings.BULK_DISPOSITION_MAX_ROWS} dispositions per request"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = [None] * len(items)
+        valid = []
+        for i, item in enumerate(items):
+            try:
+                if not isinstance(item, dict):
+                    raise ValueError("Each disposition must be an object")
+                valid.append((i, *clean_disposition(item)))
+            except ValueError as e:
+                row_index = item.get("row_index") if isinstance(item, dict) else None
+                results[i] = {"row_index": row_index, "status": "invalid", "error": str(e)}
+
+        try:
+            key = idempotency_key(request)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # Keys are per agent, so two agents' requests never share journal entries
+        key = key and scoped_idempotency_key(request.user.id, key)
+        dispositioned_at = now()
+        timestamp = dispositioned_at.strftime("%Y-%m-%d %H:%M:%S")
+        journaled = {}
+        try:
+            with transaction.atomic():
+                # Book first, so a row whose slot is taken is never journaled;
+                # entries a retried request already journaled are not rebooked
+                already = journaled_entries(key, len(items)) if key else {}
+                appointments = {}
+                for i, row_index, disposition, extra_data, owner_id, appointment_start in valid:
+                    if appointment_start is None or i in already:
+                        continue
+                    try:
+                        appointments[i] = book_appointment(
+                            appointment_start,
+                            config.sheet_id,
+                            config.tab_name,
+                            row_index,
+                            booked_by=request.user,
+                            owner_id=owner_id,
+                        )
+                    except SlotUnavailable as e:
+                        results[i] = {"row_index": row_index, "status": "conflict", "error": str(e)}
+
+                entries = [
+                    (i, ("disposition", row_index, request.user.id, {
+                        "disposition": disposition,
+                        "extra_data": extra_data,
+                        "timestamp": timestamp,
+                    }))
+                    for i, row_index, disposition, extra_data, owner_id, appointment_start in valid
+                    if results[i] is None
+                ]
+                recorded = record_mutations(
+                    config.sheet_id,
+                    config.tab_name,
+                    [entry for _, entry in entries],
+                    idempotency_key=key,
+                    positions=[i for i, _ in entries],
+                )
+                new = []
+                for (i, _), (mutation, created) in zip(entries, recorded):
+                    journaled[i] = mutation
+                    if created:
+                        new.append(mutation)
+                        if i in appointments:
+                            appointments[i].mutation = mutation
+                if appointments:
+                    Appointment.objects.bulk_update(appointments.values(), ["mutation"])
+                record_disposition_events([disposition_event(mutation, dispositioned_at) for mutation in new])
+
+            applied = apply_all_now(journaled.values())
+        except Exception as e:
+            return Response(
+                {"error": f"Failed to update dispositions: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+        for i, mutation in journaled.items():
+            results[i] = {
+                "row_index": mutation.row_index,
+                "status": "success" if mutation.pk in applied else "queued",
+            }
+
+        summary = Counter(result["status"] for result in results)
+        rejected = summary["invalid"] + summary["conflict"]
+        return Response(
+            {"results": results, "summary": dict(summary)},
+            status=status.HTTP_207_MULTI_STATUS if rejected else status.HTTP_200_OK,
+        )
+
+
+# ----------------------
+# Appointment Slots
+# ----------------------
+def slot_data(slot):
+    start, end, owner_id = slot
+    return {"start": start, "end": end, "owner_id": owner_id}
+
+
+class AppointmentSlotsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        """
+        Earliest free appointment slots, served from the in-memory index.
+        Query params: from (default now), to (default from + 7 days),
+        owner_id, limit (default 20, max 100).
+        """
+        try:
+            start = parse_moment(request.query_params.get("from")) or now()
+            end = parse_moment(request.query_params.get("to"), end_of_day=True) or start + timedelta(days=7)
+            limit = min(max(int(request.query_params.get("limit", 20)), 1), 100)
+            owner_id = request.query_params.get("owner_id")
+            owner_id = uuid.UUID(owner_id) if owner_id else None
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        slots = get_calendar_index().free_slots(start, end, appointment_duration(), owner_id=owner_id, limit=limit)
+        return Response({"slots": [slot_data(slot) for slot in slots]})
+
+
+# ----------------------
+# Sheet Write Journal Status (Admin Only)
+# ----------------------
+class JournalStatusView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        """Pending/failed journal entries and how far replay is lagging."""
+        return Response(journal_status())
+
+
+# ----------------------
+# Background Job Status (Admin Only)
+# ----------------------
+class JobStatusView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        """Queue depth per job kind, running jobs, recurring schedules and recent failures."""
+        from .jobs import job_status
+
+        return Response(job_status())
+
+
+# ----------------------
+# Worker Metrics (Admin Only)
+# ----------------------
+class MetricsView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        """
+        Per-worker admission control, database connection, cache invalidation
+        and premium lead routing metrics.
+        """
+        from .dbmetrics import database_metrics
+        from .invalidation import invalidation_metrics
+        from .routing import routing_metrics
+
+        return Response({
+            "admission": admission_metrics(),
+            "database": database_metrics(),
+            "invalidation": invalidation_metrics(),
+            "routing": routing_metrics(),
+        })
+
+
+# ----------------------
+# Disposition Stats (Admin Only)
+# ----------------------
+class StatsView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    @replica_reads
+    def get(self, request):
+        """
+        Dials, dials/hour, booking rate and per-disposition counts per agent
+        and campaign, read from hourly rollups. Defaults to today (UTC).
+        Query params: from, to (ISO date or datetime), agent_id.
+        """
+        from .rollups import disposition_stats
+
+        try:
+            start = parse_moment(request.query_params.get("from"))
+            end = parse_moment(request.query_params.get("to"), end_of_day=True)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        agent_id = request.query_params.get("agent_id")
+        if agent_id:
+            try:
+                uuid.UUID(agent_id)
+            except ValueError:
+                return Response({"error": "Invalid agent_id"}, status=status.HTTP_400_BAD_REQUEST)
+
+        current = now()
+        start = start or current.replace(hour=0, minute=0, second=0, microsecond=0)
+        end = end or current + timedelta(hours=1)
+
+        stats = disposition_stats(start, end, agent_id)
+        return Response({"from": start, "to": end, **stats})
+
+
+# ----------------------
+# Streaming Export (Admin Only)
+# ----------------------
+class ExportView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsAdmin]
+
+    def get(self, request, dataset):
+        """
+        Stream leads (from the sheet), dispositions (outcome history) or
+        history (the sheet write journal) as CSV or NDJSON.
+        Query params: output (csv|ndjson), from, to, agent_id, disposition.
+        """
+        from .exports import FORMATS, export_dispositions, export_history, export_leads
+
+        output = request.query_params.get("output", "csv")
+        if output not in FORMATS:
+            return Response(
+                {"error": f"output must be one of: {', '.join(FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            filters = {
+                "start": parse_moment(request.query_params.get("from")),
+                "end": parse_moment(request.query_params.get("to"), end_of_day=True),
+                "agent_id": request.query_params.get("agent_id"),
+                "disposition": request.query_params.get("disposition"),
+            }
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if filters["agent_id"]:
+            try:
+                uuid.UUID(filters["agent_id"])
+            except ValueError:
+                return Response({"error": "Invalid agent_id"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if dataset == "leads":
+            config = get_sheet_config()
+            if not config:
+                return Response(
+                    {"error": "Google Sheet not configured"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            rows = export_leads(config.sheet_id, config.tab_name, **filters)
+        elif dataset == "dispositions":
+            rows = export_dispositions(**filters)
+        elif dataset == "history":
+            rows = export_history(**filters)
+        else:
+            return Response(
+                {"error": "dataset must be one of: leads, dispositions, history"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        render, content_type = FORMATS[output]
+        response = StreamingHttpResponse(render(rows), content_type=content_type)
+        filename = f"{dataset}-{now():%Y%m%d-%H%M%S}.{output}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
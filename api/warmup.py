@@ -0,0 +1,88 @@
+"""
+Worker warm-up.
+
+``warm_up()`` pays the one-off costs of a fresh worker before it takes
+traffic: opening database connections, importing and building the Sheets
+client, and priming the config and column caches. It runs from the gunicorn
+``post_worker_init`` hook when WARMUP_ON_START is set, and lazily from the
+readiness endpoint otherwise.
+
+Database connections and the Sheets client are per thread, and the hook runs
+on the worker's main thread. That is the request thread of a sync worker, but
+gthread workers serve requests from a thread pool, so the hook also runs
+``warm_threads()`` to warm every thread in the pool.
+"""
+import threading
+import time
+
+from django.db import connections
+from django.utils import timezone
+
+from .backends import get_sheet_backend
+from .utils import get_headers, get_sheet_config
+
+
+_state = {"ready": False, "warmed_at": None, "steps": {}, "error": None}
+_lock = threading.Lock()
+
+
+def _timed(steps, name, func):
+    started = time.perf_counter()
+    result = func()
+    steps[name] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+
+def warm_thread(steps=None):
+    """Open the current thread's database connections and build its Sheets client."""
+    steps = {} if steps is None else steps
+    for alias in connections:
+        _timed(steps, f"database:{alias}", connections[alias].ensure_connection)
+    _timed(steps, "sheets_client", get_sheet_backend().warm_up)
+    return steps
+
+
+def warm_threads(executor, count, timeout=30):
+    """
+    Run ``warm_thread()`` on each of the ``count`` threads of a thread pool
+    executor. Every task waits until all of them have started, so no thread
+    picks up two. Returns how many threads were warmed.
+    """
+    barrier = threading.Barrier(count)
+
+    def task():
+        barrier.wait(timeout)
+        warm_thread()
+
+    warmed = 0
+    for future in [executor.submit(task) for _ in range(count)]:
+        try:
+            future.result()
+        except Exception:
+            continue
+        warmed += 1
+    return warmed
+
+
+def warm_up():
+    """Run every warm-up step and record per-step timings in milliseconds."""
+    with _lock:
+        steps = {}
+        try:
+            warm_thread(steps)
+            config = _timed(steps, "sheet_config", get_sheet_config)
+            if config is not None:
+                _timed(steps, "columns", lambda: get_headers(config.sheet_id, config.tab_name))
+        except Exception as e:
+            _state.update(ready=False, steps=steps, error=str(e))
+            return False
+
+        _state.update(ready=True, warmed_at=timezone.now(), steps=steps, error=None)
+        return True
+
+
+def readiness():
+    """Return the warm-up state, warming up first if it has not run yet."""
+    if not _state["ready"]:
+        warm_up()
+    return dict(_state)
@@ -0,0 +1,82 @@
+"""
+Write planning for sheet updates.
+
+Callers record individual cell writes; the plan coalesces horizontally
+adjacent cells into one range per row run, then stacks identical runs on
+consecutive rows into rectangles, so a batchUpdate carries as few ranges
+as possible.
+"""
+from .a1 import format_range
+
+
+class WritePlan:
+    """Collects cell writes for one tab and emits coalesced batchUpdate data."""
+
+    def __init__(self, tab_name):
+        self.tab_name = tab_name
+        self.cells = {}
+
+    def __len__(self):
+        return len(self.cells)
+
+    def set(self, row, col, value):
+        """Write ``value`` at a one-based row and zero-based column."""
+        self.cells[(row, col)] = value
+
+    def set_row(self, row, values_by_col):
+        """Write several cells of one row from a {column index: value} mapping."""
+        for col, value in values_by_col.items():
+            self.set(row, col, value)
+
+    def _row_runs(self):
+        """Yield (row, start_col, end_col, values) for each run of adjacent columns."""
+        by_row = {}
+        for (row, col), value in self.cells.items():
+            by_row.setdefault(row, {})[col] = value
+
+        for row in sorted(by_row):
+            cols = by_row[row]
+            run_start = None
+            previous = None
+            values = []
+            for col in sorted(cols):
+                if previous is not None and col != previous + 1:
+                    yield row, run_start, previous, values
+                    run_start, values = None, []
+                if run_start is None:
+                    run_start = col
+                values.append(cols[col])
+                previous = col
+            if run_start is not None:
+                yield row, run_start, previous, values
+
+    def ranges(self):
+        """Return batchUpdate ``data`` entries covering every planned cell."""
+        # Stack runs spanning the same columns on consecutive rows
+        blocks = []
+        open_blocks = {}
+        for row, start_col, end_col, values in self._row_runs():
+            block = open_blocks.get((start_col, end_col))
+            if block is not None and block["end_row"] == row - 1:
+                block["end_row"] = row
+                block["values"].append(values)
+            else:
+                block = {
+                    "start_row": row,
+                    "end_row": row,
+                    "start_col": start_col,
+                    "end_col": end_col,
+                    "values": [values],
+                }
+                open_blocks[(start_col, end_col)] = block
+                blocks.append(block)
+
+        return [
+            {
+                "range": format_range(
+                    self.tab_name, block["start_col"], block["start_row"], block["end_col"], block["end_row"]
+                ),
+                "values": block["values"],
+            }
+            for block in blocks
+        ]
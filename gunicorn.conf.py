@@ -0,0 +1,26 @@
+import os
+
+
+def post_worker_init(worker):
+    """
+    Start the cache invalidation listener, and warm up each worker (and each
+    of its request threads) before it accepts requests when WARMUP_ON_START
+    is set.
+    """
+    from api.invalidation import start_listener
+
+    start_listener()
+
+    if os.getenv("WARMUP_ON_START", "False") == "True":
+        from api.warmup import warm_threads, warm_up
+
+        if not warm_up():
+            worker.log.warning("Worker warm-up failed; readiness will retry on first probe")
+
+        # gthread workers serve requests from a thread pool, not this thread
+        pool = getattr(worker, "tpool", None)
+        if pool is not None:
+            threads = worker.cfg.threads
+            warmed = warm_threads(pool, threads)
+            if warmed < threads:
+                worker.log.warning("Warmed %d of %d request threads", warmed, threads)
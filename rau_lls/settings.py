@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import json
 from pathlib import Path
 from dotenv import load_dotenv
 import dj_database_url
@@ -71,7 +72,7 @@ CORS_ALLOW_CREDENTIALS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.CachedJWTAuthentication',
     ),
 }
 
@@ -107,12 +108,179 @@ AUTH_USER_MODEL = 'api.User'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connections are kept open for DB_CONN_MAX_AGE seconds and health-checked
+# before reuse, so requests don't pay Postgres connection setup every time.
+# Set DB_POOL=True to use Django's native psycopg pool instead (requires
+# psycopg 3: `pip install "psycopg[binary,pool]"`); pooling replaces
+# persistent connections, so CONN_MAX_AGE is forced to 0.
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '600'))
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+
 DATABASES = {
-    'default': dj_database_url.config(default=os.getenv('DATABASE_URL'))
+    'default': dj_database_url.config(
+        default=os.getenv('DATABASE_URL'),
+        conn_max_age=0 if DB_POOL else DB_CONN_MAX_AGE,
+        conn_health_checks=not DB_POOL,
+    )
 }
+
+if DB_POOL:
+    DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    }
+
+# Optional read replica. Views marked with api.routers.replica_reads send
+# their reads (user listing, stats) here; everything else uses 'default'.
+if os.getenv('DATABASE_REPLICA_URL'):
+    DATABASES['replica'] = dj_database_url.config(
+        env='DATABASE_REPLICA_URL',
+        conn_max_age=DB_CONN_MAX_AGE,
+        conn_health_checks=True,
+    )
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['api.routers.ReadReplicaRouter']
 #GOOGLE_SHEETS_CREDENTIALS = os.getenv('GOOGLE_SHEETS_CREDENTIALS')
 GOOGLE_SHEETS_CREDENTIALS = os.path.join(BASE_DIR, 'credentials.json')
 
+# Sheet storage backend used for all lead I/O.
+# Use 'api.backends.FakeSheetBackend' for offline testing and load tests; options
+# are passed to the backend constructor, e.g.
+# SHEETS_BACKEND_OPTIONS='{"path": "sheets.json", "latency": 0.2, "error_rate": 0.01}'
+SHEETS_BACKEND = os.getenv('SHEETS_BACKEND', 'api.backends.GoogleSheetsBackend')
+SHEETS_BACKEND_OPTIONS = json.loads(os.getenv('SHEETS_BACKEND_OPTIONS', '{}'))
+# Key for the pseudonyms in recorded Sheets traces (api.traces.RecordingBackend).
+# Give every worker the same value so they scrub equal values alike; when it
+# is unset each process picks a random key.
+SHEETS_TRACE_KEY = os.getenv('SHEETS_TRACE_KEY', '')
+
+# Per-process caches for the sheet config and header row (column map), in seconds.
+# Both are dropped immediately when SheetConfig changes.
+SHEET_CONFIG_CACHE_TTL = int(os.getenv('SHEET_CONFIG_CACHE_TTL', '300'))
+SHEET_HEADER_CACHE_TTL = int(os.getenv('SHEET_HEADER_CACHE_TTL', '300'))
+
+# How long a per-process snapshot of the whole lead tab is reused by the
+# lead queue, overview and search, in seconds.
+SHEET_SNAPSHOT_TTL = int(os.getenv('SHEET_SNAPSHOT_TTL', '30'))
+
+# Shared on-disk snapshots: when SHEET_SNAPSHOT_DIR is set, `manage.py
+# refresh_snapshots` re-reads the lead tab every SHEET_SNAPSHOT_REFRESH_SECONDS
+# (keep it well under SHEET_SNAPSHOT_TTL) and workers map its file instead of
+# each reading the sheet. Workers fall back to their own reads if it lags.
+SHEET_SNAPSHOT_DIR = os.getenv('SHEET_SNAPSHOT_DIR', '')
+SHEET_SNAPSHOT_REFRESH_SECONDS = float(os.getenv('SHEET_SNAPSHOT_REFRESH_SECONDS', '10'))
+
+# Lead routing (api/routing.py). Each qualified lead scores its kind's
+# priority, plus callback_urgency_per_hour for every hour a callback is
+# overdue, plus age_per_day for every day since a retry lead was worked, plus
+# the weight of its value in source_column. Leads scoring premium_score or
+# more are shared fairly per 'agent' or per 'team' ('' turns fairness off),
+# over a window that halves every fairness_half_life seconds.
+LEAD_ROUTING = {
+    'priorities': {
+        'callback': float(os.getenv('ROUTING_CALLBACK_PRIORITY', '100')),
+        'fresh': float(os.getenv('ROUTING_FRESH_PRIORITY', '10')),
+        'retry': float(os.getenv('ROUTING_RETRY_PRIORITY', '0')),
+    },
+    'callback_urgency_per_hour': float(os.getenv('ROUTING_CALLBACK_URGENCY_PER_HOUR', '5')),
+    'age_per_day': float(os.getenv('ROUTING_AGE_PER_DAY', '1')),
+    'source_column': os.getenv('ROUTING_SOURCE_COLUMN', 'Source'),
+    'source_weights': json.loads(os.getenv('ROUTING_SOURCE_WEIGHTS', '{}')),
+    'premium_score': float(os.getenv('ROUTING_PREMIUM_SCORE', '100')),
+    'fairness': os.getenv('ROUTING_FAIRNESS', 'agent'),
+    'fairness_half_life': float(os.getenv('ROUTING_FAIRNESS_HALF_LIFE', '900')),
+}
+
+# Journaled locks and dispositions are overlaid on snapshots until a sheet
+# read shows them, or for at most OVERLAY_TTL seconds.
+OVERLAY_TTL = int(os.getenv('OVERLAY_TTL', '600'))
+
+# How long each worker reuses its in-memory copy of the uploaded
+# do-not-call list before reloading it, in seconds.
+SUPPRESSION_CACHE_TTL = int(os.getenv('SUPPRESSION_CACHE_TTL', '60'))
+
+# Bulk lead imports: uploads are kept in IMPORT_UPLOAD_DIR until the job
+# finishes, and rows are appended IMPORT_CHUNK_ROWS at a time with at most
+# IMPORT_APPENDS_PER_MINUTE append requests to stay inside the Sheets quota.
+IMPORT_UPLOAD_DIR = os.getenv('IMPORT_UPLOAD_DIR', str(BASE_DIR / 'imports'))
+IMPORT_CHUNK_ROWS = int(os.getenv('IMPORT_CHUNK_ROWS', '500'))
+IMPORT_APPENDS_PER_MINUTE = int(os.getenv('IMPORT_APPENDS_PER_MINUTE', '30'))
+# Imports run inside the upload request unless IMPORT_IN_BACKGROUND is set;
+# only enable it where a `manage.py run_jobs` worker is deployed, or queued
+# imports will never start.
+IMPORT_IN_BACKGROUND = os.getenv('IMPORT_IN_BACKGROUND', 'False') == 'True'
+
+# Background jobs (manage.py run_jobs): idle workers poll every
+# JOB_POLL_SECONDS; a running job is presumed lost after JOB_TIMEOUT seconds;
+# failures are retried after JOB_RETRY_BASE * 2^n seconds, capped at
+# JOB_MAX_BACKOFF.
+JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', '2'))
+JOB_TIMEOUT = int(os.getenv('JOB_TIMEOUT', '1800'))
+JOB_RETRY_BASE = int(os.getenv('JOB_RETRY_BASE', '30'))
+JOB_MAX_BACKOFF = int(os.getenv('JOB_MAX_BACKOFF', '3600'))
+# Recurring jobs: schedule name -> {"kind", "cron", optional "payload"/"priority"}
+JOB_SCHEDULES = {
+    'replay-journal': {'kind': 'replay_journal', 'cron': '* * * * *'},
+    'reap-locks': {'kind': 'reap_locks', 'cron': '*/5 * * * *'},
+}
+# Leads locked this long with no disposition or unlock are released by reap_locks
+LEAD_LOCK_TTL = int(os.getenv('LEAD_LOCK_TTL', '1800'))
+
+# Length of a booked appointment, and how long each worker reuses its
+# in-memory slot index before reloading it from the database (seconds).
+APPOINTMENT_MINUTES = int(os.getenv('APPOINTMENT_MINUTES', '30'))
+CALENDAR_CACHE_TTL = int(os.getenv('CALENDAR_CACHE_TTL', '30'))
+
+# Authenticated users are cached per worker; saves evict them on every worker
+# through the invalidation bus (Postgres LISTEN/NOTIFY).
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '300'))
+
+# How often the invalidation listener wakes up when no events arrive (seconds).
+INVALIDATION_POLL_SECONDS = float(os.getenv('INVALIDATION_POLL_SECONDS', '5'))
+
+# Per-worker admission control for Sheets-bound views. Up to max_concurrency
+# requests run at once, up to max_queue wait at most queue_timeout seconds,
+# and the rest get 503 with Retry-After.
+ADMISSION_CONTROL = {
+    'sheets': {
+        'max_concurrency': int(os.getenv('SHEETS_MAX_CONCURRENCY', '4')),
+        'max_queue': int(os.getenv('SHEETS_MAX_QUEUE', '8')),
+        'queue_timeout': float(os.getenv('SHEETS_QUEUE_TIMEOUT', '2.0')),
+        'retry_after': int(os.getenv('SHEETS_RETRY_AFTER', '5')),
+    },
+}
+
+# Sheet write journal: failed writes are retried with exponential backoff
+# (capped at JOURNAL_MAX_BACKOFF seconds) and parked after JOURNAL_MAX_ATTEMPTS.
+JOURNAL_MAX_ATTEMPTS = int(os.getenv('JOURNAL_MAX_ATTEMPTS', '10'))
+JOURNAL_MAX_BACKOFF = int(os.getenv('JOURNAL_MAX_BACKOFF', '300'))
+# Most pending writes for one tab sent in a single batchUpdate
+JOURNAL_BATCH_SIZE = int(os.getenv('JOURNAL_BATCH_SIZE', '200'))
+# Seconds a replayer's claim on a batch lasts before another may retry it
+JOURNAL_CLAIM_TIMEOUT = int(os.getenv('JOURNAL_CLAIM_TIMEOUT', '120'))
+# Most rows accepted by one bulk disposition request
+BULK_DISPOSITION_MAX_ROWS = int(os.getenv('BULK_DISPOSITION_MAX_ROWS', '500'))
+
+# Password hashing. PASSWORD_HASHER picks the algorithm new hashes use
+# (pbkdf2_sha256, argon2, bcrypt_sha256 or scrypt; argon2 and bcrypt need
+# `pip install "django[argon2]"` / `"django[bcrypt]"`). Hashes made with any
+# of the others, or with a different PBKDF2 iteration count, still verify and
+# are rehashed on the user's next successful login.
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2_sha256')
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', '0')) or None
+_PASSWORD_HASHERS = {
+    'pbkdf2_sha256': 'api.hashers.PBKDF2PasswordHasher',
+    'pbkdf2_sha1': 'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'bcrypt_sha256': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+]
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 